@@ -0,0 +1,97 @@
+"""
+Teste de carga da coleta paginada contra o servidor PNCP falso local.
+
+Uso:
+    python benchmarks/bench_coleta.py --dias 30 --paralelismo 1 2 4 8 --latencia-ms 200
+    python benchmarks/bench_coleta.py --taxa-429 0.05 --taxa-erro 0.02 --fatiar
+    python benchmarks/bench_coleta.py --adaptativo --ms-por-registro 20 --timeout 15
+
+Para cada nível de paginas_simultaneas, coleta a janela inteira com um
+ClientePNCP novo (sem cache) e mostra tempo, páginas/s, registros/s,
+requisições, retentativas, o tamanho de página final e se a coleta
+terminou completa.
+"""
+
+import argparse
+import time
+from datetime import date, timedelta
+
+from comum import pncp_backend
+from servidor_falso import iniciar_em_segundo_plano
+
+
+def coletar(url_base, data_inicial, data_final, paginas_simultaneas, fatiar,
+            backoff_inicial, adaptativo=False, timeout=60):
+    cliente = pncp_backend.ClientePNCP(
+        url_base=url_base, backoff_inicial=backoff_inicial, timeout=timeout,
+        tamanho_pool=max(1, paginas_simultaneas),
+    )
+    final = {}
+    inicio = time.perf_counter()
+    with pncp_backend.inscrever_localmente(lambda evento: final.update(evento.dados),
+                                           {pncp_backend.TipoEvento.COLETA_CONCLUIDA}):
+        coleta = pncp_backend.iterar_paginas_pncp(
+            None, data_inicial, data_final,
+            paginas_simultaneas=paginas_simultaneas, cliente=cliente,
+            fatiar_por_data=fatiar, tamanho_adaptativo=adaptativo,
+        )
+        paginas = sum(1 for _ in coleta)
+    duracao = time.perf_counter() - inicio
+    resumo = cliente.resumo_requisicoes()
+    cliente.fechar()
+    return (duracao, paginas, coleta.registros, resumo, coleta.completa,
+            final.get("tamanho_pagina"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dias", type=int, default=30)
+    parser.add_argument("--registros-por-dia", type=int, default=300)
+    parser.add_argument("--paralelismo", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--fatiar", action="store_true", help="usa fatiar_por_data")
+    parser.add_argument("--adaptativo", action="store_true",
+                        help="usa o tamanho de página adaptativo")
+    parser.add_argument("--timeout", type=float, default=60.0,
+                        help="timeout do cliente (s)")
+    parser.add_argument("--latencia-ms", type=float, default=100.0)
+    parser.add_argument("--variacao-ms", type=float, default=30.0)
+    parser.add_argument("--ms-por-registro", type=float, default=0.0)
+    parser.add_argument("--taxa-erro", type=float, default=0.0)
+    parser.add_argument("--taxa-429", type=float, default=0.0)
+    parser.add_argument("--max-rps", type=float, default=None)
+    parser.add_argument("--backoff-inicial", type=float, default=0.2)
+    args = parser.parse_args()
+
+    pncp_backend.EVENTOS.cancelar_inscricao(pncp_backend.INSCRICAO_CONSOLE)
+    servidor = iniciar_em_segundo_plano(
+        porta=0, registros_por_dia=args.registros_por_dia,
+        latencia_ms=args.latencia_ms, variacao_ms=args.variacao_ms,
+        ms_por_registro=args.ms_por_registro, taxa_erro=args.taxa_erro,
+        taxa_429=args.taxa_429, max_rps=args.max_rps,
+        retry_after=1, semente=42,
+    )
+    data_final = date(2025, 1, 1)
+    data_inicial = data_final - timedelta(days=args.dias - 1)
+
+    print(f"servidor {servidor.url_base} · {args.dias} dias × "
+          f"{args.registros_por_dia} registros · latência {args.latencia_ms:.0f} ms")
+    print(f"{'paralelo':>8} {'tempo (s)':>10} {'páginas/s':>10} {'registros/s':>12} "
+          f"{'requisições':>12} {'retentativas':>13} {'tamanho':>8} {'completa':>9}")
+    try:
+        for paginas_simultaneas in args.paralelismo:
+            duracao, paginas, registros, resumo, completa, tamanho = coletar(
+                servidor.url_base, data_inicial.isoformat(), data_final.isoformat(),
+                paginas_simultaneas, args.fatiar, args.backoff_inicial,
+                args.adaptativo, args.timeout,
+            )
+            print(f"{paginas_simultaneas:>8} {duracao:>10.2f} {paginas / duracao:>10.1f} "
+                  f"{registros / duracao:>12.0f} {resumo['requisicoes']:>12} "
+                  f"{resumo['retentativas']:>13} {tamanho or '':>8} "
+                  f"{'sim' if completa else 'não':>9}")
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark das páginas da coleta: dicionários do JSON × PaginaCompacta.
+
+Uso:
+    python benchmarks/bench_decodificacao.py
+    python benchmarks/bench_decodificacao.py --linhas 100000 --perfil analise
+
+As páginas sintéticas são serializadas como o corpo das respostas da API
+e percorrem o mesmo caminho da coleta:
+
+  - json → dict:        json.loads (como resp.json() em _buscar_pagina) e
+                        ColetaPaginasPNCP entregando listas de dicionários
+  - json → compacta:    o mesmo, com ColetaPaginasPNCP(compacta=True)
+                        convertendo cada página em PaginaCompacta com as
+                        colunas do perfil (COLETA_COMPACTA)
+
+Para cada um, mede a vazão da decodificação (registros/s), os bytes por
+registro mantidos em memória enquanto as páginas decodificadas são
+guardadas (tracemalloc) e a vazão de ponta a ponta até o DataFrame
+(decodificação + ingerir_paginas).
+"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from comum import gerar_paginas, pncp_backend
+
+
+def _corpos(paginas) -> list:
+    return [
+        json.dumps({"resultado": pagina, "totalRegistros": len(pagina),
+                    "totalPaginas": len(paginas), "paginasRestantes": 0},
+                   ensure_ascii=False).encode("utf-8")
+        for pagina in paginas
+    ]
+
+
+def _paginas(corpos, compacta, colunas):
+    """
+    Coleta simulada: cada corpo é decodificado só quando a página é pedida.
+    """
+    return pncp_backend.ColetaPaginasPNCP(
+        (json.loads(c)["resultado"] for c in corpos),
+        compacta=compacta, colunas=colunas,
+    )
+
+
+def _decodificar(corpos, compacta, colunas):
+    return list(_paginas(corpos, compacta, colunas))
+
+
+def medir_caminho(corpos, registros, compacta, perfil, repeticoes=3) -> dict:
+    colunas = pncp_backend.PERFIS_COLUNAS[perfil]
+
+    # Vazão da decodificação (melhor de 'repeticoes')
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        gc.collect()
+        inicio = time.perf_counter()
+        _decodificar(corpos, compacta, colunas)
+        melhor = min(melhor, time.perf_counter() - inicio)
+
+    # Memória mantida pelas páginas decodificadas
+    gc.collect()
+    tracemalloc.start()
+    paginas = _decodificar(corpos, compacta, colunas)
+    mantidos, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del paginas
+
+    # Ponta a ponta: bytes da resposta → DataFrame
+    gc.collect()
+    inicio = time.perf_counter()
+    pncp_backend.ingerir_paginas(_paginas(corpos, compacta, colunas), perfil_colunas=perfil)
+    ponta_a_ponta = time.perf_counter() - inicio
+
+    return {
+        "decodificacao_reg_s": registros / melhor,
+        "bytes_por_registro": mantidos / registros,
+        "ate_dataframe_reg_s": registros / ponta_a_ponta,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--perfil", choices=list(pncp_backend.PERFIS_COLUNAS),
+                        default="completo")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    pncp_backend.EVENTOS.cancelar_inscricao(pncp_backend.INSCRICAO_CONSOLE)
+
+    print(f"perfil de colunas: {args.perfil}")
+    print(f"{'linhas':>10} {'caminho':<18} {'JSON (B/reg)':>13} {'decodif. (reg/s)':>17} "
+          f"{'mantido (B/reg)':>16} {'até DataFrame (reg/s)':>22}")
+    for linhas in args.linhas:
+        corpos = _corpos(gerar_paginas(linhas))
+        json_por_registro = sum(len(c) for c in corpos) / linhas
+        for nome, compacta in (("json → dict", False), ("json → compacta", True)):
+            r = medir_caminho(corpos, linhas, compacta, args.perfil, args.repeticoes)
+            print(f"{linhas:>10} {nome:<18} {json_por_registro:>13.0f} "
+                  f"{r['decodificacao_reg_s']:>17,.0f} {r['bytes_por_registro']:>16,.0f} "
+                  f"{r['ate_dataframe_reg_s']:>22,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Benchmark: escrita do Excel com pd.ExcelWriter (openpyxl, modelo completo
+em memória) versus pncp_backend.escrever_excel_streaming (write-only).
+
+Uso:
+    python benchmarks/bench_excel.py --linhas 1000 100000
+
+Para cada tamanho, mede tempo de parede e pico de memória alocada
+(tracemalloc) de cada escritor.
+"""
+
+import argparse
+import io
+
+import pandas as pd
+from comum import gerar_dados, medir, pncp_backend
+
+
+def escrever_pandas(df):
+    destino = io.BytesIO()
+    with pd.ExcelWriter(destino, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False, sheet_name="dados")
+    return destino
+
+
+def escrever_streaming(df):
+    destino = io.BytesIO()
+    pncp_backend.escrever_excel_streaming(destino, {"dados": df})
+    return destino
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--linhas", type=int, nargs="+", default=[1_000, 100_000])
+    args = parser.parse_args()
+
+    print(f"{'linhas':>10} {'escritor':>12} {'tempo (s)':>10} {'pico (MB)':>10}")
+    for linhas in args.linhas:
+        df = gerar_dados(linhas)
+        for nome, funcao in (("ExcelWriter", escrever_pandas),
+                             ("streaming", escrever_streaming)):
+            duracao, pico = medir(lambda funcao=funcao, df=df: funcao(df))
+            print(f"{linhas:>10} {nome:>12} {duracao:>10.2f} {pico / 2**20:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
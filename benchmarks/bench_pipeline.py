@@ -0,0 +1,175 @@
+"""
+Benchmark do pipeline de análise sobre registros sintéticos da API.
+
+Uso:
+    python benchmarks/bench_pipeline.py                      # 1k, 100k e 1M linhas
+    python benchmarks/bench_pipeline.py --linhas 1000 100000 --etapas excel html
+
+Etapas medidas (tempo de parede e pico de memória via tracemalloc):
+  - preparar_dataframes          → ingestão das páginas + resumo + preço de referência
+  - calcular_resumo_por_unidade  → resumo por unidadeMedida sobre df_dados
+  - calcular_media_sanada_serie  → média saneada aplicada a cada unidade
+  - excel                        → escrever_excel_streaming (abas do resultado)
+  - html                         → gerar_relatorio_html
+
+Cada medição é acrescentada a benchmarks/resultados.jsonl (data, commit,
+versões e números), e a tabela impressa mostra a variação em relação à
+última medição registrada para o mesmo tamanho e etapa (ou à de um commit
+escolhido com --referencia).
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime
+
+import pandas as pd
+from comum import gerar_paginas, medir, pncp_backend
+
+ARQUIVO_RESULTADOS = os.path.join(os.path.dirname(__file__), "resultados.jsonl")
+
+ETAPAS = [
+    "preparar_dataframes",
+    "calcular_resumo_por_unidade",
+    "calcular_media_sanada_serie",
+    "excel",
+    "html",
+]
+
+
+def _commit_atual() -> str:
+    """
+    Commit do repositório (com '+' se houver alterações não gravadas).
+    """
+    raiz = os.path.join(os.path.dirname(__file__), os.pardir)
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=raiz,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        alterado = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=raiz,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+    return commit + ("+" if alterado else "")
+
+
+def carregar_resultados(caminho=ARQUIVO_RESULTADOS) -> list:
+    if not os.path.exists(caminho):
+        return []
+    with open(caminho, encoding="utf-8") as f:
+        return [json.loads(linha) for linha in f if linha.strip()]
+
+
+def _referencia(anteriores, linhas, etapa, commit=None):
+    """
+    Última medição registrada para (linhas, etapa), opcionalmente
+    restrita a um commit.
+    """
+    for registro in reversed(anteriores):
+        if (registro["linhas"] == linhas and registro["etapa"] == etapa
+                and commit in (None, registro["commit"])):
+            return registro
+    return None
+
+
+def _variacao(atual, anterior) -> str:
+    if atual is None or not anterior:
+        return ""
+    return f"{(atual / anterior - 1) * 100:+.0f}%"
+
+
+def medir_etapas(linhas, etapas, medir_memoria=True):
+    """
+    Gera 'linhas' registros sintéticos e mede cada etapa pedida.
+    Devolve {etapa: (tempo_s, pico_bytes)}.
+    """
+    paginas = gerar_paginas(linhas)
+    df_dados, resumo_df, preco_ref_df = pncp_backend.preparar_dataframes(iter(paginas))
+    meta = {
+        "data_inicial": "20240101",
+        "data_final": "20241231",
+        "filtros_efetivos": {"codItemCatalogo": "benchmark", "linhas": linhas},
+    }
+
+    funcoes = {
+        "preparar_dataframes":
+            lambda: pncp_backend.preparar_dataframes(iter(paginas)),
+        "calcular_resumo_por_unidade":
+            lambda: pncp_backend.calcular_resumo_por_unidade(df_dados),
+        "calcular_media_sanada_serie":
+            lambda: df_dados.groupby("unidadeMedida")["valorUnitarioResultado"]
+                            .agg(pncp_backend.calcular_media_sanada_serie),
+        "excel":
+            lambda: pncp_backend.escrever_excel_streaming(
+                io.BytesIO(), pncp_backend._abas_resultado(df_dados, resumo_df, preco_ref_df)),
+        "html":
+            lambda: pncp_backend.gerar_relatorio_html(df_dados, resumo_df, preco_ref_df, meta),
+    }
+    return {etapa: medir(funcoes[etapa], medir_memoria) for etapa in etapas}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--linhas", type=int, nargs="+",
+                        default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--etapas", nargs="+", choices=ETAPAS, default=ETAPAS)
+    parser.add_argument("--sem-memoria", action="store_true",
+                        help="não mede o pico de memória (evita a segunda execução)")
+    parser.add_argument("--saida", default=ARQUIVO_RESULTADOS,
+                        help="arquivo JSONL onde as medições são acrescentadas")
+    parser.add_argument("--nao-gravar", action="store_true",
+                        help="apenas exibe, sem acrescentar ao arquivo de resultados")
+    parser.add_argument("--referencia", metavar="COMMIT",
+                        help="compara com as medições deste commit (padrão: a última)")
+    args = parser.parse_args()
+
+    # O benchmark não deve imprimir os eventos das etapas medidas
+    pncp_backend.EVENTOS.cancelar_inscricao(pncp_backend.INSCRICAO_CONSOLE)
+
+    commit = _commit_atual()
+    anteriores = carregar_resultados(args.saida)
+    ambiente = {
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "maquina": platform.node(),
+    }
+
+    print(f"commit {commit} · Python {ambiente['python']} · pandas {ambiente['pandas']}")
+    print(f"{'linhas':>10} {'etapa':<30} {'tempo (s)':>10} {'Δ':>6} "
+          f"{'pico (MB)':>10} {'Δ':>6}")
+    for linhas in args.linhas:
+        resultados = medir_etapas(linhas, args.etapas, not args.sem_memoria)
+        novos = []
+        for etapa, (tempo, pico) in resultados.items():
+            registro = {
+                "data": datetime.now().isoformat(timespec="seconds"),
+                **ambiente,
+                "linhas": linhas,
+                "etapa": etapa,
+                "tempo_s": round(tempo, 4),
+                "pico_mb": None if pico is None else round(pico / 2**20, 2),
+            }
+            novos.append(registro)
+
+            anterior = _referencia(anteriores, linhas, etapa, args.referencia) or {}
+            pico_txt = "" if pico is None else f"{registro['pico_mb']:.1f}"
+            print(f"{linhas:>10} {etapa:<30} {tempo:>10.3f} "
+                  f"{_variacao(tempo, anterior.get('tempo_s')):>6} "
+                  f"{pico_txt:>10} "
+                  f"{_variacao(registro['pico_mb'], anterior.get('pico_mb')):>6}")
+
+        if not args.nao_gravar:
+            with open(args.saida, "a", encoding="utf-8") as f:
+                for registro in novos:
+                    f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Utilitários compartilhados pelos benchmarks: geração de registros
+sintéticos no formato da API do PNCP e medição de tempo/memória.
+
+Os registros imitam o que a consulta de itens devolve:
+  - unidadeMedida com distribuição de cauda longa (poucas unidades
+    concentram a maior parte dos itens, com grafias variantes);
+  - valorUnitarioResultado assimétrico (lognormal por unidade) com uma
+    pequena fração de valores discrepantes (erros de digitação, preço
+    do lote no lugar do unitário);
+  - descricaodetalhada longa (200 a 2.000 caracteres);
+  - ~10% dos itens sem resultado (campos de resultado nulos).
+"""
+
+import atexit
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import pncp_backend
+
+# Cache de respostas, armazém de itens e gravações dos benchmarks em um
+# diretório temporário, e não no diretório atual
+_DIRETORIO_TEMPORARIO = tempfile.mkdtemp(prefix="pncp_benchmarks_")
+atexit.register(shutil.rmtree, _DIRETORIO_TEMPORARIO, ignore_errors=True)
+pncp_backend.CACHE_RESPOSTAS_ARQUIVO = os.path.join(
+    _DIRETORIO_TEMPORARIO, "pncp_cache_respostas.sqlite3")
+pncp_backend.ARMAZEM_ITENS_ARQUIVO = os.path.join(
+    _DIRETORIO_TEMPORARIO, "pncp_armazem_itens.sqlite3")
+pncp_backend.DIRETORIO_GRAVACAO = os.path.join(_DIRETORIO_TEMPORARIO, "pncp_gravacoes")
+
+
+# Registros por página, como tamanhoPagina da API
+TAMANHO_PAGINA = 500
+
+# Unidades em ordem de frequência (peso ~ 1/posição^1.3)
+UNIDADES = [
+    "UNIDADE", "Unidade", "CAIXA", "PACOTE", "UN", "FRASCO", "QUILOGRAMA",
+    "LITRO", "METRO", "CAIXA 100 UN", "AMPOLA", "COMPRIMIDO", "RESMA",
+    "GALÃO 20 L", "ROLO", "PAR", "KIT", "TUBO", "FARDO", "SACO 50 KG",
+    "CX", "PCT", "Kg", "Litro", "METRO QUADRADO", "METRO CÚBICO", "DÚZIA",
+    "CENTO", "MILHEIRO", "BISNAGA", "BOBINA", "CARTELA", "ENVELOPE",
+    "FRASCO 500 ML", "FRASCO 1 L", "GARRAFA", "LATA", "POTE", "SACHÊ",
+    "SERINGA", "BLOCO", "CONJUNTO", "JOGO", "PEÇA", "VIDRO", "BALDE",
+    "TAMBOR 200 L", "CILINDRO", "HORA", "MÊS", "SERVIÇO", "DIÁRIA",
+]
+
+_VOCABULARIO = (
+    "material de consumo aquisição conforme especificações técnicas mínimas "
+    "do termo de referência embalagem original do fabricante com dados de "
+    "identificação validade mínima de doze meses a partir da entrega produto "
+    "novo de primeira qualidade atendendo às normas da ABNT e da ANVISA "
+    "composição cor branca dimensões aproximadas tolerância de cinco por cento "
+    "entrega parcelada conforme demanda da unidade requisitante garantia contra "
+    "defeitos de fabricação registro no ministério da saúde quando aplicável "
+    "papel sulfite alcalino gramatura 75 g/m² formato A4 caneta esferográfica "
+    "ponta média tinta azul corpo transparente sextavado luva de procedimento "
+    "látex não estéril ambidestra tamanho médio caixa com cem unidades"
+)
+
+SITUACOES = ["Homologado", "Em andamento", "Deserto", "Fracassado", "Anulado"]
+MATERIAL_OU_SERVICO = ["Material", "Serviço"]
+
+
+def _pesos_zipf(n: int, expoente: float = 1.3) -> np.ndarray:
+    pesos = 1.0 / np.arange(1, n + 1) ** expoente
+    return pesos / pesos.sum()
+
+
+def _textos(rng, quantidade: int, min_car: int, max_car: int) -> np.ndarray:
+    """
+    'quantidade' textos distintos com comprimento entre min_car e max_car.
+    """
+    vocabulario = np.array(_VOCABULARIO.split(), dtype=object)
+    textos = []
+    for alvo in rng.integers(min_car, max_car + 1, quantidade):
+        palavras = vocabulario[rng.integers(0, len(vocabulario), alvo // 6 + 1)]
+        textos.append(" ".join(palavras)[:alvo].upper())
+    return np.array(textos, dtype=object)
+
+
+def gerar_colunas(linhas: int, semente: int = 42) -> dict:
+    """
+    Colunas (arrays numpy) de 'linhas' itens sintéticos com os campos da
+    API. Valores ausentes são None, como no JSON da consulta.
+    """
+    rng = np.random.default_rng(semente)
+
+    posicao_unidade = rng.choice(len(UNIDADES), linhas, p=_pesos_zipf(len(UNIDADES)))
+    unidades = np.array(UNIDADES, dtype=object)[posicao_unidade]
+
+    # Preço típico por unidade e dispersão lognormal em torno dele
+    preco_base = rng.lognormal(3.0, 1.5, len(UNIDADES))
+    valor_resultado = preco_base[posicao_unidade] * rng.lognormal(0.0, 0.6, linhas)
+    discrepantes = rng.random(linhas) < 0.02
+    fator = np.where(rng.random(linhas) < 0.7,
+                     rng.uniform(10, 1000, linhas),
+                     rng.uniform(0.001, 0.1, linhas))
+    valor_resultado = np.where(discrepantes, valor_resultado * fator, valor_resultado)
+    valor_resultado = np.round(valor_resultado, 4)
+    valor_estimado = np.round(valor_resultado * rng.uniform(0.9, 1.4, linhas), 4)
+
+    quantidade = rng.integers(1, 5000, linhas).astype("float64")
+    quantidade_resultado = np.minimum(quantidade, rng.integers(1, 5000, linhas))
+
+    # Descrições: um conjunto grande de textos distintos, reutilizados
+    # como na prática (o mesmo item aparece em várias contratações)
+    distintos = max(1, min(linhas, 5_000))
+    descricoes = _textos(rng, distintos, 200, 2_000)
+    resumidas = _textos(rng, distintos, 30, 120)
+    escolha = rng.integers(0, distintos, linhas)
+
+    fornecedores = np.array(
+        [f"FORNECEDOR {i:05d} COMERCIO E SERVICOS LTDA" for i in range(2_000)],
+        dtype=object,
+    )
+    # Datas em ordem de inclusão, com repetição (vários itens por compra)
+    inicio = datetime(2024, 1, 1)
+    segundos = np.sort(rng.integers(0, 365 * 86_400, min(linhas, 10_000)))
+    datas = np.array(
+        [(inicio + timedelta(seconds=int(s))).strftime("%Y-%m-%dT%H:%M:%S")
+         for s in segundos],
+        dtype=object,
+    )[np.sort(rng.integers(0, min(linhas, 10_000), linhas))]
+
+    sem_resultado = rng.random(linhas) < 0.10
+    nulo = np.full(linhas, None, dtype=object)
+
+    def com_nulos(valores):
+        valores = valores.astype(object)
+        valores[sem_resultado] = None
+        return valores
+
+    orgaos = rng.integers(10**13, 10**14 - 1, 3_000)
+    orgao = orgaos[rng.integers(0, len(orgaos), linhas)]
+    return {
+        "idContratacaoPNCP": np.char.add(orgao.astype(str), "-1-000123/2024").astype(object),
+        "idCompra": np.char.add(orgao.astype(str), "1000123").astype(object),
+        "idCompraItem": np.char.zfill(np.arange(linhas).astype(str), 20).astype(object),
+        "orgaoEntidadeCnpj": orgao.astype(str).astype(object),
+        "unidadeOrgaoCodigoUnidade": rng.integers(100000, 999999, linhas).astype(str).astype(object),
+        "descricaoResumida": resumidas[escolha],
+        "descricaodetalhada": descricoes[escolha],
+        "materialOuServicoNome": np.array(MATERIAL_OU_SERVICO, dtype=object)[
+            (rng.random(linhas) < 0.1).astype(int)],
+        "codigoClasse": rng.integers(1000, 9999, linhas),
+        "codigoGrupo": rng.integers(10, 99, linhas),
+        "codItemCatalogo": rng.integers(100000, 999999, linhas),
+        "unidadeMedida": unidades,
+        "quantidade": quantidade,
+        "valorUnitarioEstimado": valor_estimado,
+        "valorTotal": np.round(valor_estimado * quantidade, 2),
+        "quantidadeResultado": com_nulos(quantidade_resultado),
+        "valorUnitarioResultado": com_nulos(valor_resultado),
+        "valorTotalResultado": com_nulos(np.round(valor_resultado * quantidade_resultado, 2)),
+        "situacaoCompraItemNome": np.where(
+            sem_resultado,
+            np.array(SITUACOES, dtype=object)[rng.integers(1, len(SITUACOES), linhas)],
+            SITUACOES[0]).astype(object),
+        "nomeFornecedor": com_nulos(fornecedores[rng.integers(0, len(fornecedores), linhas)]),
+        "dataInclusaoPncp": datas,
+        "dataAtualizacaoPncp": datas,
+        "dataResultado": com_nulos(datas),
+        "codigoNCM": nulo,
+        "descricaoNCM": nulo,
+    }
+
+
+def gerar_paginas(linhas: int, semente: int = 42,
+                  tamanho_pagina: int = TAMANHO_PAGINA) -> list:
+    """
+    Registros sintéticos agrupados em páginas (listas de dicionários),
+    como entregues por iterar_paginas_pncp.
+    """
+    colunas = gerar_colunas(linhas, semente)
+    nomes = list(colunas)
+    valores = [colunas[nome].tolist() for nome in nomes]
+    del colunas
+    registros = [dict(zip(nomes, linha)) for linha in zip(*valores)]
+    return [registros[i:i + tamanho_pagina]
+            for i in range(0, len(registros), tamanho_pagina)]
+
+
+def gerar_dados(linhas: int, semente: int = 42) -> pd.DataFrame:
+    """
+    DataFrame tipado (como a aba 'dados') com os registros sintéticos.
+    """
+    return pncp_backend.ingerir_paginas(gerar_paginas(linhas, semente))
+
+
+def medir(funcao, medir_memoria: bool = True) -> tuple:
+    """
+    Tempo de parede (execução sem rastreamento) e pico de memória em bytes
+    (segunda execução sob tracemalloc, que deixa o código mais lento).
+    Sem 'medir_memoria', o pico é None.
+    """
+    gc.collect()
+    inicio = time.perf_counter()
+    funcao()
+    duracao = time.perf_counter() - inicio
+
+    if not medir_memoria:
+        return duracao, None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        funcao()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return duracao, pico
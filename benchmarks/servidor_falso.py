@@ -0,0 +1,307 @@
+"""
+Servidor local que imita a consulta de itens da API do PNCP, para rodar
+coletas sem rede e testar concorrência e retentativas.
+
+Uso:
+    python benchmarks/servidor_falso.py                          # páginas sintéticas
+    python benchmarks/servidor_falso.py --gravacao pncp_gravacoes  # reproduz gravações
+    python benchmarks/servidor_falso.py --latencia-ms 300 --taxa-429 0.05 --taxa-erro 0.02
+
+e, no pncp_backend (ou na aplicação):
+    URL_BASE_API = "http://127.0.0.1:8765"
+
+Modos:
+  - sintético (padrão): cada dia da janela dataInclusaoPncpInicial..Final
+    tem --registros-por-dia itens, com os campos da API (veja comum.py).
+    Os itens de um dia são sempre os mesmos, então janelas fatiadas e
+    coletas repetidas veem os mesmos idCompraItem. As respostas seguem a
+    paginação da API (totalRegistros, totalPaginas, paginasRestantes).
+  - reprodução (--gravacao DIR): responde com as páginas gravadas pelo
+    ClientePNCP em MODO_GRAVACAO = "gravar" (404 se não houver gravação).
+
+Falhas injetadas em qualquer modo: latência (média e variação, mais
+--ms-por-registro × tamanhoPagina, para simular páginas grandes lentas), HTTP 500
+com probabilidade --taxa-erro, HTTP 429 (com Retry-After) com
+probabilidade --taxa-429 ou acima de --max-rps requisições por segundo.
+GET /estatisticas devolve os contadores do servidor em JSON.
+"""
+
+import argparse
+import gzip
+import json
+import math
+import random
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from comum import gerar_paginas, pncp_backend
+
+ENDERECO_PADRAO = "127.0.0.1"
+PORTA_PADRAO = 8765
+
+
+def _data(texto) -> date:
+    """
+    Data dos parâmetros da API ('YYYY-MM-DD' ou 'YYYYMMDD').
+    """
+    texto = str(texto).replace("-", "")
+    return date(int(texto[:4]), int(texto[4:6]), int(texto[6:8]))
+
+
+class PaginasSinteticas:
+    """
+    Gera as páginas de uma consulta a partir de um conjunto fixo de
+    registros sintéticos, com identificação e data de inclusão derivadas
+    do dia e da posição do item no dia.
+    """
+
+    def __init__(self, registros_por_dia=300, tamanho_conjunto=5_000, semente=42):
+        self.registros_por_dia = max(1, int(registros_por_dia))
+        self.registros = [registro for pagina in gerar_paginas(tamanho_conjunto, semente)
+                          for registro in pagina]
+
+    def _registro(self, dia: date, posicao: int) -> dict:
+        numero = dia.toordinal() * self.registros_por_dia + posicao
+        registro = dict(self.registros[numero % len(self.registros)])
+        momento = datetime.combine(dia, datetime.min.time()) + timedelta(
+            seconds=posicao * 86_400 // self.registros_por_dia)
+        registro["idCompraItem"] = f"{dia:%Y%m%d}{posicao:012d}"
+        registro["dataInclusaoPncp"] = momento.strftime("%Y-%m-%dT%H:%M:%S")
+        registro["dataAtualizacaoPncp"] = registro["dataInclusaoPncp"]
+        return registro
+
+    def pagina(self, params: dict) -> dict:
+        inicio = _data(params["dataInclusaoPncpInicial"])
+        fim = _data(params["dataInclusaoPncpFinal"])
+        pagina = max(1, int(params.get("pagina", 1)))
+        tamanho = min(500, max(1, int(params.get("tamanhoPagina", 500))))
+
+        total = max(0, (fim - inicio).days + 1) * self.registros_por_dia
+        total_paginas = math.ceil(total / tamanho)
+        primeiro = (pagina - 1) * tamanho
+        resultado = [
+            self._registro(inicio + timedelta(days=i // self.registros_por_dia),
+                           i % self.registros_por_dia)
+            for i in range(primeiro, min(primeiro + tamanho, total))
+        ]
+        return {
+            "resultado": resultado,
+            "totalRegistros": total,
+            "totalPaginas": total_paginas,
+            "paginasRestantes": max(0, total_paginas - pagina),
+        }
+
+
+class EstadoServidor:
+    """
+    Configuração e contadores compartilhados pelas threads do servidor.
+    """
+
+    def __init__(self, paginas=None, gravacao=None, latencia_ms=0.0, variacao_ms=0.0,
+                 ms_por_registro=0.0, taxa_erro=0.0, taxa_429=0.0, max_rps=None,
+                 retry_after=1, semente=None):
+        self.paginas = paginas
+        self.gravacao = gravacao
+        self.latencia_ms = latencia_ms
+        self.variacao_ms = variacao_ms
+        self.ms_por_registro = ms_por_registro
+        self.taxa_erro = taxa_erro
+        self.taxa_429 = taxa_429
+        self.max_rps = max_rps
+        self.retry_after = retry_after
+        self.contadores = {"requisicoes": 0, "200": 0, "404": 0, "429": 0, "500": 0,
+                           "registros": 0, "bytes": 0}
+        self._aleatorio = random.Random(semente)
+        self._janela = []
+        self._lock = threading.Lock()
+
+    def contar(self, chave, valor=1):
+        with self._lock:
+            self.contadores[chave] = self.contadores.get(chave, 0) + valor
+
+    def sortear(self) -> float:
+        with self._lock:
+            return self._aleatorio.random()
+
+    def acima_do_limite(self) -> bool:
+        """
+        Registra a requisição e diz se ela passa de max_rps no último segundo.
+        """
+        if not self.max_rps:
+            return False
+        agora = time.monotonic()
+        with self._lock:
+            self._janela = [t for t in self._janela if agora - t < 1.0]
+            if len(self._janela) >= self.max_rps:
+                return True
+            self._janela.append(agora)
+            return False
+
+    def espera_s(self, tamanho_pagina=0) -> float:
+        atraso = self.ms_por_registro * tamanho_pagina
+        if self.latencia_ms or self.variacao_ms:
+            with self._lock:
+                atraso += self._aleatorio.gauss(self.latencia_ms, self.variacao_ms)
+        return max(0.0, atraso) / 1000.0
+
+
+class ManipuladorPNCPFalso(BaseHTTPRequestHandler):
+    """
+    Atende GET na rota de itens (CAMINHO_ITENS_PNCP) e em /estatisticas.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def _responder(self, status, corpo: bytes, tipo="application/json; charset=utf-8",
+                   cabecalhos=None):
+        if "gzip" in self.headers.get("Accept-Encoding", "") and len(corpo) > 1024:
+            corpo = gzip.compress(corpo, compresslevel=1)
+            cabecalhos = {**(cabecalhos or {}), "Content-Encoding": "gzip"}
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", tipo)
+            self.send_header("Content-Length", str(len(corpo)))
+            for nome, valor in (cabecalhos or {}).items():
+                self.send_header(nome, valor)
+            self.end_headers()
+            self.wfile.write(corpo)
+        except (BrokenPipeError, ConnectionResetError):
+            # Cliente desistiu (ex.: timeout) antes da resposta
+            self.close_connection = True
+            return
+        estado = self.server.estado
+        estado.contar(str(status))
+        estado.contar("bytes", len(corpo))
+
+    def _json(self, status, dados, cabecalhos=None):
+        self._responder(status, json.dumps(dados, ensure_ascii=False).encode("utf-8"),
+                        cabecalhos=cabecalhos)
+
+    def do_GET(self):
+        estado = self.server.estado
+        partes = urlsplit(self.path)
+        params = dict(parse_qsl(partes.query))
+
+        if partes.path == "/estatisticas":
+            with estado._lock:
+                contadores = dict(estado.contadores)
+            self._json(200, contadores)
+            return
+        if partes.path.rstrip("/") != pncp_backend.CAMINHO_ITENS_PNCP:
+            self._json(404, {"erro": f"rota desconhecida: {partes.path}"})
+            return
+
+        estado.contar("requisicoes")
+        try:
+            espera = estado.espera_s(int(params.get("tamanhoPagina", 0)))
+        except ValueError:
+            espera = estado.espera_s()
+        if espera:
+            time.sleep(espera)
+
+        if estado.acima_do_limite() or estado.sortear() < estado.taxa_429:
+            self._json(429, {"erro": "Too Many Requests"},
+                       {"Retry-After": str(estado.retry_after)})
+            return
+        if estado.sortear() < estado.taxa_erro:
+            self._json(500, {"erro": "erro interno simulado"})
+            return
+
+        if estado.gravacao is not None:
+            registro = estado.gravacao.obter(partes.path, params)
+            if registro is None:
+                self._json(404, {"erro": "resposta não gravada", "params": params})
+                return
+            estado.contar("registros", len(json.loads(registro["corpo"]).get("resultado") or []))
+            self._responder(registro["status"], registro["corpo"].encode("utf-8"),
+                            registro["content_type"])
+            return
+
+        try:
+            dados = estado.paginas.pagina(params)
+        except (KeyError, ValueError) as exc:
+            self._json(400, {"erro": f"parâmetros inválidos: {exc}"})
+            return
+        estado.contar("registros", len(dados["resultado"]))
+        self._json(200, dados)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def criar_servidor(endereco=ENDERECO_PADRAO, porta=PORTA_PADRAO, gravacao=None,
+                   registros_por_dia=300, **falhas) -> ThreadingHTTPServer:
+    """
+    Cria (sem iniciar) o servidor falso. 'gravacao' é o diretório de
+    gravações a reproduzir; sem ele, as páginas são sintéticas. 'falhas'
+    são os parâmetros de EstadoServidor (latencia_ms, taxa_429, ...).
+    Com porta=0, o sistema escolhe uma porta livre (servidor.server_port).
+    """
+    servidor = ThreadingHTTPServer((endereco, porta), ManipuladorPNCPFalso)
+    servidor.daemon_threads = True
+    servidor.estado = EstadoServidor(
+        paginas=None if gravacao else PaginasSinteticas(registros_por_dia),
+        gravacao=(pncp_backend.GravacaoRespostasPNCP(gravacao, "reproduzir")
+                  if gravacao else None),
+        **falhas,
+    )
+    return servidor
+
+
+def iniciar_em_segundo_plano(**opcoes) -> ThreadingHTTPServer:
+    """
+    Cria o servidor e o atende em uma thread daemon; encerre com
+    servidor.shutdown(). A URL base fica em servidor.url_base.
+    """
+    servidor = criar_servidor(**opcoes)
+    servidor.url_base = f"http://{servidor.server_address[0]}:{servidor.server_port}"
+    threading.Thread(target=servidor.serve_forever, name="pncp-servidor-falso",
+                     daemon=True).start()
+    return servidor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--endereco", default=ENDERECO_PADRAO)
+    parser.add_argument("--porta", type=int, default=PORTA_PADRAO)
+    parser.add_argument("--gravacao", metavar="DIR",
+                        help="reproduz as respostas gravadas neste diretório")
+    parser.add_argument("--registros-por-dia", type=int, default=300)
+    parser.add_argument("--latencia-ms", type=float, default=0.0)
+    parser.add_argument("--variacao-ms", type=float, default=0.0)
+    parser.add_argument("--ms-por-registro", type=float, default=0.0,
+                        help="latência adicional por registro pedido (tamanhoPagina)")
+    parser.add_argument("--taxa-erro", type=float, default=0.0,
+                        help="probabilidade de HTTP 500 por requisição")
+    parser.add_argument("--taxa-429", type=float, default=0.0,
+                        help="probabilidade de HTTP 429 por requisição")
+    parser.add_argument("--max-rps", type=float, default=None,
+                        help="responde 429 acima desta taxa de requisições por segundo")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--semente", type=int, default=None)
+    args = parser.parse_args()
+
+    servidor = criar_servidor(
+        args.endereco, args.porta, gravacao=args.gravacao,
+        registros_por_dia=args.registros_por_dia,
+        latencia_ms=args.latencia_ms, variacao_ms=args.variacao_ms,
+        ms_por_registro=args.ms_por_registro, taxa_erro=args.taxa_erro, taxa_429=args.taxa_429, max_rps=args.max_rps,
+        retry_after=args.retry_after, semente=args.semente,
+    )
+    modo = f"reproduzindo {args.gravacao}" if args.gravacao else "páginas sintéticas"
+    print(f"🧪 Servidor PNCP falso ({modo}) em "
+          f"http://{args.endereco}:{servidor.server_port}{pncp_backend.CAMINHO_ITENS_PNCP}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        print(f"Encerrado. Contadores: {servidor.estado.contadores}")
+
+
+if __name__ == "__main__":
+    main()
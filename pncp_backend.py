@@ -49,6 +49,102 @@ CODIGO_NCM = ""                          # string ou "" para ignorar
 FILTRO_VALOR_MIN = None                  # float (ex: 100.00) ou None
 FILTRO_VALOR_MAX = None                  # float (ex: 5000.00) ou None
 
+# Número de páginas baixadas em paralelo após a primeira (1 = sequencial).
+PAGINAS_SIMULTANEAS = 4
+
+# Tamanho das páginas pedidas à API (tamanhoPagina, máximo 500). Com o
+# ajuste adaptativo, o coletor desce para um tamanho menor de TAMANHOS_PAGINA
+# quando as páginas ficam lentas demais (ou falham por timeout) e volta a
+# subir quando a vazão (registros por segundo) melhora.
+TAMANHO_PAGINA = 500
+TAMANHO_PAGINA_ADAPTATIVO = True
+TAMANHOS_PAGINA = (500, 250, 100, 50)
+
+# Cache local (SQLite) das páginas já baixadas da API.
+# Buscas repetidas com os mesmos filtros e a mesma janela são atendidas do disco.
+USAR_CACHE_RESPOSTAS = True
+CACHE_RESPOSTAS_ARQUIVO = "pncp_cache_respostas.sqlite3"
+CACHE_RESPOSTAS_TTL_HORAS = 12
+CACHE_RESPOSTAS_MAX_MB = 500
+
+# Pesquisa em lote (vários códigos de catálogo com os mesmos filtros):
+# itens pesquisados ao mesmo tempo e limite de requisições por segundo
+# do cliente compartilhado entre eles.
+ITENS_SIMULTANEOS_LOTE = 4
+REQUISICOES_POR_SEGUNDO_LOTE = 5
+
+# Fatiamento da janela de datas: consultas com muitas páginas são divididas
+# em fatias de datas menores, subdivididas enquanto passarem do limite.
+FATIAR_POR_DATA = False
+LIMITE_PAGINAS_FATIA = 20
+
+# Modo prévia (exploração rápida, resultado provisório): a coleta para após
+# PREVIA_MAX_REGISTROS registros ou PREVIA_TEMPO_LIMITE_S segundos, ou usa
+# uma amostra de PREVIA_PAGINAS_AMOSTRA páginas espalhadas pela consulta.
+# As páginas baixadas ficam no cache de respostas e são reaproveitadas
+# pela pesquisa completa lançada em seguida.
+PREVIA_MAX_REGISTROS = 5000
+PREVIA_TEMPO_LIMITE_S = 30
+PREVIA_PAGINAS_AMOSTRA = 8
+
+# Colunas mantidas na ingestão das páginas (veja PERFIS_COLUNAS):
+#   "completo" → todos os campos devolvidos pela API (aba 'dados' integral)
+#   "analise"  → COLUNAS_PRIORITARIAS sem a descrição detalhada (texto longo)
+#   "minimo"   → só o necessário para as estatísticas e o relatório
+# Em pesquisas de classes inteiras, quase toda a memória vai para textos
+# que não entram nas estatísticas.
+PERFIL_COLUNAS = "completo"
+
+# Páginas compactas: os registros de cada página entregue pela coleta são
+# convertidos para uma estrutura de arrays (PaginaCompacta, uma coluna por
+# campo do perfil), em vez de um dicionário por registro. Compensa com os
+# perfis "analise" e "minimo"; com "completo" é só uma conversão a mais.
+COLETA_COMPACTA = False
+
+# Sincronização incremental: mantém um armazém local (SQLite) dos itens
+# por idCompraItem e baixa apenas as inclusões desde a última execução
+# (mais DIAS_REVERIFICACAO dias, para captar atualizações recentes).
+# Atenção: itens incluídos antes desse recuo e atualizados depois
+# (dataAtualizacaoPncp) só são renovados na reverificação completa da
+# janela, feita a cada DIAS_VERIFICACAO_COMPLETA dias (None = nunca).
+SINCRONIZACAO_INCREMENTAL = False
+ARMAZEM_ITENS_ARQUIVO = "pncp_armazem_itens.sqlite3"
+DIAS_REVERIFICACAO = 7
+DIAS_VERIFICACAO_COMPLETA = 30
+
+# Exportação colunar opcional, além do Excel: () para não gerar,
+# ou ("parquet", "csv") para gerar Parquet e/ou CSV gzip das tabelas.
+FORMATOS_COLUNARES = ()
+
+# Cache de resultados completos na aplicação web (compartilhado entre
+# sessões do mesmo servidor): pesquisas idênticas dentro do TTL não
+# voltam a consultar a API.
+CACHE_RESULTADOS_TTL_MINUTOS = 30
+CACHE_RESULTADOS_MAX_ENTRADAS = 32
+CACHE_RESULTADOS_MAX_MB = 256
+
+# Pesquisas da aplicação web executadas em segundo plano: quantas rodam
+# ao mesmo tempo no servidor (as demais aguardam na fila).
+TAREFAS_SIMULTANEAS = 2
+
+# Métricas no formato Prometheus (contadores e histogramas da API, das
+# etapas e do cache), servidas em http://ENDERECO:PORTA/metrics.
+EXPORTAR_METRICAS = False
+ENDERECO_METRICAS = "127.0.0.1"
+PORTA_METRICAS = 9464
+
+# Endereço da API de dados abertos. Para trabalhar sem rede ou fazer
+# testes de carga, aponte para o servidor falso local
+# (python benchmarks/servidor_falso.py → "http://127.0.0.1:8765").
+URL_BASE_API = "https://dadosabertos.compras.gov.br"
+
+# Gravação/reprodução das respostas HTTP em DIRETORIO_GRAVACAO:
+#   None          → desligado
+#   "gravar"      → consulta a API e grava cada página recebida
+#   "reproduzir"  → responde apenas com o que foi gravado (sem rede)
+MODO_GRAVACAO = None
+DIRETORIO_GRAVACAO = "pncp_gravacoes"
+
 # Opcional: nome base dos arquivos de saída (sem extensão).
 # Se deixar None, será gerado automaticamente.
 NOME_BASE_SAIDA = None  # ex.: "pesquisa_preco_catmat_279727"
@@ -81,15 +177,47 @@ except ImportError as exc:
 
 try:
     import openpyxl  # garante engine do Excel
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
 except ImportError as exc:
     print("❌ Erro: a biblioteca 'openpyxl' não está instalada.")
     print("   Instale com: pip install openpyxl")
     raise exc
 
+try:
+    import pyarrow as pa  # exportação Parquet / CSV gzip
+    import pyarrow.csv as pa_csv
+except ImportError as exc:
+    print("❌ Erro: a biblioteca 'pyarrow' não está instalada.")
+    print("   Instale com: pip install pyarrow")
+    raise exc
+
 import base64
+import contextvars
+import gzip
+import hashlib
+from html import escape as escapar_html
+import io
+import json
+import math
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict, deque
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field, replace
+from operator import itemgetter
 from datetime import date, timedelta
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import numpy as np
+from requests.adapters import HTTPAdapter
 
 
 # ============================================================
@@ -120,156 +248,2451 @@ def bool_to_api_flag(value):
     return None
 
 
-def montar_filtros_opcionais():
+@dataclass(frozen=True)
+class ConfiguracaoPesquisa:
     """
-    Lê as variáveis de configuração no topo e monta o dicionário
-    de parâmetros opcionais a ser enviado para a API.
+    Configuração imutável de uma pesquisa: filtros da API, faixa de valor
+    e janela de datas.
+
+    Cada pesquisa recebe a sua própria instância, passada explicitamente
+    adiante; nada é lido de (nem escrito em) variáveis do módulo, de modo
+    que várias pesquisas podem rodar ao mesmo tempo em threads distintas.
+    Por ser imutável e hashável, também serve como chave de cache.
+
+    Se data_inicial/data_final ficarem None, vale a janela dos últimos
+    365 dias (calcular_intervalo_ultimo_ano) no momento da pesquisa.
+    """
+    cod_item_catalogo: int = None
+    orgao_entidade_cnpj: str = ""
+    unidade_orgao_codigo_unidade: int = None
+    situacao_compra_item: str = ""
+    material_ou_servico: str = ""
+    codigo_classe: int = None
+    codigo_grupo: int = None
+    cod_fornecedor: str = ""
+    filtrar_tem_resultado: bool = None
+    filtrar_bps: bool = None
+    filtrar_margem_preferencia_normal: bool = None
+    codigo_ncm: str = ""
+    valor_min: float = None
+    valor_max: float = None
+    data_inicial: str = None
+    data_final: str = None
+
+    def __post_init__(self):
+        # Campos de texto aceitam None como "sem filtro"
+        for campo in ("orgao_entidade_cnpj", "situacao_compra_item",
+                      "material_ou_servico", "cod_fornecedor", "codigo_ncm"):
+            if getattr(self, campo) is None:
+                object.__setattr__(self, campo, "")
+
+    @classmethod
+    def das_variaveis_globais(cls):
+        """
+        Configuração a partir das variáveis no topo do módulo (uso no
+        Jupyter / linha de comando).
+        """
+        return cls(
+            cod_item_catalogo=COD_ITEM_CATALOGO,
+            orgao_entidade_cnpj=ORGAO_ENTIDADE_CNPJ,
+            unidade_orgao_codigo_unidade=UNIDADE_ORGAO_CODIGO_UNIDADE,
+            situacao_compra_item=SITUACAO_COMPRA_ITEM,
+            material_ou_servico=MATERIAL_OU_SERVICO,
+            codigo_classe=CODIGO_CLASSE,
+            codigo_grupo=CODIGO_GRUPO,
+            cod_fornecedor=COD_FORNECEDOR,
+            filtrar_tem_resultado=FILTRAR_TEM_RESULTADO,
+            filtrar_bps=FILTRAR_BPS,
+            filtrar_margem_preferencia_normal=FILTRAR_MARGEM_PREFERENCIA_NORMAL,
+            codigo_ncm=CODIGO_NCM,
+            valor_min=FILTRO_VALOR_MIN,
+            valor_max=FILTRO_VALOR_MAX,
+        )
+
+    def com(self, **alteracoes):
+        """
+        Cópia com os campos informados alterados (ex.: outro item de catálogo).
+        """
+        return replace(self, **alteracoes)
+
+    def intervalo(self):
+        """
+        (data_inicial, data_final) da pesquisa, em 'YYYY-MM-DD'.
+        """
+        if self.data_inicial and self.data_final:
+            return self.data_inicial, self.data_final
+        padrao_inicial, padrao_final = calcular_intervalo_ultimo_ano()
+        return self.data_inicial or padrao_inicial, self.data_final or padrao_final
+
+    def com_intervalo_fixado(self):
+        """
+        Cópia com a janela de datas resolvida (útil para chaves de cache).
+        """
+        data_inicial, data_final = self.intervalo()
+        return replace(self, data_inicial=data_inicial, data_final=data_final)
+
+    def filtros_api(self) -> dict:
+        """
+        Parâmetros opcionais a enviar para a API (só os preenchidos).
+        O código do item e as datas seguem em separado.
+        """
+        filtros = {}
+
+        if self.orgao_entidade_cnpj:
+            filtros["orgaoEntidadeCnpj"] = self.orgao_entidade_cnpj
+
+        if self.unidade_orgao_codigo_unidade is not None:
+            filtros["unidadeOrgaoCodigoUnidade"] = int(self.unidade_orgao_codigo_unidade)
+
+        if self.situacao_compra_item:
+            filtros["situacaoCompraItem"] = self.situacao_compra_item
+
+        if self.material_ou_servico:
+            filtros["materialOuServico"] = self.material_ou_servico
+
+        if self.codigo_classe is not None:
+            filtros["codigoClasse"] = int(self.codigo_classe)
+
+        if self.codigo_grupo is not None:
+            filtros["codigoGrupo"] = int(self.codigo_grupo)
+
+        if self.cod_fornecedor:
+            filtros["codFornecedor"] = self.cod_fornecedor
+
+        flag_tr = bool_to_api_flag(self.filtrar_tem_resultado)
+        if flag_tr is not None:
+            filtros["temResultado"] = flag_tr
+
+        flag_bps = bool_to_api_flag(self.filtrar_bps)
+        if flag_bps is not None:
+            filtros["bps"] = flag_bps
+
+        flag_mpn = bool_to_api_flag(self.filtrar_margem_preferencia_normal)
+        if flag_mpn is not None:
+            filtros["margemPreferenciaNormal"] = flag_mpn
+
+        if self.codigo_ncm:
+            filtros["codigoNCM"] = self.codigo_ncm
+
+        return filtros
+
+    def filtros_efetivos(self) -> dict:
+        """
+        Filtros preenchidos, com os nomes da API, para o relatório.
+        """
+        filtros_efetivos = {
+            "codItemCatalogo": self.cod_item_catalogo if self.cod_item_catalogo is not None else "",
+            "orgaoEntidadeCnpj": self.orgao_entidade_cnpj,
+            "unidadeOrgaoCodigoUnidade": self.unidade_orgao_codigo_unidade,
+            "situacaoCompraItem": self.situacao_compra_item,
+            "materialOuServico": self.material_ou_servico,
+            "codigoClasse": self.codigo_classe,
+            "codigoGrupo": self.codigo_grupo,
+            "codFornecedor": self.cod_fornecedor,
+            "temResultado": self.filtrar_tem_resultado,
+            "bps": self.filtrar_bps,
+            "margemPreferenciaNormal": self.filtrar_margem_preferencia_normal,
+            "codigoNCM": self.codigo_ncm,
+            "valorMinimo": f"R$ {self.valor_min}" if self.valor_min is not None else "",
+            "valorMaximo": f"R$ {self.valor_max}" if self.valor_max is not None else "",
+        }
+        return {k: v for k, v in filtros_efetivos.items() if v not in (None, "", [])}
+
+
+def montar_filtros_opcionais(config: ConfiguracaoPesquisa = None):
+    """
+    Monta o dicionário de parâmetros opcionais a ser enviado para a API.
     Só inclui parâmetros que não forem None/vazios.
+
+    Sem 'config', lê as variáveis de configuração no topo do módulo.
+    """
+    if config is None:
+        config = ConfiguracaoPesquisa.das_variaveis_globais()
+    return config.filtros_api()
+
+
+# ============================================================
+# 📣 EVENTOS DE PROGRESSO (BARRAMENTO + CONSOLE)
+# ============================================================
+
+class TipoEvento:
+    """
+    Tipos de evento emitidos pela coleta, pela geração de arquivos e pelo
+    relatório. Os campos de EventoPNCP.dados de cada tipo:
+
+    - COLETA_INICIADA: cod_item_catalogo, data_inicial, data_final,
+      filtros, paginas_simultaneas, fatiar_por_data
+    - COLETA_CONCLUIDA: registros, completa, requisicoes, retentativas,
+      latencia_media_s (e, com cache, cache_acertos, cache_falhas)
+    - PAGINA_INICIADA: pagina
+    - PAGINA_CONCLUIDA: pagina, registros, bytes, latencia_s, do_cache,
+      cache_consultado
+    - PAGINA_ENTREGUE: pagina, registros, acumulado (quando conhecido)
+    - REQUISICAO: url, pagina, status, latencia_s, tamanho_bytes, tentativa
+    - RETENTATIVA: pagina, motivo, tentativa, espera_s
+    - ETAPA_INICIADA / ETAPA_CONCLUIDA: etapa (+ duracao_s na conclusão e,
+      conforme a etapa, linhas, unidades, abas, tamanho_bytes; erro com o
+      tipo da exceção quando a etapa falha)
+    - AVISO / ERRO / INFORMACAO: apenas a mensagem (e detalhes, se houver)
+    """
+    COLETA_INICIADA = "coleta_iniciada"
+    COLETA_CONCLUIDA = "coleta_concluida"
+    PAGINA_INICIADA = "pagina_iniciada"
+    PAGINA_CONCLUIDA = "pagina_concluida"
+    PAGINA_ENTREGUE = "pagina_entregue"
+    REQUISICAO = "requisicao"
+    RETENTATIVA = "retentativa"
+    ETAPA_INICIADA = "etapa_iniciada"
+    ETAPA_CONCLUIDA = "etapa_concluida"
+    AVISO = "aviso"
+    ERRO = "erro"
+    INFORMACAO = "informacao"
+
+
+@dataclass(frozen=True)
+class EventoPNCP:
+    """
+    Evento de progresso. 'mensagem' é o texto para o console (pode ser
+    vazio em eventos só de telemetria); 'dados' traz os campos do tipo.
     """
-    filtros = {}
+    tipo: str
+    mensagem: str = ""
+    dados: dict = field(default_factory=dict)
+    momento: float = field(default_factory=time.time)
 
-    if ORGAO_ENTIDADE_CNPJ:
-        filtros["orgaoEntidadeCnpj"] = ORGAO_ENTIDADE_CNPJ
 
-    if UNIDADE_ORGAO_CODIGO_UNIDADE is not None:
-        filtros["unidadeOrgaoCodigoUnidade"] = int(UNIDADE_ORGAO_CODIGO_UNIDADE)
+class BarramentoEventos:
+    """
+    Distribui eventos aos inscritos (funções que recebem um EventoPNCP).
+
+    Um inscrito que falhe não interrompe a coleta: a falha é contada em
+    pncp_falhas_inscritos_total (por inscrito) e a primeira de cada
+    inscrição é relatada em stderr, com a exceção.
+    """
 
-    if SITUACAO_COMPRA_ITEM:
-        filtros["situacaoCompraItem"] = SITUACAO_COMPRA_ITEM
+    def __init__(self):
+        self._inscritos = []
+        self._relatadas = set()
+        self._lock = threading.Lock()
+
+    def inscrever(self, funcao, tipos=None):
+        """
+        Inscreve 'funcao' para todos os eventos ou só para os 'tipos'
+        informados. Devolve um identificador para cancelar_inscricao.
+        """
+        inscricao = (funcao, frozenset(tipos) if tipos else None)
+        with self._lock:
+            self._inscritos = self._inscritos + [inscricao]
+        return inscricao
+
+    def cancelar_inscricao(self, inscricao):
+        with self._lock:
+            self._inscritos = [i for i in self._inscritos if i is not inscricao]
+
+    def publicar(self, evento: EventoPNCP):
+        for funcao, tipos in self._inscritos:
+            if tipos is None or evento.tipo in tipos:
+                try:
+                    funcao(evento)
+                except Exception as exc:
+                    self._relatar_falha(funcao, tipos, evento, exc)
+
+    def _relatar_falha(self, funcao, tipos, evento, exc):
+        nome = getattr(funcao, "__qualname__", repr(funcao))
+        M_FALHAS_INSCRITOS.inc(inscrito=nome)
+        with self._lock:
+            primeira = (funcao, tipos) not in self._relatadas
+            self._relatadas.add((funcao, tipos))
+        if primeira:
+            print(f"⚠ Inscrito de eventos {nome} falhou ao receber '{evento.tipo}': "
+                  f"{exc.__class__.__name__}: {exc}", file=sys.stderr)
+
+
+def exibir_evento_no_console(evento: EventoPNCP):
+    """
+    Inscrito padrão: imprime a mensagem do evento, como antes.
+    """
+    if evento.mensagem:
+        print(evento.mensagem)
 
-    if MATERIAL_OU_SERVICO:
-        filtros["materialOuServico"] = MATERIAL_OU_SERVICO
 
-    if CODIGO_CLASSE is not None:
-        filtros["codigoClasse"] = int(CODIGO_CLASSE)
+# Barramento global (todas as pesquisas do processo). Para deixar de
+# imprimir no console: EVENTOS.cancelar_inscricao(INSCRICAO_CONSOLE).
+EVENTOS = BarramentoEventos()
+INSCRICAO_CONSOLE = EVENTOS.inscrever(exibir_evento_no_console)
 
-    if CODIGO_GRUPO is not None:
-        filtros["codigoGrupo"] = int(CODIGO_GRUPO)
+# Barramento só da pesquisa em andamento no contexto atual (veja
+# inscrever_localmente); propagado às threads que baixam páginas.
+_EVENTOS_LOCAIS = contextvars.ContextVar("eventos_pncp_locais", default=None)
 
-    if COD_FORNECEDOR:
-        filtros["codFornecedor"] = COD_FORNECEDOR
 
-    flag_tr = bool_to_api_flag(FILTRAR_TEM_RESULTADO)
-    if flag_tr is not None:
-        filtros["temResultado"] = flag_tr
+def emitir_evento(tipo, mensagem="", **dados):
+    """
+    Publica um evento no barramento global e no do contexto atual.
+    """
+    evento = EventoPNCP(tipo, mensagem, dados)
+    EVENTOS.publicar(evento)
+    locais = _EVENTOS_LOCAIS.get()
+    if locais is not None:
+        locais.publicar(evento)
 
-    flag_bps = bool_to_api_flag(FILTRAR_BPS)
-    if flag_bps is not None:
-        filtros["bps"] = flag_bps
 
-    flag_mpn = bool_to_api_flag(FILTRAR_MARGEM_PREFERENCIA_NORMAL)
-    if flag_mpn is not None:
-        filtros["margemPreferenciaNormal"] = flag_mpn
+@contextmanager
+def etapa_eventos(etapa, mensagem_inicio="", mensagem_fim="", **dados):
+    """
+    Emite ETAPA_INICIADA ao entrar e ETAPA_CONCLUIDA (com duracao_s) ao
+    sair do bloco. O dicionário devolvido pelo 'with' pode receber dados
+    extras para o evento de conclusão (inclusive substituir duracao_s,
+    se a etapa não deve contar todo o tempo do bloco). Se o bloco levantar uma exceção, a
+    conclusão é emitida mesmo assim, com 'erro' (o tipo da exceção), e a
+    exceção é propagada.
+    """
+    emitir_evento(TipoEvento.ETAPA_INICIADA, mensagem_inicio, etapa=etapa, **dados)
+    extras = {}
+    inicio = time.perf_counter()
+    try:
+        yield extras
+    except BaseException as exc:
+        extras["erro"] = type(exc).__name__
+        raise
+    finally:
+        if "erro" in extras:
+            mensagem_fim = f"Etapa '{etapa}' interrompida por {extras['erro']}."
+        emitir_evento(
+            TipoEvento.ETAPA_CONCLUIDA, mensagem_fim, etapa=etapa,
+            **{"duracao_s": time.perf_counter() - inicio, **dados, **extras},
+        )
 
-    if CODIGO_NCM:
-        filtros["codigoNCM"] = CODIGO_NCM
 
-    return filtros
+@contextmanager
+def inscrever_localmente(funcao, tipos=None):
+    """
+    Dentro do bloco 'with', 'funcao' recebe apenas os eventos emitidos
+    neste contexto (esta thread e as que ela dispara para baixar páginas),
+    e não os de outras pesquisas simultâneas.
+    """
+    anterior = _EVENTOS_LOCAIS.get()
+    locais = BarramentoEventos()
+    if anterior is not None:
+        locais.inscrever(anterior.publicar)
+    locais.inscrever(funcao, tipos)
+    token = _EVENTOS_LOCAIS.set(locais)
+    try:
+        yield locais
+    finally:
+        _EVENTOS_LOCAIS.reset(token)
+
+
+# ============================================================
+# 📈 MÉTRICAS (FORMATO PROMETHEUS)
+# ============================================================
+
+# Limites (em segundos) dos histogramas de duração
+BUCKETS_LATENCIA = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BUCKETS_ETAPA = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+BUCKETS_LINHAS = (100, 1_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000)
+
+
+def _escapar_rotulo(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatar_rotulos(nomes, valores, extra=None) -> str:
+    pares = list(zip(nomes, valores))
+    if extra:
+        pares.append(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{n}="{_escapar_rotulo(v)}"' for n, v in pares) + "}"
+
+
+class _Metrica:
+    """
+    Base das métricas: nome, ajuda, rótulos e valores por combinação de
+    rótulos (protegidos por lock).
+    """
+    tipo = ""
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def _chave(self, rotulos):
+        return tuple(str(rotulos.get(r, "")) for r in self.rotulos)
+
+    def exportar(self) -> list:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+        with self._lock:
+            itens = sorted(self._valores.items())
+        for chave, valor in itens:
+            linhas.extend(self._linhas(chave, valor))
+        return linhas
+
+    def _linhas(self, chave, valor):
+        return [f"{self.nome}{_formatar_rotulos(self.rotulos, chave)} {valor}"]
+
+
+class Contador(_Metrica):
+    """
+    Valor que só cresce (ex.: total de requisições).
+    """
+    tipo = "counter"
+
+    def inc(self, valor=1, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def valor(self, **rotulos):
+        with self._lock:
+            return self._valores.get(self._chave(rotulos), 0)
+
+
+class Medidor(_Metrica):
+    """
+    Valor que sobe e desce (ex.: maior número de linhas de uma pesquisa).
+    """
+    tipo = "gauge"
+
+    def definir(self, valor, **rotulos):
+        with self._lock:
+            self._valores[self._chave(rotulos)] = valor
+
+    def definir_maximo(self, valor, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._valores[chave] = max(self._valores.get(chave, valor), valor)
+
+    def valor(self, **rotulos):
+        with self._lock:
+            return self._valores.get(self._chave(rotulos))
+
+
+class Histograma(_Metrica):
+    """
+    Distribuição em faixas cumulativas ('buckets'), com soma e contagem.
+    """
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, rotulos=(), buckets=BUCKETS_LATENCIA):
+        super().__init__(nome, ajuda, rotulos)
+        self.buckets = tuple(sorted(buckets))
+
+    def observar(self, valor, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            contagens, soma, total = self._valores.get(
+                chave, ([0] * len(self.buckets), 0.0, 0)
+            )
+            contagens = list(contagens)
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    contagens[i] += 1
+            self._valores[chave] = (contagens, soma + valor, total + 1)
+
+    def contagem(self, **rotulos):
+        with self._lock:
+            return self._valores.get(self._chave(rotulos), (None, 0.0, 0))[2]
+
+    def _linhas(self, chave, valor):
+        contagens, soma, total = valor
+        linhas = [
+            f"{self.nome}_bucket{_formatar_rotulos(self.rotulos, chave, ('le', limite))} {n}"
+            for limite, n in zip(self.buckets, contagens)
+        ]
+        linhas.append(
+            f"{self.nome}_bucket{_formatar_rotulos(self.rotulos, chave, ('le', '+Inf'))} {total}"
+        )
+        linhas.append(f"{self.nome}_sum{_formatar_rotulos(self.rotulos, chave)} {soma}")
+        linhas.append(f"{self.nome}_count{_formatar_rotulos(self.rotulos, chave)} {total}")
+        return linhas
+
+
+class RegistroMetricas:
+    """
+    Conjunto de métricas do processo, exportado no formato de texto do
+    Prometheus (exportar_texto).
+    """
+
+    def __init__(self):
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, metrica):
+        with self._lock:
+            return self._metricas.setdefault(metrica.nome, metrica)
+
+    def contador(self, nome, ajuda, rotulos=()) -> Contador:
+        return self._registrar(Contador(nome, ajuda, rotulos))
+
+    def medidor(self, nome, ajuda, rotulos=()) -> Medidor:
+        return self._registrar(Medidor(nome, ajuda, rotulos))
+
+    def histograma(self, nome, ajuda, rotulos=(), buckets=BUCKETS_LATENCIA) -> Histograma:
+        return self._registrar(Histograma(nome, ajuda, rotulos, buckets))
+
+    def exportar_texto(self) -> str:
+        with self._lock:
+            metricas = list(self._metricas.values())
+        linhas = []
+        for metrica in metricas:
+            linhas.extend(metrica.exportar())
+        return "\n".join(linhas) + "\n"
+
+
+METRICAS = RegistroMetricas()
+
+M_REQUISICOES = METRICAS.contador(
+    "pncp_api_requisicoes_total", "Requisições HTTP à API, por código de status.", ("status",))
+M_LATENCIA_REQUISICAO = METRICAS.histograma(
+    "pncp_api_requisicao_duracao_segundos", "Latência de cada requisição HTTP à API.")
+M_BYTES = METRICAS.contador(
+    "pncp_api_bytes_recebidos_total", "Bytes recebidos da API.")
+M_RETENTATIVAS = METRICAS.contador(
+    "pncp_api_retentativas_total", "Retentativas de requisição, por motivo.", ("motivo",))
+M_LATENCIA_PAGINA = METRICAS.histograma(
+    "pncp_pagina_duracao_segundos",
+    "Tempo para obter uma página (com retentativas), por origem (api ou cache).", ("origem",))
+M_CACHE = METRICAS.contador(
+    "pncp_cache_respostas_total", "Consultas ao cache de respostas, por resultado.", ("resultado",))
+M_REGISTROS = METRICAS.contador(
+    "pncp_registros_coletados_total", "Registros recebidos da API.")
+M_COLETAS = METRICAS.contador(
+    "pncp_coletas_total", "Coletas finalizadas, por conclusão (completa ou não).", ("completa",))
+M_ERROS = METRICAS.contador(
+    "pncp_erros_total", "Erros reportados (conexão, HTTP, JSON, tarefas).")
+M_FALHAS_INSCRITOS = METRICAS.contador(
+    "pncp_falhas_inscritos_total", "Exceções levantadas por inscritos do barramento de eventos.",
+    ("inscrito",))
+M_DURACAO_ETAPA = METRICAS.histograma(
+    "pncp_etapa_duracao_segundos",
+    "Duração das etapas (montagem_dataframe, media_saneada, excel, relatorio_html), por resultado (ok ou erro).",
+    ("etapa", "resultado"), buckets=BUCKETS_ETAPA)
+M_LINHAS_PESQUISA = METRICAS.histograma(
+    "pncp_linhas_por_pesquisa", "Linhas do DataFrame de dados de cada pesquisa.",
+    buckets=BUCKETS_LINHAS)
+M_PICO_LINHAS = METRICAS.medidor(
+    "pncp_linhas_pico_pesquisa", "Maior número de linhas de uma pesquisa desde o início do processo.")
+M_TAMANHO_PAGINA = METRICAS.medidor(
+    "pncp_tamanho_pagina", "tamanhoPagina usado ao final da última coleta.")
+M_VAZAO_COLETA = METRICAS.medidor(
+    "pncp_coleta_vazao_registros_por_segundo", "Registros por segundo da última coleta.")
+
+
+def atualizar_metricas(evento: EventoPNCP):
+    """
+    Inscrito do barramento de eventos que alimenta METRICAS.
+    """
+    dados = evento.dados
+    if evento.tipo == TipoEvento.REQUISICAO:
+        M_REQUISICOES.inc(status=dados.get("status") or "erro_conexao")
+        M_LATENCIA_REQUISICAO.observar(dados["latencia_s"])
+        M_BYTES.inc(dados.get("tamanho_bytes", 0))
+    elif evento.tipo == TipoEvento.RETENTATIVA:
+        M_RETENTATIVAS.inc(motivo=dados.get("motivo", ""))
+    elif evento.tipo == TipoEvento.PAGINA_CONCLUIDA:
+        origem = "cache" if dados.get("do_cache") else "api"
+        M_LATENCIA_PAGINA.observar(dados["latencia_s"], origem=origem)
+        M_REGISTROS.inc(dados.get("registros", 0))
+        if dados.get("cache_consultado"):
+            M_CACHE.inc(resultado="acerto" if dados.get("do_cache") else "falha")
+    elif evento.tipo == TipoEvento.COLETA_CONCLUIDA:
+        M_COLETAS.inc(completa=str(bool(dados.get("completa"))).lower())
+        if dados.get("tamanho_pagina"):
+            M_TAMANHO_PAGINA.definir(dados["tamanho_pagina"])
+        M_VAZAO_COLETA.definir(dados.get("vazao_registros_s", 0.0))
+    elif evento.tipo == TipoEvento.ERRO:
+        M_ERROS.inc()
+    elif evento.tipo == TipoEvento.ETAPA_CONCLUIDA:
+        M_DURACAO_ETAPA.observar(dados["duracao_s"], etapa=dados.get("etapa", ""),
+                                 resultado="erro" if dados.get("erro") else "ok")
+        if dados.get("etapa") == "montagem_dataframe":
+            M_LINHAS_PESQUISA.observar(dados.get("linhas", 0))
+            M_PICO_LINHAS.definir_maximo(dados.get("linhas", 0))
+
+
+INSCRICAO_METRICAS = EVENTOS.inscrever(atualizar_metricas, tipos={
+    TipoEvento.REQUISICAO, TipoEvento.RETENTATIVA, TipoEvento.PAGINA_CONCLUIDA,
+    TipoEvento.COLETA_CONCLUIDA, TipoEvento.ERRO, TipoEvento.ETAPA_CONCLUIDA,
+})
+
+
+class _ManipuladorMetricas(BaseHTTPRequestHandler):
+    """
+    Responde GET /metrics com METRICAS.exportar_texto().
+    """
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        corpo = METRICAS.exportar_texto().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def iniciar_servidor_metricas(endereco=ENDERECO_METRICAS, porta=PORTA_METRICAS):
+    """
+    Sobe, em uma thread de fundo, um servidor HTTP que expõe /metrics
+    para coleta pelo Prometheus. Devolve o ThreadingHTTPServer (use
+    .shutdown() para encerrar).
+    """
+    servidor = ThreadingHTTPServer((endereco, porta), _ManipuladorMetricas)
+    threading.Thread(
+        target=servidor.serve_forever, name="metricas_pncp", daemon=True
+    ).start()
+    emitir_evento(TipoEvento.INFORMACAO,
+                  f"📈 Métricas disponíveis em http://{endereco}:{servidor.server_port}/metrics")
+    return servidor
+
+
+# ============================================================
+# 🗄️ CACHE PERSISTENTE DE RESPOSTAS (SQLITE)
+# ============================================================
+
+class CacheRespostasPNCP:
+    """
+    Cache em disco (SQLite) das respostas JSON de cada página da API.
+
+    - A chave é o conjunto normalizado de parâmetros da requisição
+      (filtros de montar_filtros_opcionais + janela de datas + página
+      e tamanho da página) junto com a URL.
+    - Entradas mais antigas que 'ttl_segundos' são ignoradas e removidas.
+    - Quando o volume armazenado ultrapassa 'max_bytes', as entradas
+      menos recentemente usadas são descartadas (LRU).
+    - 'acertos' e 'falhas' contam as consultas desta instância.
+
+    Pode ser compartilhado entre threads; vários processos podem usar o
+    mesmo arquivo.
+    """
+
+    def __init__(self, caminho=CACHE_RESPOSTAS_ARQUIVO,
+                 ttl_segundos=CACHE_RESPOSTAS_TTL_HORAS * 3600,
+                 max_bytes=CACHE_RESPOSTAS_MAX_MB * 1024 * 1024):
+        self.caminho = caminho
+        self.ttl_segundos = ttl_segundos
+        self.max_bytes = max_bytes
+        self.acertos = 0
+        self.falhas = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(caminho, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS respostas (
+                chave TEXT PRIMARY KEY,
+                conteudo BLOB NOT NULL,
+                tamanho INTEGER NOT NULL,
+                criado_em REAL NOT NULL,
+                ultimo_acesso REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_respostas_acesso "
+            "ON respostas (ultimo_acesso)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def chave(url, params) -> str:
+        """
+        Chave estável para (url, params): parâmetros vazios são descartados,
+        valores viram texto e as chaves são ordenadas.
+        """
+        normalizados = {
+            str(k): str(v) for k, v in (params or {}).items()
+            if v is not None and v != ""
+        }
+        bruto = json.dumps([url, normalizados], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+    def obter(self, url, params):
+        """
+        Devolve o JSON armazenado para (url, params) ou None.
+        """
+        chave = self.chave(url, params)
+        agora = time.time()
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT conteudo, criado_em FROM respostas WHERE chave = ?",
+                (chave,),
+            ).fetchone()
+
+            if linha is None or agora - linha[1] > self.ttl_segundos:
+                if linha is not None:
+                    self._conn.execute("DELETE FROM respostas WHERE chave = ?", (chave,))
+                    self._conn.commit()
+                self.falhas += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE respostas SET ultimo_acesso = ? WHERE chave = ?",
+                (agora, chave),
+            )
+            self._conn.commit()
+            self.acertos += 1
+
+        return json.loads(zlib.decompress(linha[0]).decode("utf-8"))
+
+    def guardar(self, url, params, dados):
+        """
+        Armazena o JSON de uma página e aplica a política de descarte.
+        """
+        conteudo = zlib.compress(
+            json.dumps(dados, ensure_ascii=False).encode("utf-8")
+        )
+        agora = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO respostas "
+                "(chave, conteudo, tamanho, criado_em, ultimo_acesso) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.chave(url, params), conteudo, len(conteudo), agora, agora),
+            )
+            self._descartar(agora)
+            self._conn.commit()
+
+    def _descartar(self, agora):
+        """
+        Remove entradas expiradas e, se preciso, as menos usadas (LRU)
+        até o total voltar a caber em max_bytes.
+        """
+        self._conn.execute(
+            "DELETE FROM respostas WHERE criado_em < ?",
+            (agora - self.ttl_segundos,),
+        )
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(tamanho), 0) FROM respostas"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        excesso = total - self.max_bytes
+        removidas = []
+        for chave, tamanho in self._conn.execute(
+            "SELECT chave, tamanho FROM respostas ORDER BY ultimo_acesso"
+        ):
+            removidas.append((chave,))
+            excesso -= tamanho
+            if excesso <= 0:
+                break
+        self._conn.executemany("DELETE FROM respostas WHERE chave = ?", removidas)
+
+    def estatisticas(self) -> dict:
+        """
+        Contadores de acerto/falha desta instância e ocupação do arquivo.
+        """
+        with self._lock:
+            entradas, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM respostas"
+            ).fetchone()
+        consultas = self.acertos + self.falhas
+        return {
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "taxa_acerto": (self.acertos / consultas) if consultas else 0.0,
+            "entradas": entradas,
+            "bytes": total,
+        }
+
+    def limpar(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM respostas")
+            self._conn.commit()
+
+    def fechar(self):
+        with self._lock:
+            self._conn.close()
+
+
+# ============================================================
+# 🎞️ GRAVAÇÃO E REPRODUÇÃO DE RESPOSTAS HTTP
+# ============================================================
+
+class GravacaoRespostasPNCP:
+    """
+    Respostas HTTP gravadas em disco, uma por arquivo (JSON gzip) em
+    'diretorio', para reproduzir coletas sem acesso à API.
+
+    - modo "gravar": o ClientePNCP consulta a API normalmente e grava
+      cada resposta 200 recebida.
+    - modo "reproduzir": o ClientePNCP não usa a rede; cada requisição é
+      respondida com a gravação correspondente (ou 404, se não houver).
+
+    A chave de cada resposta é o caminho da URL mais os parâmetros
+    normalizados (o host é ignorado), de modo que gravações feitas na API
+    real também podem ser servidas pelo servidor falso local
+    (benchmarks/servidor_falso.py).
+    """
+
+    MODOS = ("gravar", "reproduzir")
+
+    def __init__(self, diretorio=DIRETORIO_GRAVACAO, modo="gravar"):
+        if modo not in self.MODOS:
+            raise ValueError(f"modo de gravação inválido: {modo!r} (use {self.MODOS})")
+        self.diretorio = diretorio
+        self.modo = modo
+        self.gravadas = 0
+        self.reproduzidas = 0
+        self.ausentes = 0
+        self._lock = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+
+    @property
+    def reproduzindo(self) -> bool:
+        return self.modo == "reproduzir"
+
+    @staticmethod
+    def chave(url, params) -> str:
+        """
+        Chave estável para (caminho da url, params), nos moldes de
+        CacheRespostasPNCP.chave.
+        """
+        return CacheRespostasPNCP.chave(urlsplit(url).path.rstrip("/"), params)
+
+    def _arquivo(self, chave) -> str:
+        return os.path.join(self.diretorio, f"{chave}.json.gz")
+
+    def guardar(self, url, params, resp):
+        """
+        Grava uma resposta 200 (as demais são ignoradas).
+        """
+        if resp.status_code != 200:
+            return
+        registro = {
+            "caminho": urlsplit(url).path,
+            "params": {str(k): str(v) for k, v in (params or {}).items()
+                       if v is not None and v != ""},
+            "status": resp.status_code,
+            "content_type": resp.headers.get("Content-Type", "application/json"),
+            "corpo": resp.text,
+        }
+        arquivo = self._arquivo(self.chave(url, params))
+        temporario = f"{arquivo}.{uuid.uuid4().hex}.tmp"
+        with gzip.open(temporario, "wt", encoding="utf-8", compresslevel=6) as f:
+            json.dump(registro, f, ensure_ascii=False)
+        os.replace(temporario, arquivo)
+        with self._lock:
+            self.gravadas += 1
+
+    def obter(self, url, params):
+        """
+        Registro gravado para (url, params) ou None.
+        """
+        try:
+            with gzip.open(self._arquivo(self.chave(url, params)), "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def resposta(self, url, params) -> requests.Response:
+        """
+        requests.Response montado a partir da gravação (404 se ausente).
+        """
+        registro = self.obter(url, params)
+        resp = requests.Response()
+        resp.url = url
+        resp.encoding = "utf-8"
+        with self._lock:
+            if registro is None:
+                self.ausentes += 1
+            else:
+                self.reproduzidas += 1
+        if registro is None:
+            resp.status_code = 404
+            resp.headers["Content-Type"] = "text/plain; charset=utf-8"
+            resp._content = f"Resposta não gravada em {self.diretorio}".encode()
+        else:
+            resp.status_code = registro["status"]
+            resp.headers["Content-Type"] = registro["content_type"]
+            resp._content = registro["corpo"].encode("utf-8")
+        return resp
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {
+                "modo": self.modo,
+                "gravadas": self.gravadas,
+                "reproduzidas": self.reproduzidas,
+                "ausentes": self.ausentes,
+            }
+
+
+def obter_gravacao_configurada():
+    """
+    GravacaoRespostasPNCP conforme MODO_GRAVACAO/DIRETORIO_GRAVACAO,
+    ou None se a gravação estiver desligada.
+    """
+    if not MODO_GRAVACAO:
+        return None
+    return GravacaoRespostasPNCP(DIRETORIO_GRAVACAO, MODO_GRAVACAO)
+
+
+# ============================================================
+# 🔌 CLIENTE HTTP (SESSÃO COMPARTILHADA + RETENTATIVAS)
+# ============================================================
+
+@dataclass
+class RegistroRequisicao:
+    """
+    Registro de uma requisição HTTP feita pelo ClientePNCP.
+    """
+    url: str
+    pagina: object
+    status: object          # código HTTP, ou None em erro de conexão
+    latencia_s: float
+    tamanho_bytes: int
+    tentativa: int
+
+
+class ClientePNCP:
+    """
+    Cliente HTTP reutilizável para a API de dados abertos do Compras.gov.br.
+
+    - Mantém uma requests.Session com pool de conexões e keep-alive
+      (uma única negociação TLS por conexão, reaproveitada entre páginas).
+    - Negocia compressão gzip/deflate explicitamente.
+    - Repete requisições que falham com 429, 5xx, timeout ou erro de
+      conexão, com backoff exponencial limitado (respeita Retry-After).
+    - Registra latência e tamanho de cada requisição em 'registros'
+      (janela das últimas 'max_registros') e em totais acumulados.
+    - Opcionalmente guarda as páginas baixadas em um CacheRespostasPNCP
+      ('cache'), consultado antes de cada requisição de página.
+    - Opcionalmente limita a taxa de requisições ('requisicoes_por_segundo'),
+      valendo para todas as threads que compartilham o cliente.
+    - Consulta a API em 'url_base' (padrão: URL_BASE_API), o que permite
+      usar o servidor falso local.
+    - Opcionalmente grava as respostas ou as reproduz sem rede
+      ('gravacao', GravacaoRespostasPNCP).
+
+    Pode ser compartilhado entre threads.
+    """
+
+    STATUS_RETENTAVEIS = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, timeout=60, max_tentativas=4, backoff_inicial=1.0,
+                 backoff_maximo=30.0, tamanho_pool=16, max_registros=10000,
+                 cache=None, requisicoes_por_segundo=None, url_base=None,
+                 gravacao=None):
+        self.timeout = timeout
+        self.cache = cache
+        self.url_base = (url_base or URL_BASE_API).rstrip("/")
+        self.gravacao = gravacao
+        self.intervalo_minimo = (
+            1.0 / requisicoes_por_segundo if requisicoes_por_segundo else 0.0
+        )
+        self._proxima_vez = 0.0
+        self.max_tentativas = max(1, int(max_tentativas))
+        self.backoff_inicial = backoff_inicial
+        self.backoff_maximo = backoff_maximo
+
+        self.session = requests.Session()
+        adaptador = HTTPAdapter(
+            pool_connections=tamanho_pool,
+            pool_maxsize=tamanho_pool,
+        )
+        self.session.mount("https://", adaptador)
+        self.session.mount("http://", adaptador)
+        self.session.headers.update({
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        })
+
+        self.registros = deque(maxlen=max_registros)
+        self._totais = {
+            "requisicoes": 0,
+            "retentativas": 0,
+            "bytes_recebidos": 0,
+            "latencia_total_s": 0.0,
+            "latencia_maxima_s": 0.0,
+        }
+        self._lock = threading.Lock()
+
+    @property
+    def url_itens(self) -> str:
+        """
+        URL da consulta de itens na API configurada.
+        """
+        return self.url_base + CAMINHO_ITENS_PNCP
+
+    def _enviar(self, url, params):
+        """
+        Uma tentativa de GET: pela rede ou, ao reproduzir, pela gravação.
+        """
+        if self.gravacao is not None and self.gravacao.reproduzindo:
+            return self.gravacao.resposta(url, params)
+        resp = self.session.get(url, params=params, timeout=self.timeout)
+        if self.gravacao is not None:
+            self.gravacao.guardar(url, params, resp)
+        return resp
+
+    def _espera_backoff(self, tentativa, resp=None):
+        """
+        Tempo de espera antes da próxima tentativa (em segundos).
+        """
+        if resp is not None:
+            retry_after = resp.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.backoff_maximo)
+                except ValueError:
+                    pass
+        espera = self.backoff_inicial * (2 ** (tentativa - 1))
+        return min(espera, self.backoff_maximo) * random.uniform(0.5, 1.0)
+
+    def _aguardar_vez(self):
+        """
+        Reserva o próximo horário livre segundo o limite de taxa e espera
+        até ele (sem segurar o lock durante a espera).
+        """
+        if not self.intervalo_minimo:
+            return
+        with self._lock:
+            agora = time.monotonic()
+            vez = max(agora, self._proxima_vez)
+            self._proxima_vez = vez + self.intervalo_minimo
+        if vez > agora:
+            time.sleep(vez - agora)
+
+    def _registrar(self, registro):
+        with self._lock:
+            self.registros.append(registro)
+            self._totais["requisicoes"] += 1
+            self._totais["retentativas"] += int(registro.tentativa > 1)
+            self._totais["bytes_recebidos"] += registro.tamanho_bytes
+            self._totais["latencia_total_s"] += registro.latencia_s
+            self._totais["latencia_maxima_s"] = max(
+                self._totais["latencia_maxima_s"], registro.latencia_s
+            )
+        emitir_evento(TipoEvento.REQUISICAO, **asdict(registro))
+
+    def get(self, url, params=None):
+        """
+        GET com retentativas. Devolve o último requests.Response obtido
+        (que pode ter status != 200 se as tentativas se esgotarem).
+        Levanta a exceção de conexão/timeout da última tentativa, se houver.
+        """
+        pagina = (params or {}).get("pagina")
+
+        for tentativa in range(1, self.max_tentativas + 1):
+            self._aguardar_vez()
+            inicio = time.perf_counter()
+            try:
+                resp = self._enviar(url, params)
+            except (requests.Timeout, requests.ConnectionError) as exc:
+                self._registrar(RegistroRequisicao(
+                    url, pagina, None, time.perf_counter() - inicio, 0, tentativa,
+                ))
+                if tentativa == self.max_tentativas:
+                    raise
+                espera = self._espera_backoff(tentativa)
+                emitir_evento(
+                    TipoEvento.RETENTATIVA,
+                    f"   ↻ Falha de conexão na página {pagina} ({exc.__class__.__name__}). "
+                    f"Nova tentativa em {espera:.1f}s...",
+                    pagina=pagina, motivo=exc.__class__.__name__,
+                    tentativa=tentativa, espera_s=espera,
+                )
+                time.sleep(espera)
+                continue
+
+            self._registrar(RegistroRequisicao(
+                url, pagina, resp.status_code, time.perf_counter() - inicio,
+                len(resp.content), tentativa,
+            ))
+
+            if (resp.status_code in self.STATUS_RETENTAVEIS
+                    and tentativa < self.max_tentativas):
+                espera = self._espera_backoff(tentativa, resp)
+                emitir_evento(
+                    TipoEvento.RETENTATIVA,
+                    f"   ↻ HTTP {resp.status_code} na página {pagina}. "
+                    f"Nova tentativa em {espera:.1f}s...",
+                    pagina=pagina, motivo=f"HTTP {resp.status_code}",
+                    tentativa=tentativa, espera_s=espera,
+                )
+                time.sleep(espera)
+                continue
+
+            return resp
+
+    def resumo_requisicoes(self) -> dict:
+        """
+        Totais acumulados das requisições feitas por este cliente.
+        """
+        with self._lock:
+            resumo = dict(self._totais)
+        n = resumo["requisicoes"]
+        resumo["latencia_media_s"] = (resumo["latencia_total_s"] / n) if n else 0.0
+        return resumo
+
+    def fechar(self):
+        self.session.close()
+
+
+_CLIENTE_PADRAO = None
+_CLIENTE_PADRAO_LOCK = threading.Lock()
+
+
+def obter_cliente_padrao() -> ClientePNCP:
+    """
+    Devolve o ClientePNCP compartilhado pelo módulo (criado sob demanda).
+    """
+    global _CLIENTE_PADRAO
+    with _CLIENTE_PADRAO_LOCK:
+        if _CLIENTE_PADRAO is None:
+            cache = CacheRespostasPNCP(CACHE_RESPOSTAS_ARQUIVO) if USAR_CACHE_RESPOSTAS else None
+            _CLIENTE_PADRAO = ClientePNCP(cache=cache, gravacao=obter_gravacao_configurada())
+        return _CLIENTE_PADRAO
 
 
 # ============================================================
 # 🌐 CHAMADA PAGINADA À API
 # ============================================================
 
+CAMINHO_ITENS_PNCP = "/modulo-contratacoes/2_consultarItensContratacoes_PNCP_14133"
+
+
+class PesquisaCancelada(Exception):
+    """
+    Coleta interrompida a pedido do usuário (ProgressoColeta.cancelar).
+    """
+
+
+class ProgressoColeta:
+    """
+    Andamento de uma coleta, atualizado pela thread que coleta e lido por
+    outras (ex.: a aplicação web), e pedido de cancelamento.
+
+    - 'paginas' / 'registros': já recebidos.
+    - 'total_paginas' / 'total_registros': informados pela API na primeira
+      página da janela consultada (None até lá).
+    - 'etapa': descrição curta da fase atual.
+    """
+
+    def __init__(self):
+        self.paginas = 0
+        self.registros = 0
+        self.total_paginas = None
+        self.total_registros = None
+        self.etapa = "na fila"
+        self.inicio = None
+        self._cancelamento = threading.Event()
+
+    def iniciar(self):
+        self.inicio = time.time()
+        self.etapa = "coletando páginas"
+
+    def informar_totais(self, dados):
+        """
+        Registra os totais da consulta a partir da resposta de uma página 1
+        (apenas a primeira vez: a janela inteira vem antes das fatias).
+        """
+        if self.total_paginas is None and dados.get("totalPaginas") is not None:
+            self.total_paginas = int(dados["totalPaginas"])
+            if dados.get("totalRegistros") is not None:
+                self.total_registros = int(dados["totalRegistros"])
+
+    def registrar_pagina(self, pagina):
+        self.paginas += 1
+        self.registros += len(pagina)
+
+    def cancelar(self):
+        self._cancelamento.set()
+
+    @property
+    def cancelado(self) -> bool:
+        return self._cancelamento.is_set()
+
+    def verificar_cancelamento(self):
+        """
+        Levanta PesquisaCancelada se o cancelamento foi pedido.
+        """
+        if self._cancelamento.is_set():
+            raise PesquisaCancelada("Pesquisa cancelada pelo usuário.")
+
+    def fracao(self):
+        """
+        Fração concluída da coleta (0 a 1), ou None sem total conhecido.
+        Usa os registros quando a API informa o total (o número de páginas
+        muda se o tamanho de página for ajustado durante a coleta).
+        """
+        if self.total_registros:
+            return min(1.0, self.registros / self.total_registros)
+        if not self.total_paginas:
+            return None
+        return min(1.0, self.paginas / self.total_paginas)
+
+    def eta_s(self):
+        """
+        Estimativa (segundos) para terminar a coleta, pelo ritmo até aqui.
+        """
+        fracao = self.fracao()
+        if not fracao or self.inicio is None:
+            return None
+        decorrido = time.time() - self.inicio
+        return decorrido * (1 - fracao) / fracao
+
+    def instantaneo(self) -> dict:
+        return {
+            "etapa": self.etapa,
+            "paginas": self.paginas,
+            "total_paginas": self.total_paginas,
+            "registros": self.registros,
+            "total_registros": self.total_registros,
+            "fracao": self.fracao(),
+            "decorrido_s": (time.time() - self.inicio) if self.inicio else 0.0,
+            "eta_s": self.eta_s(),
+        }
+
+
+class SeletorTamanhoPagina:
+    """
+    Escolhe o tamanhoPagina de cada requisição a partir da latência e do
+    volume das páginas anteriores, buscando a maior vazão (registros por
+    segundo) sem chegar perto do timeout do cliente.
+
+    - Os tamanhos possíveis são 'tamanhos'. Um novo tamanho só é usado a
+      partir de um deslocamento (registros já coletados) múltiplo dele, para
+      que a numeração das páginas continue alinhada aos registros.
+    - Uma página mais lenta que 'latencia_limite_s', ou que falhe, faz o
+      tamanho descer um degrau.
+    - Após 'paginas_exploracao' páginas estáveis, o degrau acima é
+      experimentado se a latência prevista couber no limite; fica o tamanho
+      com a melhor vazão média (média móvel exponencial) observada.
+    - Páginas do cache e a última página (incompleta) não entram na média.
+
+    Pode ser compartilhado entre threads (páginas paralelas e fatias).
+    """
+
+    def __init__(self, tamanhos=TAMANHOS_PAGINA, inicial=None,
+                 latencia_limite_s=20.0, paginas_exploracao=5, peso=0.3):
+        self.tamanhos = sorted({int(t) for t in tamanhos}, reverse=True)
+        self.desejado = inicial if inicial in self.tamanhos else self.tamanhos[0]
+        self.latencia_limite_s = latencia_limite_s
+        self.paginas_exploracao = paginas_exploracao
+        self.peso = peso
+        self.paginas_por_tamanho = {}
+        self.registros = 0
+        self.bytes = 0
+        self.falhas = 0
+        self._vazao = {}
+        self._latencia = {}
+        self._estaveis = 0
+        self._lock = threading.Lock()
+
+    def _vizinho(self, tamanho, passo):
+        """
+        Tamanho 'passo' degraus acima (-1) ou abaixo (+1) de 'tamanho'.
+        """
+        i = self.tamanhos.index(tamanho) + passo if tamanho in self.tamanhos else -1
+        return self.tamanhos[i] if 0 <= i < len(self.tamanhos) else None
+
+    def tamanho_para(self, deslocamento, atual, maximo=None) -> int:
+        """
+        Maior tamanho até o desejado (e até 'maximo') alinhado em
+        'deslocamento'; sem nenhum, o menor alinhado, ou 'atual'.
+        """
+        with self._lock:
+            teto = self.desejado if maximo is None else min(self.desejado, maximo)
+        alinhados = [t for t in self.tamanhos if deslocamento % t == 0]
+        for tamanho in alinhados:
+            if tamanho <= teto:
+                return tamanho
+        return alinhados[-1] if alinhados else atual
+
+    def registrar(self, tamanho, registros, latencia_s, tamanho_bytes=0, do_cache=False):
+        """
+        Registra uma página recebida e ajusta o tamanho desejado.
+        """
+        with self._lock:
+            self.paginas_por_tamanho[tamanho] = self.paginas_por_tamanho.get(tamanho, 0) + 1
+            self.registros += registros
+            self.bytes += tamanho_bytes
+            if do_cache or latencia_s <= 0 or registros < tamanho:
+                return
+
+            for medias, valor in ((self._vazao, registros / latencia_s),
+                                  (self._latencia, latencia_s)):
+                anterior = medias.get(tamanho)
+                medias[tamanho] = valor if not anterior else (
+                    self.peso * valor + (1 - self.peso) * anterior)
+
+            if latencia_s > self.latencia_limite_s:
+                self._descer(tamanho)
+                return
+
+            self._estaveis += 1
+            acima = self._vizinho(tamanho, -1)
+            previsto = self._latencia[tamanho] * (acima or 0) / tamanho
+            explorar = (
+                acima is not None and previsto <= self.latencia_limite_s
+                and (self._estaveis >= self.paginas_exploracao and acima not in self._vazao
+                     or self._estaveis >= 4 * self.paginas_exploracao)
+            )
+            if explorar:
+                self.desejado = acima
+                self._estaveis = 0
+            else:
+                self.desejado = max(self._vazao, key=self._vazao.get)
+
+    def registrar_falha(self, tamanho) -> bool:
+        """
+        Registra uma página que falhou. Devolve True se ainda há um tamanho
+        menor para tentar de novo.
+        """
+        with self._lock:
+            self.falhas += 1
+            return self._descer(tamanho)
+
+    def _descer(self, tamanho) -> bool:
+        abaixo = self._vizinho(tamanho, +1)
+        # Tamanho lento/falho sai da disputa até ser reexperimentado
+        self._vazao[tamanho] = 0.0
+        self._estaveis = 0
+        if abaixo is None:
+            return False
+        self.desejado = min(self.desejado, abaixo)
+        return True
+
+    def resumo(self) -> dict:
+        with self._lock:
+            return {
+                "tamanho_pagina": self.desejado,
+                "paginas_por_tamanho": dict(self.paginas_por_tamanho),
+                "falhas": self.falhas,
+                "bytes_por_registro": (self.bytes / self.registros) if self.registros else 0.0,
+            }
+
+
+def _montar_params_pagina(pagina, tamanho_pagina, data_inicial, data_final,
+                          cod_item_catalogo, filtros_opcionais):
+    """
+    Monta o dicionário de parâmetros de uma página da consulta.
+    """
+    # Parâmetros obrigatórios
+    params = {
+        "pagina": pagina,
+        "tamanhoPagina": tamanho_pagina,
+        "dataInclusaoPncpInicial": data_inicial,
+        "dataInclusaoPncpFinal": data_final,
+    }
+
+    # Parâmetro opcional codItemCatalogo
+    if cod_item_catalogo is not None:
+        params["codItemCatalogo"] = cod_item_catalogo
+
+    # Demais filtros opcionais
+    for k, v in filtros_opcionais.items():
+        params[k] = v
+
+    return params
+
+
+def _buscar_pagina(cliente, base_url, params, seletor=None):
+    """
+    Executa a chamada de uma única página (com as retentativas do cliente).
+    Se o cliente tiver cache, a página é lida dele quando disponível e
+    guardada nele após uma resposta válida. Com 'seletor'
+    (SeletorTamanhoPagina), a latência e o volume da página recebida são
+    registrados nele.
+
+    Retorna:
+      - Dicionário com o JSON da resposta, ou None em caso de erro
+        (conexão, HTTP diferente de 200 ou JSON inválido).
+    """
+    pagina = params.get("pagina")
+    emitir_evento(TipoEvento.PAGINA_INICIADA, pagina=pagina)
+    inicio = time.perf_counter()
+
+    if cliente.cache is not None:
+        dados = cliente.cache.obter(base_url, params)
+        if dados is not None:
+            registros = len(dados.get("resultado") or [])
+            latencia = time.perf_counter() - inicio
+            emitir_evento(
+                TipoEvento.PAGINA_CONCLUIDA, pagina=pagina,
+                registros=registros, bytes=0,
+                latencia_s=latencia, do_cache=True,
+                cache_consultado=True, tamanho_pagina=params.get("tamanhoPagina"),
+            )
+            if seletor is not None:
+                seletor.registrar(params.get("tamanhoPagina"), registros, latencia, do_cache=True)
+            return dados
+
+    try:
+        resp = cliente.get(base_url, params=params)
+    except (requests.RequestException, OSError) as exc:
+        # OSError: falha ao ler a gravação (modo "reproduzir")
+        emitir_evento(
+            TipoEvento.ERRO,
+            f"❌ Erro de conexão ao chamar a API.\n   Detalhes: {exc}",
+            pagina=pagina, detalhes=str(exc),
+        )
+        return None
+
+    if resp.status_code != 200:
+        emitir_evento(
+            TipoEvento.ERRO,
+            f"❌ Erro HTTP {resp.status_code} na página {pagina}.\n"
+            f"   Trecho da resposta: {resp.text[:500]}",
+            pagina=pagina, status=resp.status_code, detalhes=resp.text[:500],
+        )
+        return None
+
+    try:
+        dados = resp.json()
+    except ValueError:
+        emitir_evento(
+            TipoEvento.ERRO,
+            "❌ Erro ao interpretar a resposta como JSON.\n"
+            f"   Conteúdo recebido (início):\n{resp.text[:500]}",
+            pagina=pagina, detalhes=resp.text[:500],
+        )
+        return None
+
+    registros = len(dados.get("resultado") or [])
+    latencia = time.perf_counter() - inicio
+    emitir_evento(
+        TipoEvento.PAGINA_CONCLUIDA, pagina=pagina,
+        registros=registros, bytes=len(resp.content),
+        latencia_s=latencia, do_cache=False,
+        cache_consultado=cliente.cache is not None,
+        tamanho_pagina=params.get("tamanhoPagina"),
+    )
+    if seletor is not None:
+        seletor.registrar(params.get("tamanhoPagina"), registros, latencia, len(resp.content))
+    if cliente.cache is not None:
+        cliente.cache.guardar(base_url, params, dados)
+    return dados
+
+
 def buscar_itens_pncp(cod_item_catalogo, data_inicial, data_final,
-                      filtros_opcionais=None, tamanho_pagina=500):
+                      filtros_opcionais=None, tamanho_pagina=TAMANHO_PAGINA,
+                      paginas_simultaneas=1, cliente=None,
+                      fatiar_por_data=False,
+                      limite_paginas_fatia=LIMITE_PAGINAS_FATIA,
+                      tamanho_adaptativo=False):
+    """
+    Faz chamadas paginadas ao endpoint e devolve a lista de itens.
+    Veja iterar_paginas_pncp para os detalhes dos parâmetros.
+    """
+    resultados, _ = coletar_itens_pncp(
+        cod_item_catalogo, data_inicial, data_final,
+        filtros_opcionais=filtros_opcionais,
+        tamanho_pagina=tamanho_pagina,
+        paginas_simultaneas=paginas_simultaneas,
+        cliente=cliente,
+        fatiar_por_data=fatiar_por_data,
+        limite_paginas_fatia=limite_paginas_fatia,
+        tamanho_adaptativo=tamanho_adaptativo,
+    )
+    return resultados
+
+
+def coletar_itens_pncp(cod_item_catalogo, data_inicial, data_final, **kwargs):
+    """
+    Percorre todas as páginas (veja iterar_paginas_pncp) e acumula os itens.
+
+    Retorna:
+      - Lista de dicionários (cada dicionário é um item retornado pela API).
+      - True se a paginação chegou ao fim; False se foi interrompida por
+        erro (nesse caso a lista contém apenas o que foi obtido até ali).
+    """
+    coleta = iterar_paginas_pncp(cod_item_catalogo, data_inicial, data_final, **kwargs)
+    todos_resultados = []
+    for pagina in coleta:
+        todos_resultados.extend(pagina)
+    return todos_resultados, coleta.completa
+
+
+class ColetaPaginasPNCP:
+    """
+    Iterador das páginas de uma coleta: cada passo devolve a lista de itens
+    de uma página, na mesma ordem de buscar_itens_pncp.
+
+    Depois de esgotado, 'completa' indica se a paginação chegou ao fim sem
+    erro. 'registros' conta os itens já entregues.
+
+    Com compacta=True, cada página é entregue como PaginaCompacta (com as
+    'colunas' informadas ou, se None, todos os campos recebidos).
+    """
+
+    def __init__(self, gerador, compacta=False, colunas=None):
+        self._gerador = gerador
+        self.compacta = compacta
+        self.colunas = colunas
+        self.completa = None
+        self.registros = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            pagina = next(self._gerador)
+        except StopIteration as fim:
+            self.completa = bool(fim.value)
+            raise
+        self.registros += len(pagina)
+        if self.compacta and not isinstance(pagina, PaginaCompacta):
+            pagina = PaginaCompacta.de_registros(pagina, self.colunas)
+        return pagina
+
+    def itens(self):
+        """
+        Gera os itens um a um, em vez de página a página.
+        """
+        for pagina in self:
+            yield from pagina
+
+    def close(self):
+        """
+        Interrompe a coleta (downloads pendentes são cancelados).
+        """
+        self._gerador.close()
+
+
+def iterar_itens_pncp(cod_item_catalogo, data_inicial, data_final, **kwargs):
+    """
+    Versão item a item de iterar_paginas_pncp.
+    """
+    return iterar_paginas_pncp(
+        cod_item_catalogo, data_inicial, data_final, **kwargs
+    ).itens()
+
+
+def iterar_paginas_pncp(cod_item_catalogo, data_inicial, data_final,
+                        filtros_opcionais=None, tamanho_pagina=TAMANHO_PAGINA,
+                        paginas_simultaneas=1, cliente=None,
+                        fatiar_por_data=False,
+                        limite_paginas_fatia=LIMITE_PAGINAS_FATIA,
+                        tentativas_fatia=2, progresso=None,
+                        tamanho_adaptativo=False, compacta=False,
+                        colunas=None) -> ColetaPaginasPNCP:
     """
     Faz chamadas paginadas ao endpoint:
       /modulo-contratacoes/2_consultarItensContratacoes_PNCP_14133
+    e entrega as páginas à medida que chegam, sem acumular o resultado:
+    apenas algumas páginas ficam em memória por vez.
+
+    Com paginas_simultaneas > 1, a página 1 é buscada primeiro e, a partir
+    do totalPaginas informado, as páginas restantes são baixadas em paralelo
+    por até 'paginas_simultaneas' conexões. As páginas são entregues
+    sempre em ordem.
+
+    Com fatiar_por_data=True, a janela de datas é dividida em fatias
+    coletadas de forma independente: toda fatia cuja página 1 informe mais
+    de 'limite_paginas_fatia' páginas é subdividida ao meio, recursivamente
+    (até o limite de um dia). Uma fatia interrompida por erro é retomada a
+    partir da página que falhou, até 'tentativas_fatia' vezes. As páginas
+    são entregues em ordem cronológica das fatias.
+
+    Com tamanho_adaptativo=True, 'tamanho_pagina' é o tamanho inicial (e
+    máximo): um SeletorTamanhoPagina ajusta o tamanhoPagina das páginas
+    seguintes entre os TAMANHOS_PAGINA menores, pela latência e vazão
+    observadas, e refaz com páginas menores as que falharem. No modo
+    paralelo, o tamanho é escolhido após a página 1 e mantido. O tamanho
+    final e a vazão da coleta são informados em COLETA_CONCLUIDA.
+
+    As requisições passam pelo 'cliente' informado ou, se None, pelo
+    ClientePNCP compartilhado do módulo, e vão para a API do seu url_base.
+
+    Com 'progresso' (ProgressoColeta), páginas, registros e totais são
+    atualizados durante a coleta; se progresso.cancelar() for chamado, a
+    iteração levanta PesquisaCancelada antes da próxima página.
+
+    Com compacta=True, as páginas são entregues como PaginaCompacta, só
+    com as 'colunas' informadas (None = todos os campos recebidos).
 
     Retorna:
-      - Lista de dicionários (cada dicionário é um item retornado pela API).
+      - ColetaPaginasPNCP (iterador de listas de dicionários ou de
+        PaginaCompacta).
     """
-    base_url = (
-        "https://dadosabertos.compras.gov.br/"
-        "modulo-contratacoes/2_consultarItensContratacoes_PNCP_14133"
-    )
+    return ColetaPaginasPNCP(_gerar_paginas_pncp(
+        cod_item_catalogo, data_inicial, data_final,
+        filtros_opcionais or {}, tamanho_pagina, paginas_simultaneas,
+        cliente or obter_cliente_padrao(),
+        fatiar_por_data, limite_paginas_fatia, tentativas_fatia,
+        progresso, tamanho_adaptativo,
+    ), compacta=compacta, colunas=colunas)
+
+
+def _gerar_paginas_pncp(cod_item_catalogo, data_inicial, data_final,
+                        filtros_opcionais, tamanho_pagina, paginas_simultaneas,
+                        cliente, fatiar_por_data, limite_paginas_fatia,
+                        tentativas_fatia, progresso=None, tamanho_adaptativo=False):
+    """
+    Gerador por trás de iterar_paginas_pncp. Devolve (no StopIteration)
+    True se a paginação terminou sem erro.
+    """
+    base_url = cliente.url_itens
+    resumo_http_inicial = cliente.resumo_requisicoes()
+    inicio_coleta = time.perf_counter()
+    seletor = None
+    if tamanho_adaptativo:
+        seletor = SeletorTamanhoPagina(
+            [t for t in TAMANHOS_PAGINA if t < tamanho_pagina] + [tamanho_pagina],
+            latencia_limite_s=cliente.timeout / 3,
+        )
 
-    pagina = 1
-    todos_resultados = []
-    filtros_opcionais = filtros_opcionais or {}
+    def params_do_intervalo(inicio, fim):
+        def params_da_pagina(n, tamanho=tamanho_pagina):
+            return _montar_params_pagina(
+                n, tamanho, inicio, fim,
+                cod_item_catalogo, filtros_opcionais,
+            )
+        return params_da_pagina
 
-    print("==============================================")
-    print(" Iniciando coleta na API Compras.gov.br (v3.4)")
-    print(" Intervalo de inclusão PNCP:", data_inicial, "até", data_final)
+    linhas = [
+        "==============================================",
+        " Iniciando coleta na API Compras.gov.br (v3.4)",
+        f" Intervalo de inclusão PNCP: {data_inicial} até {data_final}",
+    ]
     if cod_item_catalogo is not None:
-        print(" codItemCatalogo:", cod_item_catalogo)
+        linhas.append(f" codItemCatalogo: {cod_item_catalogo}")
     else:
-        print(" codItemCatalogo: não informado (consulta sem filtro de item).")
-    print(" Filtros opcionais:",
-          filtros_opcionais if filtros_opcionais else "nenhum")
-    print("==============================================")
+        linhas.append(" codItemCatalogo: não informado (consulta sem filtro de item).")
+    linhas.append(f" Filtros opcionais: {filtros_opcionais if filtros_opcionais else 'nenhum'}")
+    if paginas_simultaneas > 1:
+        linhas.append(f" Páginas simultâneas: {paginas_simultaneas}")
+    if fatiar_por_data:
+        linhas.append(f" Fatiamento por data: até {limite_paginas_fatia} páginas por fatia")
+    if seletor is not None:
+        linhas.append(f" Tamanho de página adaptativo: {', '.join(map(str, seletor.tamanhos))}")
+    linhas.append("==============================================")
+    emitir_evento(
+        TipoEvento.COLETA_INICIADA, "\n".join(linhas),
+        cod_item_catalogo=cod_item_catalogo, data_inicial=data_inicial,
+        data_final=data_final, filtros=dict(filtros_opcionais),
+        paginas_simultaneas=paginas_simultaneas, fatiar_por_data=fatiar_por_data,
+    )
 
-    while True:
-        # Parâmetros obrigatórios
-        params = {
-            "pagina": pagina,
-            "tamanhoPagina": tamanho_pagina,
-            "dataInclusaoPncpInicial": data_inicial,
-            "dataInclusaoPncpFinal": data_final,
-        }
+    total_registros = 0
+    if progresso is not None:
+        progresso.iniciar()
+    if fatiar_por_data:
+        paginas = _gerar_fatia(
+            cliente, base_url, params_do_intervalo,
+            data_inicial, data_final, tamanho_pagina, paginas_simultaneas,
+            limite_paginas_fatia, tentativas_fatia, progresso, seletor,
+        )
+    else:
+        paginas = _gerar_paginas(
+            cliente, base_url, params_do_intervalo(data_inicial, data_final),
+            tamanho_pagina, paginas_simultaneas, progresso=progresso,
+            seletor=seletor,
+        )
 
-        # Parâmetro opcional codItemCatalogo
-        if cod_item_catalogo is not None:
-            params["codItemCatalogo"] = cod_item_catalogo
+    completa = False
+    try:
+        while True:
+            if progresso is not None and progresso.cancelado:
+                emitir_evento(TipoEvento.AVISO, "⏹ Coleta cancelada pelo usuário.")
+                progresso.verificar_cancelamento()
+            try:
+                pagina = next(paginas)
+            except StopIteration as fim:
+                completa = fim.value
+                break
+            total_registros += len(pagina)
+            if progresso is not None:
+                progresso.registrar_pagina(pagina)
+            yield pagina
+    finally:
+        paginas.close()
+
+    resumo_http = cliente.resumo_requisicoes()
+    n_req = resumo_http["requisicoes"] - resumo_http_inicial["requisicoes"]
+    retentativas = resumo_http["retentativas"] - resumo_http_inicial["retentativas"]
+    latencia = resumo_http["latencia_total_s"] - resumo_http_inicial["latencia_total_s"]
+    latencia_media = (latencia / n_req) if n_req else 0.0
+    duracao = time.perf_counter() - inicio_coleta
+    vazao = (total_registros / duracao) if duracao > 0 else 0.0
+    dados_evento = {
+        "registros": total_registros, "completa": bool(completa),
+        "requisicoes": n_req, "retentativas": retentativas,
+        "latencia_media_s": latencia_media, "duracao_s": duracao,
+        "vazao_registros_s": vazao, "tamanho_pagina": tamanho_pagina,
+    }
+    linhas = [
+        "----------------------------------------------",
+        f" Coleta finalizada com {total_registros} registros.",
+        (f" Requisições HTTP: {n_req} | retentativas: {retentativas} "
+         f"| latência média: {latencia_media:.2f}s"),
+    ]
+    if seletor is not None:
+        resumo_tamanho = seletor.resumo()
+        dados_evento.update(resumo_tamanho)
+        usados = ", ".join(f"{t}×{n}" for t, n in
+                           sorted(resumo_tamanho["paginas_por_tamanho"].items(), reverse=True))
+        linhas.append(f" Páginas por tamanho: {usados or 'nenhuma'} "
+                      f"| {resumo_tamanho['bytes_por_registro'] / 1024:.1f} KB/registro")
+    linhas.append(f" Vazão: {vazao:.0f} registros/s em {duracao:.1f}s "
+                  f"| tamanho de página: {dados_evento['tamanho_pagina']}")
+    if cliente.cache is not None:
+        estat_cache = cliente.cache.estatisticas()
+        dados_evento.update(cache_acertos=estat_cache["acertos"],
+                            cache_falhas=estat_cache["falhas"])
+        linhas.append(f" Cache de respostas: {estat_cache['acertos']} acertos "
+                      f"| {estat_cache['falhas']} falhas "
+                      f"| {estat_cache['entradas']} páginas em disco")
+    if not completa:
+        linhas.append(" ⚠ Coleta interrompida por erro: os registros podem estar incompletos.")
+    linhas.append("----------------------------------------------")
+    emitir_evento(TipoEvento.COLETA_CONCLUIDA, "\n".join(linhas), **dados_evento)
+
+    return completa
+
+
+def _gerar_paginas(cliente, base_url, params_da_pagina, tamanho_pagina,
+                   paginas_simultaneas, dados_primeira=None, deslocamento=0,
+                   progresso=None, seletor=None):
+    """
+    Percorre as páginas de um intervalo a partir do registro 'deslocamento'
+    (múltiplo de tamanho_pagina), entregando a lista de itens de cada uma.
+    Se 'dados_primeira' for informado, é usado como resposta da página que
+    começa em 'deslocamento' (pedida com tamanho_pagina).
 
-        # Demais filtros opcionais
-        for k, v in filtros_opcionais.items():
-            params[k] = v
+    Com 'seletor' (SeletorTamanhoPagina), o tamanho de cada página é
+    escolhido por ele, e uma página que falha é pedida de novo com um
+    tamanho menor enquanto houver um.
 
-        print(f"▶ Buscando página {pagina}...")
-        try:
-            resp = requests.get(base_url, params=params, timeout=60)
-        except Exception as exc:
-            print("❌ Erro de conexão ao chamar a API.")
-            print("   Detalhes:", exc)
-            break
+    Devolve (no StopIteration) True se a paginação chegou ao fim sem erro.
+    """
+    tamanho = tamanho_pagina
+    acumulado = 0
+    dados = dados_primeira
 
-        if resp.status_code != 200:
-            print(f"❌ Erro HTTP {resp.status_code} na página {pagina}.")
-            print("   Trecho da resposta:", resp.text[:500])
-            break
+    while True:
+        if dados is None:
+            if seletor is not None:
+                tamanho = seletor.tamanho_para(deslocamento, tamanho)
+            pagina = deslocamento // tamanho + 1
+            detalhe = f" ({tamanho} por página)" if tamanho != tamanho_pagina else ""
+            emitir_evento(TipoEvento.INFORMACAO, f"▶ Buscando página {pagina}{detalhe}...")
+            dados = _buscar_pagina(cliente, base_url, params_da_pagina(pagina, tamanho), seletor)
+            if dados is None:
+                if seletor is not None and seletor.registrar_falha(tamanho):
+                    emitir_evento(TipoEvento.AVISO,
+                                  f"   ↓ Página {pagina} falhou com {tamanho} registros por "
+                                  f"página; tentando com páginas menores.")
+                    continue
+                return False
+        pagina = deslocamento // tamanho + 1
 
-        try:
-            dados = resp.json()
-        except ValueError:
-            print("❌ Erro ao interpretar a resposta como JSON.")
-            print("   Conteúdo recebido (início):")
-            print(resp.text[:500])
-            break
+        if pagina == 1 and progresso is not None:
+            progresso.informar_totais(dados)
 
         resultados_pagina = dados.get("resultado", [])
 
         if not resultados_pagina:
-            print("⚠ Nenhum registro nesta página. Encerrando paginação.")
-            break
+            emitir_evento(TipoEvento.AVISO, "⚠ Nenhum registro nesta página. Encerrando paginação.")
+            return True
 
-        todos_resultados.extend(resultados_pagina)
+        acumulado += len(resultados_pagina)
+        deslocamento = pagina * tamanho
 
         total_paginas = dados.get("totalPaginas")
         paginas_restantes = dados.get("paginasRestantes")
 
-        print(
+        emitir_evento(
+            TipoEvento.PAGINA_ENTREGUE,
             f"   → Página {pagina} retornou {len(resultados_pagina)} registros. "
-            f"Total acumulado: {len(todos_resultados)}"
+            f"Total acumulado: {acumulado}",
+            pagina=pagina, registros=len(resultados_pagina), acumulado=acumulado,
         )
+        yield resultados_pagina
 
         # Critérios de parada
         if paginas_restantes in (0, None):
-            print("✅ Paginação concluída (sem páginas restantes).")
-            break
+            emitir_evento(TipoEvento.INFORMACAO, "✅ Paginação concluída (sem páginas restantes).")
+            return True
 
         if total_paginas is not None and pagina >= total_paginas:
-            print("✅ Paginação concluída (atingido totalPaginas informado).")
+            emitir_evento(TipoEvento.INFORMACAO,
+                          "✅ Paginação concluída (atingido totalPaginas informado).")
+            return True
+
+        if paginas_simultaneas > 1:
+            total_registros = dados.get("totalRegistros")
+            if seletor is not None and total_registros is not None:
+                # O tamanho das páginas paralelas é escolhido uma vez, aqui
+                tamanho = seletor.tamanho_para(deslocamento, tamanho)
+                paginas = range(deslocamento // tamanho + 1,
+                                -(-int(total_registros) // tamanho) + 1)
+            else:
+                ultima_pagina = (
+                    total_paginas if total_paginas is not None
+                    else pagina + paginas_restantes
+                )
+                paginas = range(pagina + 1, ultima_pagina + 1)
+            return (yield from _gerar_paginas_em_paralelo(
+                cliente, base_url, params_da_pagina, tamanho, paginas,
+                paginas_simultaneas, seletor,
+            ))
+
+        dados = None
+
+
+def _gerar_fatia(cliente, base_url, params_do_intervalo, inicio, fim,
+                 tamanho_pagina, paginas_simultaneas, limite_paginas_fatia,
+                 tentativas_fatia, progresso=None, seletor=None):
+    """
+    Coleta a fatia de datas [inicio, fim] ('YYYY-MM-DD', inclusive),
+    subdividindo-a enquanto a página 1 indicar mais páginas que o limite
+    (contadas em páginas de tamanho_pagina). Com 'seletor', o tamanho de
+    todas as páginas, inclusive da página 1, segue o que ele escolher.
+
+    Devolve (no StopIteration) True se todas as subfatias foram concluídas.
+    """
+    params_da_pagina = params_do_intervalo(inicio, fim)
+    registros_entregues = 0
+
+    for tentativa in range(1, tentativas_fatia + 1):
+        if registros_entregues == 0:
+            emitir_evento(TipoEvento.INFORMACAO, f"🧩 Fatia {inicio} a {fim}: buscando página 1...")
+            tamanho = (seletor.tamanho_para(0, tamanho_pagina)
+                       if seletor is not None else tamanho_pagina)
+            dados = _buscar_pagina(cliente, base_url, params_da_pagina(1, tamanho), seletor)
+            while dados is None and seletor is not None and seletor.registrar_falha(tamanho):
+                tamanho = seletor.tamanho_para(0, tamanho, tamanho - 1)
+                dados = _buscar_pagina(cliente, base_url, params_da_pagina(1, tamanho), seletor)
+            if dados is None:
+                continue
+            if progresso is not None:
+                progresso.informar_totais(dados)
+
+            total_paginas = dados.get("totalPaginas") or 0
+            if tamanho != tamanho_pagina and dados.get("totalRegistros") is not None:
+                total_paginas = -(-int(dados["totalRegistros"]) // tamanho_pagina)
+            d_inicio = date.fromisoformat(inicio)
+            d_fim = date.fromisoformat(fim)
+
+            if total_paginas > limite_paginas_fatia and d_inicio < d_fim:
+                meio = d_inicio + (d_fim - d_inicio) // 2
+                emitir_evento(
+                    TipoEvento.INFORMACAO,
+                    f"   ↳ {total_paginas} páginas (> {limite_paginas_fatia}): "
+                    f"subdividindo em {inicio}..{meio} e {meio + timedelta(days=1)}..{fim}.",
+                )
+                completa_a = yield from _gerar_fatia(
+                    cliente, base_url, params_do_intervalo,
+                    inicio, meio.strftime("%Y-%m-%d"), tamanho_pagina,
+                    paginas_simultaneas, limite_paginas_fatia, tentativas_fatia,
+                    progresso, seletor,
+                )
+                completa_b = yield from _gerar_fatia(
+                    cliente, base_url, params_do_intervalo,
+                    (meio + timedelta(days=1)).strftime("%Y-%m-%d"), fim, tamanho_pagina,
+                    paginas_simultaneas, limite_paginas_fatia, tentativas_fatia,
+                    progresso, seletor,
+                )
+                return completa_a and completa_b
+
+            paginas = _gerar_paginas(
+                cliente, base_url, params_da_pagina, tamanho,
+                paginas_simultaneas, dados_primeira=dados, seletor=seletor,
+            )
+        else:
+            # Retoma a fatia a partir do primeiro registro ainda não entregue
+            # (as páginas entregues antes do erro estavam completas)
+            tamanho = (seletor.tamanho_para(registros_entregues, tamanho_pagina)
+                       if seletor is not None else tamanho_pagina)
+            paginas = _gerar_paginas(
+                cliente, base_url, params_da_pagina, tamanho,
+                paginas_simultaneas, deslocamento=registros_entregues,
+                seletor=seletor,
+            )
+
+        while True:
+            try:
+                pagina = next(paginas)
+            except StopIteration as fim_paginas:
+                completa = fim_paginas.value
+                break
+            registros_entregues += len(pagina)
+            yield pagina
+
+        if completa:
+            return True
+        emitir_evento(TipoEvento.AVISO, f"   ⚠ Fatia {inicio} a {fim} incompleta "
+                                        f"(tentativa {tentativa} de {tentativas_fatia}).")
+
+    return False
+
+
+def _buscar_em_paginas_menores(cliente, base_url, params_da_pagina, pagina,
+                               tamanho, seletor):
+    """
+    Refaz a página 'pagina' (de 'tamanho' registros), que falhou, em
+    páginas menores escolhidas pelo seletor. Devolve um dicionário com os
+    itens em 'resultado', ou None se nenhum tamanho menor funcionar.
+    """
+    if not seletor.registrar_falha(tamanho):
+        return None
+    emitir_evento(TipoEvento.AVISO,
+                  f"   ↓ Página {pagina} falhou com {tamanho} registros por página; "
+                  f"refazendo-a com páginas menores.")
+    inicio = (pagina - 1) * tamanho
+    deslocamento = inicio
+    atual = tamanho
+    maximo = tamanho - 1
+    itens = []
+    falhas = 0
+    while deslocamento < inicio + tamanho:
+        atual = seletor.tamanho_para(deslocamento, atual, maximo)
+        dados = _buscar_pagina(
+            cliente, base_url, params_da_pagina(deslocamento // atual + 1, atual), seletor
+        )
+        if dados is None:
+            falhas += 1
+            if falhas > len(seletor.tamanhos) or not seletor.registrar_falha(atual):
+                return None
+            maximo = atual - 1
+            continue
+        resultado = dados.get("resultado") or []
+        itens.extend(resultado)
+        if len(resultado) < atual:
             break
+        deslocamento += atual
+    return {"resultado": itens[:tamanho]}
 
-        pagina += 1
 
-    print("----------------------------------------------")
-    print(f" Coleta finalizada com {len(todos_resultados)} registros.")
-    print("----------------------------------------------")
+def _gerar_paginas_em_paralelo(cliente, base_url, params_da_pagina, tamanho_pagina,
+                               paginas, paginas_simultaneas, seletor=None):
+    """
+    Baixa as páginas informadas (de tamanho_pagina registros) com um pool
+    limitado de threads e as entrega na ordem. No máximo
+    2 × paginas_simultaneas páginas ficam pendentes ou prontas em memória
+    ao mesmo tempo.
+
+    Assim como no modo sequencial, a primeira página com erro ou vazia
+    encerra a coleta: páginas posteriores a ela são descartadas. Com
+    'seletor', uma página com erro antes é refeita em páginas menores.
+    Devolve (no StopIteration) True se nenhuma página falhou.
+    """
+    janela = 2 * paginas_simultaneas
+    numeros = iter(paginas)
+    pendentes = deque()
+    executor = ThreadPoolExecutor(max_workers=paginas_simultaneas)
+
+    def submeter_proxima():
+        n = next(numeros, None)
+        if n is not None:
+            # Cada página leva uma cópia do contexto (inscrições locais de eventos)
+            pendentes.append((n, executor.submit(
+                contextvars.copy_context().run,
+                _buscar_pagina, cliente, base_url, params_da_pagina(n, tamanho_pagina),
+                seletor,
+            )))
+
+    detalhe = f" ({tamanho_pagina} por página)" if seletor is not None else ""
+    emitir_evento(TipoEvento.INFORMACAO,
+                  f"▶ Buscando páginas {paginas.start} a {paginas.stop - 1} "
+                  f"em paralelo{detalhe}...")
+    try:
+        for _ in range(janela):
+            submeter_proxima()
+
+        while pendentes:
+            n, futuro = pendentes.popleft()
+            dados = futuro.result()
+            if dados is None and seletor is not None:
+                dados = _buscar_em_paginas_menores(
+                    cliente, base_url, params_da_pagina, n, tamanho_pagina, seletor
+                )
+            if dados is None:
+                return False
+
+            resultados_pagina = dados.get("resultado", [])
+            if not resultados_pagina:
+                emitir_evento(TipoEvento.AVISO, f"⚠ Nenhum registro na página {n}. Encerrando paginação.")
+                return True
+
+            submeter_proxima()
+            emitir_evento(
+                TipoEvento.PAGINA_ENTREGUE,
+                f"   → Página {n} retornou {len(resultados_pagina)} registros.",
+                pagina=n, registros=len(resultados_pagina),
+            )
+            yield resultados_pagina
 
-    return todos_resultados
+        emitir_evento(TipoEvento.INFORMACAO, "✅ Paginação concluída (páginas paralelas recebidas).")
+        return True
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+# ============================================================
+# 🔭 MODO PRÉVIA (COLETA PARCIAL, RESULTADO PROVISÓRIO)
+# ============================================================
+
+@dataclass(frozen=True)
+class ModoPrevia:
+    """
+    Critérios de uma coleta de prévia, para um preço de referência
+    provisório antes da pesquisa completa:
+
+      - max_registros: para após receber esse número de registros;
+      - tempo_limite_s: para na primeira página depois desse tempo;
+      - paginas_amostra: em vez das primeiras páginas, busca a página 1 e
+        mais 'paginas_amostra' páginas espalhadas uniformemente até
+        totalPaginas (amostra estratificada pela ordem de inclusão).
+
+    Os critérios podem ser combinados (o primeiro atingido encerra).
+    """
+    max_registros: int = None
+    tempo_limite_s: float = None
+    paginas_amostra: int = None
+
+    @classmethod
+    def padrao(cls):
+        return cls(max_registros=PREVIA_MAX_REGISTROS, tempo_limite_s=PREVIA_TEMPO_LIMITE_S)
+
+    def descricao(self) -> str:
+        partes = []
+        if self.paginas_amostra:
+            partes.append(f"amostra de {self.paginas_amostra} páginas distribuídas pela consulta")
+        if self.max_registros:
+            partes.append(f"até {self.max_registros} registros")
+        if self.tempo_limite_s:
+            partes.append(f"até {self.tempo_limite_s:g} s de coleta")
+        return ", ".join(partes) or "sem limite"
+
+
+def iterar_previa_pncp(cod_item_catalogo, data_inicial, data_final, previa: ModoPrevia,
+                       filtros_opcionais=None, tamanho_pagina=TAMANHO_PAGINA,
+                       paginas_simultaneas=1, cliente=None, progresso=None,
+                       compacta=False, colunas=None,
+                       **kwargs_busca) -> ColetaPaginasPNCP:
+    """
+    Coleta parcial do modo prévia, nos critérios de 'previa' (ModoPrevia).
+
+    Sem amostragem, é a coleta de iterar_paginas_pncp (kwargs_busca são
+    repassados) interrompida quando um limite é atingido. Com
+    paginas_amostra, são buscadas a página 1 e as páginas sorteadas
+    (sempre com 'tamanho_pagina', para coincidirem com as da pesquisa
+    completa no cache de respostas).
+
+    'compacta' e 'colunas' são como em iterar_paginas_pncp. O iterador
+    devolvido tem 'completa' = True apenas se a prévia acabou
+    cobrindo a consulta inteira, e 'previa' com o que foi coletado
+    (registros, paginas, total_registros informado pela API e motivo).
+    """
+    cliente = cliente or obter_cliente_padrao()
+    progresso = progresso or ProgressoColeta()
+    info = {
+        "criterio": previa.descricao(),
+        "registros": 0,
+        "paginas": 0,
+        "total_registros": None,
+        "motivo": None,
+    }
+    if previa.paginas_amostra:
+        progresso.iniciar()
+        paginas = _gerar_amostra_paginas(
+            cliente, cod_item_catalogo, data_inicial, data_final,
+            filtros_opcionais or {}, tamanho_pagina, paginas_simultaneas,
+            previa.paginas_amostra, progresso, info,
+        )
+    else:
+        paginas = iterar_paginas_pncp(
+            cod_item_catalogo, data_inicial, data_final,
+            filtros_opcionais=filtros_opcionais, tamanho_pagina=tamanho_pagina,
+            paginas_simultaneas=paginas_simultaneas, cliente=cliente,
+            progresso=progresso, **kwargs_busca,
+        )
+    coleta = ColetaPaginasPNCP(_gerar_previa(paginas, previa, info, progresso),
+                               compacta=compacta, colunas=colunas)
+    coleta.previa = info
+    return coleta
+
+
+def _gerar_previa(paginas, previa, info, progresso):
+    """
+    Repassa as páginas de 'paginas' até atingir um limite da prévia.
+    Devolve (no StopIteration) True se a consulta foi coberta inteira.
+    """
+    inicio = time.perf_counter()
+    completa = False
+    try:
+        while True:
+            try:
+                pagina = next(paginas)
+            except StopIteration as fim:
+                completa = bool(fim.value)
+                if completa:
+                    info["motivo"] = "consulta completa"
+                elif info["motivo"] is None:
+                    info["motivo"] = "erro na coleta"
+                break
+            info["registros"] += len(pagina)
+            info["paginas"] += 1
+            if info["total_registros"] is None and progresso.total_registros is not None:
+                info["total_registros"] = progresso.total_registros
+                if previa.max_registros:
+                    # O andamento passa a ser medido contra o limite da prévia
+                    progresso.total_registros = min(progresso.total_registros,
+                                                    previa.max_registros)
+            yield pagina
+
+            if previa.max_registros and info["registros"] >= previa.max_registros:
+                info["motivo"] = f"limite de {previa.max_registros} registros"
+                break
+            if previa.tempo_limite_s and time.perf_counter() - inicio >= previa.tempo_limite_s:
+                info["motivo"] = f"limite de {previa.tempo_limite_s:g} s"
+                break
+    finally:
+        # Interrompe a coleta (downloads pendentes são cancelados)
+        paginas.close()
+
+    total = info["total_registros"]
+    emitir_evento(
+        TipoEvento.INFORMACAO,
+        f"🔭 Prévia encerrada ({info['motivo']}): {info['registros']} registros"
+        + (f" de {total} na consulta." if total is not None else "."),
+        **info,
+    )
+    return completa
+
+
+def _gerar_amostra_paginas(cliente, cod_item_catalogo, data_inicial, data_final,
+                           filtros_opcionais, tamanho_pagina, paginas_simultaneas,
+                           paginas_amostra, progresso, info):
+    """
+    Página 1 e mais 'paginas_amostra' páginas espalhadas uniformemente
+    entre 2 e totalPaginas, entregues em ordem. Devolve (no StopIteration)
+    True se todas as páginas da consulta acabaram incluídas; ao fim de uma
+    amostra parcial, registra o motivo em 'info'.
+    """
+    base_url = cliente.url_itens
+
+    def params_da_pagina(n):
+        return _montar_params_pagina(n, tamanho_pagina, data_inicial, data_final,
+                                     cod_item_catalogo, filtros_opcionais)
+
+    emitir_evento(TipoEvento.INFORMACAO,
+                  f"🔭 Prévia por amostra: {paginas_amostra} páginas espalhadas pela consulta.")
+    dados = _buscar_pagina(cliente, base_url, params_da_pagina(1))
+    if dados is None:
+        return False
+    progresso.informar_totais(dados)
+    resultados = dados.get("resultado") or []
+    if not resultados:
+        return True
+    progresso.registrar_pagina(resultados)
+    yield resultados
+
+    total_paginas = int(dados.get("totalPaginas") or 1)
+    numeros = sorted({round(n) for n in
+                      np.linspace(2, total_paginas, min(paginas_amostra, total_paginas - 1))})
+    if not numeros:
+        return True
+    progresso.total_paginas = len(numeros) + 1
+    progresso.total_registros = None
+
+    executor = ThreadPoolExecutor(max_workers=max(1, paginas_simultaneas))
+    try:
+        futuros = [
+            (n, executor.submit(contextvars.copy_context().run,
+                                _buscar_pagina, cliente, base_url, params_da_pagina(n)))
+            for n in numeros
+        ]
+        for n, futuro in futuros:
+            progresso.verificar_cancelamento()
+            dados = futuro.result()
+            if dados is None:
+                return False
+            resultados = dados.get("resultado") or []
+            emitir_evento(
+                TipoEvento.PAGINA_ENTREGUE,
+                f"   → Página {n} (amostra) retornou {len(resultados)} registros.",
+                pagina=n, registros=len(resultados),
+            )
+            if resultados:
+                progresso.registrar_pagina(resultados)
+                yield resultados
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    if len(numeros) < total_paginas - 1:
+        info["motivo"] = f"amostra de {len(numeros) + 1} de {total_paginas} páginas"
+        return False
+    return True
+
+
+# ============================================================
+# 🔁 SINCRONIZAÇÃO INCREMENTAL DA JANELA DE 365 DIAS
+# ============================================================
+
+class ArmazemItensPNCP:
+    """
+    Armazém local (SQLite) dos itens já coletados, identificados por
+    idCompraItem e separados por consulta (codItemCatalogo + filtros).
+
+    Guarda também, por consulta, a data final da última sincronização
+    completa e a da última reverificação de toda a janela, usadas por
+    sincronizar_itens_incremental.
+    """
+
+    def __init__(self, caminho=ARMAZEM_ITENS_ARQUIVO):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS itens (
+                consulta TEXT NOT NULL,
+                idCompraItem TEXT NOT NULL,
+                dataInclusaoPncp TEXT,
+                dataAtualizacaoPncp TEXT,
+                conteudo BLOB NOT NULL,
+                PRIMARY KEY (consulta, idCompraItem)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_itens_inclusao "
+            "ON itens (consulta, dataInclusaoPncp)"
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sincronizacoes (
+                consulta TEXT PRIMARY KEY,
+                data_final TEXT NOT NULL,
+                sincronizado_em REAL NOT NULL,
+                verificacao_completa TEXT
+            )
+            """
+        )
+        # Armazéns criados antes da reverificação completa
+        colunas = {c[1] for c in self._conn.execute("PRAGMA table_info(sincronizacoes)")}
+        if "verificacao_completa" not in colunas:
+            self._conn.execute("ALTER TABLE sincronizacoes ADD COLUMN verificacao_completa TEXT")
+        self._conn.commit()
+
+    @staticmethod
+    def chave_consulta(cod_item_catalogo, filtros_opcionais) -> str:
+        """
+        Identificador estável da consulta (independente da janela de datas).
+        """
+        params = dict(filtros_opcionais or {})
+        if cod_item_catalogo is not None:
+            params["codItemCatalogo"] = cod_item_catalogo
+        return CacheRespostasPNCP.chave("itens", params)
+
+    def ultima_sincronizacao(self, consulta):
+        """
+        Data final ('YYYY-MM-DD') da última sincronização completa, ou None.
+        """
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT data_final FROM sincronizacoes WHERE consulta = ?",
+                (consulta,),
+            ).fetchone()
+        return linha[0] if linha else None
+
+    def ultima_verificacao_completa(self, consulta):
+        """
+        Data final ('YYYY-MM-DD') da última sincronização que percorreu
+        toda a janela, ou None.
+        """
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT verificacao_completa FROM sincronizacoes WHERE consulta = ?",
+                (consulta,),
+            ).fetchone()
+        return linha[0] if linha else None
+
+    def registrar_sincronizacao(self, consulta, data_final, janela_completa=False):
+        """
+        Registra a sincronização até 'data_final'; com 'janela_completa',
+        também como a última reverificação de toda a janela.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sincronizacoes "
+                "(consulta, data_final, sincronizado_em, verificacao_completa) "
+                "VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (consulta) DO UPDATE SET "
+                "data_final = excluded.data_final, "
+                "sincronizado_em = excluded.sincronizado_em, "
+                "verificacao_completa = "
+                "coalesce(excluded.verificacao_completa, verificacao_completa)",
+                (consulta, data_final, time.time(), data_final if janela_completa else None),
+            )
+            self._conn.commit()
+
+    def gravar_itens(self, consulta, itens) -> tuple:
+        """
+        Insere itens novos e substitui os existentes cuja
+        dataAtualizacaoPncp mudou, num único executemany (upsert).
+
+        Retorna:
+          - (quantidade de novos, quantidade de atualizados)
+        """
+        linhas = (
+            (
+                consulta, str(item["idCompraItem"]), item.get("dataInclusaoPncp"),
+                item.get("dataAtualizacaoPncp"),
+                zlib.compress(json.dumps(item, ensure_ascii=False).encode("utf-8")),
+            )
+            for item in itens if item.get("idCompraItem") is not None
+        )
+        with self._lock:
+            antes = self._contar(consulta)
+            alteracoes = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT INTO itens "
+                "(consulta, idCompraItem, dataInclusaoPncp, dataAtualizacaoPncp, conteudo) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (consulta, idCompraItem) DO UPDATE SET "
+                "dataInclusaoPncp = excluded.dataInclusaoPncp, "
+                "dataAtualizacaoPncp = excluded.dataAtualizacaoPncp, "
+                "conteudo = excluded.conteudo "
+                "WHERE itens.dataAtualizacaoPncp IS NOT excluded.dataAtualizacaoPncp",
+                linhas,
+            )
+            alteracoes = self._conn.total_changes - alteracoes
+            novos = self._contar(consulta) - antes
+            self._conn.commit()
+        return novos, alteracoes - novos
+
+    def _contar(self, consulta) -> int:
+        return self._conn.execute(
+            "SELECT count(*) FROM itens WHERE consulta = ?", (consulta,)
+        ).fetchone()[0]
+
+    def expurgar_antigos(self, consulta, data_inicial) -> int:
+        """
+        Remove os itens incluídos antes de 'data_inicial' ('YYYY-MM-DD').
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM itens WHERE consulta = ? "
+                "AND substr(dataInclusaoPncp, 1, 10) < ?",
+                (consulta, data_inicial),
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def carregar_itens(self, consulta) -> list:
+        """
+        Itens armazenados da consulta, em ordem de inclusão no PNCP.
+        """
+        with self._lock:
+            linhas = self._conn.execute(
+                "SELECT conteudo FROM itens WHERE consulta = ? "
+                "ORDER BY dataInclusaoPncp, idCompraItem",
+                (consulta,),
+            ).fetchall()
+        return [json.loads(zlib.decompress(c).decode("utf-8")) for (c,) in linhas]
+
+    def fechar(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ItensSincronizados(list):
+    """
+    Lista de itens devolvida por sincronizar_itens_incremental. 'completa'
+    indica se a coleta do trecho sincronizado terminou sem erro (como em
+    ColetaPaginasPNCP); se False, o armazém pode estar defasado.
+    """
+
+    def __init__(self, itens, completa):
+        super().__init__(itens)
+        self.completa = completa
+
+
+def sincronizar_itens_incremental(cod_item_catalogo, data_inicial, data_final,
+                                  filtros_opcionais=None, armazem=None,
+                                  dias_reverificacao=7, dias_verificacao_completa=None,
+                                  **kwargs_busca):
+    """
+    Mantém no 'armazem' os itens da janela [data_inicial, data_final] e
+    devolve a lista completa, baixando apenas o que falta:
+
+      - Na primeira execução (ou se a última sincronização saiu da janela),
+        toda a janela é coletada.
+      - Nas seguintes, só o intervalo de dataInclusaoPncp a partir da última
+        sincronização, recuado em 'dias_reverificacao' dias. Os itens desse
+        trecho já armazenados são substituídos se a dataAtualizacaoPncp
+        tiver mudado.
+      - Itens incluídos antes desse recuo e atualizados depois não são
+        vistos pelo trecho incremental. Por isso, se a última reverificação
+        de toda a janela tiver mais de 'dias_verificacao_completa' dias
+        (contados até data_final), a janela inteira é coletada de novo
+        (None desliga a reverificação completa).
+      - Itens incluídos antes de data_inicial são removidos do armazém.
+
+    A data da sincronização só é registrada se a coleta terminar sem erro.
+    Os demais parâmetros (kwargs_busca) são repassados a coletar_itens_pncp.
+
+    Retorna:
+      - ItensSincronizados (lista de dicionários com o atributo 'completa').
+    """
+    armazem = armazem or ArmazemItensPNCP(ARMAZEM_ITENS_ARQUIVO)
+    filtros_opcionais = filtros_opcionais or {}
+    consulta = armazem.chave_consulta(cod_item_catalogo, filtros_opcionais)
+
+    ultima = armazem.ultima_sincronizacao(consulta)
+    verificada = armazem.ultima_verificacao_completa(consulta)
+    if ultima is None or ultima < data_inicial:
+        inicio = data_inicial
+        emitir_evento(TipoEvento.INFORMACAO,
+                      "🔁 Sincronização incremental: primeira carga da janela completa.")
+    elif dias_verificacao_completa is not None and (
+            verificada is None
+            or date.fromisoformat(data_final) - date.fromisoformat(verificada)
+            >= timedelta(days=dias_verificacao_completa)):
+        inicio = data_inicial
+        emitir_evento(TipoEvento.INFORMACAO,
+                      f"🔁 Sincronização incremental: reverificação completa da janela "
+                      f"(última em {verificada or 'nunca'}).")
+    else:
+        recuo = date.fromisoformat(ultima) - timedelta(days=dias_reverificacao)
+        inicio = max(data_inicial, recuo.strftime("%Y-%m-%d"))
+        emitir_evento(TipoEvento.INFORMACAO,
+                      f"🔁 Sincronização incremental: última em {ultima}; "
+                      f"buscando inclusões a partir de {inicio}. Atualizações de itens "
+                      f"incluídos antes disso só entram na reverificação completa "
+                      f"(última em {verificada or 'nunca'}).")
+
+    itens, completa = coletar_itens_pncp(
+        cod_item_catalogo, inicio, data_final,
+        filtros_opcionais=filtros_opcionais, **kwargs_busca,
+    )
+
+    novos, atualizados = armazem.gravar_itens(consulta, itens)
+    removidos = armazem.expurgar_antigos(consulta, data_inicial)
+    if completa:
+        armazem.registrar_sincronizacao(consulta, data_final,
+                                        janela_completa=inicio == data_inicial)
+
+    resultados = armazem.carregar_itens(consulta)
+    emitir_evento(
+        TipoEvento.INFORMACAO,
+        f"   - Novos: {novos} | atualizados: {atualizados} | "
+        f"fora da janela removidos: {removidos} | total no armazém: {len(resultados)}",
+        novos=novos, atualizados=atualizados, removidos=removidos,
+        total=len(resultados),
+    )
+    return ItensSincronizados(resultados, completa)
 
 
 # ============================================================
@@ -305,6 +2728,139 @@ def calcular_media_sanada_serie(serie: pd.Series, cv_limite: float = 25.0) -> fl
         s = filtrado
 
 
+def _media_dp_exatas(valores: np.ndarray) -> tuple:
+    """
+    Média e desvio-padrão (ddof=0) calculados exatamente como em
+    calcular_media_sanada_serie (mesma ordem de soma do pandas).
+    """
+    s = pd.Series(valores, dtype="float64")
+    return s.mean(), s.std(ddof=0)
+
+
+def _media_sanada_janela(ordenados: np.ndarray, originais: np.ndarray,
+                         cv_limite: float) -> float:
+    """
+    Média saneada de um grupo, sobre os valores já ordenados.
+
+    O conjunto remanescente em cada iteração é sempre uma janela contínua
+    [lo, hi) dos valores ordenados. Média e desvio-padrão de cada janela
+    saem de somas prefixadas (O(1)) e os novos limites, de busca binária
+    (O(log n)). Sempre que a precisão dessas estimativas não basta para
+    garantir a mesma decisão (valor muito próximo de M ± DP, CV muito
+    próximo do limite), a iteração é refeita com o cálculo exato; o valor
+    devolvido é sempre a média exata, na ordem original dos valores.
+    Assim o resultado é idêntico, bit a bit, ao de calcular_media_sanada_serie.
+    """
+    n_total = len(ordenados)
+    eps = np.finfo(np.float64).eps
+
+    def subconjunto(lo, hi):
+        return originais[(originais >= ordenados[lo]) & (originais <= ordenados[hi - 1])]
+
+    # Somas prefixadas sobre valores deslocados pela mediana (menos cancelamento)
+    ref = ordenados[n_total // 2]
+    c = ordenados - ref
+    soma = np.concatenate(([0.0], np.cumsum(c)))
+    soma_q = np.concatenate(([0.0], np.cumsum(c * c)))
+
+    lo, hi = 0, n_total
+    while True:
+        n = hi - lo
+        if n < 3:
+            return _media_dp_exatas(subconjunto(lo, hi))[0]
+
+        escala = max(abs(ordenados[lo] - ref), abs(ordenados[hi - 1] - ref), abs(ref))
+        media_c = (soma[hi] - soma[lo]) / n
+        m = media_c + ref
+        var = (soma_q[hi] - soma_q[lo]) / n - media_c * media_c
+        dp = np.sqrt(var) if var > 0 else 0.0
+
+        # Cotas (folgadas) do erro das estimativas por somas prefixadas
+        erro_m = 64 * n * eps * escala
+        erro_dp = (64 * n * eps * escala * escala / dp) if dp > 0 else np.inf
+        tolerancia = erro_m + erro_dp
+
+        exato = False
+        if dp == 0 or abs(m) <= erro_m:
+            exato = True
+        else:
+            cv = abs(dp / m) * 100.0
+            erro_cv = cv * (erro_dp / dp + erro_m / abs(m))
+            if abs(cv - cv_limite) <= erro_cv:
+                exato = True
+            elif cv <= cv_limite:
+                return _media_dp_exatas(subconjunto(lo, hi))[0]
+
+        if not exato:
+            li = m - dp
+            ls = m + dp
+            novo_lo = lo + int(np.searchsorted(ordenados[lo:hi], li, side="left"))
+            novo_hi = lo + int(np.searchsorted(ordenados[lo:hi], ls, side="right"))
+            if ((novo_lo < hi and ordenados[novo_lo] - li <= tolerancia)
+                    or (novo_lo > lo and li - ordenados[novo_lo - 1] <= tolerancia)
+                    or (novo_hi > lo and ordenados[novo_hi - 1] - ls >= -tolerancia)
+                    or (novo_hi < hi and ordenados[novo_hi] - ls <= tolerancia)):
+                exato = True
+
+        if exato:
+            m, dp = _media_dp_exatas(subconjunto(lo, hi))
+            if m == 0 or pd.isna(m) or pd.isna(dp):
+                return m
+            cv = abs(dp / m) * 100.0
+            if cv <= cv_limite:
+                return m
+            li = m - dp
+            ls = m + dp
+            novo_lo = lo + int(np.searchsorted(ordenados[lo:hi], li, side="left"))
+            novo_hi = lo + int(np.searchsorted(ordenados[lo:hi], ls, side="right"))
+
+        if novo_hi - novo_lo == n or novo_hi <= novo_lo:
+            return _media_dp_exatas(subconjunto(lo, hi))[0]
+
+        lo, hi = novo_lo, novo_hi
+
+
+def calcular_media_sanada_grupos(grupos: pd.Series, valores: pd.Series,
+                                 cv_limite: float = 25.0) -> pd.Series:
+    """
+    Média saneada de todos os grupos de uma vez (equivalente a
+    valores.groupby(grupos).apply(calcular_media_sanada_serie)).
+
+    Os valores são agrupados por código numa única ordenação e cada grupo
+    é processado sobre seus valores ordenados por _media_sanada_janela,
+    sem recriar Series a cada iteração de expurgo.
+
+    Retorna:
+      - Series indexada pelos grupos (ordenados), com nome 'media_sanada'.
+    """
+    codigos, uniques = pd.factorize(grupos, sort=True)
+    vals = pd.to_numeric(valores, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+    validos = (codigos >= 0) & ~np.isnan(vals)
+    cod_v = codigos[validos]
+    val_v = vals[validos]
+
+    # Valores agrupados por código, mantendo a ordem original dentro do grupo
+    ordem = np.argsort(cod_v, kind="stable")
+    val_orig = val_v[ordem]
+    limites = np.searchsorted(cod_v[ordem], np.arange(len(uniques) + 1), side="left")
+
+    resultado = np.full(len(uniques), np.nan)
+    for g in range(len(uniques)):
+        ini, fim = limites[g], limites[g + 1]
+        if ini == fim:
+            continue
+        originais = val_orig[ini:fim]
+        ordenados = np.sort(originais)
+        if not np.isfinite(ordenados).all():
+            resultado[g] = calcular_media_sanada_serie(pd.Series(originais), cv_limite)
+        else:
+            resultado[g] = _media_sanada_janela(ordenados, originais, cv_limite)
+
+    indice = pd.Index(uniques, name=getattr(grupos, "name", None))
+    return pd.Series(resultado, index=indice, name="media_sanada")
+
+
 def calcular_resumo_por_unidade(df: pd.DataFrame) -> pd.DataFrame:
     """
     Considera apenas 'valorUnitarioResultado' para o resumo estatístico;
@@ -312,20 +2868,21 @@ def calcular_resumo_por_unidade(df: pd.DataFrame) -> pd.DataFrame:
       - media_sanada
       - limite_inferior_intervalo
       - limite_superior_intervalo
+
+    As agregações saem de 'df' (exatas, independentes da divisão em
+    páginas).
     """
     if df.empty or "unidadeMedida" not in df.columns:
         return pd.DataFrame()
 
-    df_local = df.copy()
-
-    if "valorUnitarioResultado" not in df_local.columns:
+    if "valorUnitarioResultado" not in df.columns:
         return pd.DataFrame()
 
-    df_local["valorUnitarioResultado"] = pd.to_numeric(
-        df_local["valorUnitarioResultado"], errors="coerce"
-    )
+    # Só as duas colunas usadas (sem copiar o DataFrame inteiro)
+    unidades = df["unidadeMedida"]
+    valores = pd.to_numeric(df["valorUnitarioResultado"], errors="coerce")
 
-    grp = df_local.groupby("unidadeMedida")["valorUnitarioResultado"]
+    grp = valores.groupby(unidades)
 
     resumo_base = (
         grp.agg(["count", "mean", "median", "std", "min", "max"])
@@ -340,8 +2897,8 @@ def calcular_resumo_por_unidade(df: pd.DataFrame) -> pd.DataFrame:
             }
         )
     )
-
-    media_sanada = grp.apply(calcular_media_sanada_serie).rename("media_sanada")
+    with etapa_eventos("media_saneada", unidades=len(resumo_base)):
+        media_sanada = calcular_media_sanada_grupos(unidades, valores)
 
     resumo = resumo_base.join(media_sanada, how="left")
 
@@ -405,90 +2962,696 @@ def montar_preco_referencia(resumo_df: pd.DataFrame) -> pd.DataFrame:
 # 💾 PREPARAR DATAFRAMES + SALVAR EM EXCEL
 # ============================================================
 
-def preparar_dataframes(dados: list) -> tuple:
+# Ordem das colunas da aba 'dados' (demais colunas da API vêm depois)
+COLUNAS_PRIORITARIAS = [
+    "idContratacaoPNCP",
+    "idCompra",
+    "idCompraItem",
+    "orgaoEntidadeCnpj",
+    "unidadeOrgaoCodigoUnidade",
+    "descricaoResumida",
+    "descricaodetalhada",
+    "materialOuServicoNome",
+    "codigoClasse",
+    "codigoGrupo",
+    "codItemCatalogo",
+    "unidadeMedida",
+    "quantidade",
+    "valorUnitarioEstimado",
+    "valorTotal",
+    "quantidadeResultado",
+    "valorUnitarioResultado",
+    "valorTotalResultado",
+    "situacaoCompraItemNome",
+    "nomeFornecedor",
+    "dataInclusaoPncp",
+    "dataAtualizacaoPncp",
+    "dataResultado",
+    "codigoNCM",
+    "descricaoNCM",
+]
+
+# Perfis de colunas da ingestão (PERFIL_COLUNAS); None mantém todas
+PERFIS_COLUNAS = {
+    "minimo": [
+        "idCompraItem",
+        "codItemCatalogo",
+        "descricaoResumida",
+        "unidadeMedida",
+        "quantidadeResultado",
+        "valorUnitarioResultado",
+        "dataInclusaoPncp",
+    ],
+    "analise": [c for c in COLUNAS_PRIORITARIAS if c != "descricaodetalhada"],
+    "completo": None,
+}
+
+# Colunas de texto com poucos valores distintos, guardadas como category
+COLUNAS_CATEGORICAS = [
+    "unidadeMedida",
+    "situacaoCompraItemNome",
+    "materialOuServicoNome",
+]
+
+# Colunas numéricas da API convertidas para float64 já na ingestão
+COLUNAS_NUMERICAS = [
+    "quantidade",
+    "valorUnitarioEstimado",
+    "valorTotal",
+    "quantidadeResultado",
+    "valorUnitarioResultado",
+    "valorTotalResultado",
+]
+
+
+def filtrar_faixa_valor(df: pd.DataFrame, valor_min=None, valor_max=None) -> pd.DataFrame:
+    """
+    Mantém apenas as linhas cujo valorUnitarioResultado está na faixa
+    [valor_min, valor_max] (máscara vetorizada). Linhas sem valor numérico
+    são descartadas, pois não servem para pesquisa de preço.
+    """
+    if valor_min is None and valor_max is None:
+        return df
+    if "valorUnitarioResultado" not in df.columns:
+        return df.iloc[0:0]
+
+    valores = pd.to_numeric(df["valorUnitarioResultado"], errors="coerce")
+    mascara = valores.notna()
+    if valor_min is not None:
+        mascara &= valores >= valor_min
+    if valor_max is not None:
+        mascara &= valores <= valor_max
+    return df[mascara.to_numpy()]
+
+
+def _tipar_bloco(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte as COLUNAS_NUMERICAS presentes no bloco para float64.
+    """
+    for col in COLUNAS_NUMERICAS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    return df
+
+
+class PaginaCompacta:
     """
-    A partir da lista de dicionários retornada pela API,
-    monta:
+    Página da API em estrutura de arrays: um vetor por campo, com esquema
+    fixo (as 'colunas' pedidas, na ordem), em vez de um dicionário por
+    registro com as mesmas chaves repetidas. COLUNAS_NUMERICAS ficam em
+    arrays float64 (NaN para ausentes); os demais campos, em listas com os
+    valores do JSON (textos, inteiros, None).
+
+    len() é o número de registros e a iteração devolve os registros como
+    dicionários (ausentes como None), para quem ainda espera a lista da API.
+    """
+    __slots__ = ("colunas", "n")
+
+    def __init__(self, colunas: dict, n: int):
+        self.colunas = colunas
+        self.n = n
+
+    @classmethod
+    def de_registros(cls, registros, colunas=None) -> "PaginaCompacta":
+        """
+        Converte a lista de dicionários de uma página. Sem 'colunas', usa
+        todos os campos presentes, na ordem em que aparecem.
+        """
+        if colunas is None:
+            colunas = list(dict.fromkeys(chave for registro in registros for chave in registro))
+        vetores = {}
+        for col in colunas:
+            try:
+                valores = list(map(itemgetter(col), registros))
+            except KeyError:
+                # Campo ausente em algum registro vira NaN, como em from_records
+                valores = [registro.get(col, np.nan) for registro in registros]
+            if col in COLUNAS_NUMERICAS:
+                try:
+                    valores = np.array(valores, dtype="float64")
+                except (TypeError, ValueError):
+                    valores = pd.to_numeric(pd.Series(valores, dtype=object),
+                                            errors="coerce").to_numpy(dtype="float64")
+            vetores[col] = valores
+        return cls(vetores, len(registros))
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        nomes = list(self.colunas)
+        for linha in zip(*(self._como_objetos(v) for v in self.colunas.values())):
+            yield dict(zip(nomes, linha))
+
+    @staticmethod
+    def _como_objetos(valores):
+        if isinstance(valores, np.ndarray):
+            valores = valores.tolist()
+        return [None if isinstance(v, float) and math.isnan(v) else v for v in valores]
+
+    def para_dataframe(self, colunas=None) -> pd.DataFrame:
+        """
+        DataFrame da página (só as 'colunas' pedidas, se informadas;
+        colunas ausentes da página ficam vazias, como em from_records).
+        """
+        if colunas is None:
+            return pd.DataFrame(self.colunas, index=pd.RangeIndex(self.n))
+        vazia = np.full(self.n, np.nan)
+        return pd.DataFrame(
+            {col: self.colunas.get(col, vazia) for col in colunas},
+            index=pd.RangeIndex(self.n),
+        )
+
+
+def _categorizar(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte as COLUNAS_CATEGORICAS presentes para o tipo category,
+    quando têm poucos valores distintos (até metade das linhas).
+    """
+    for col in COLUNAS_CATEGORICAS:
+        if (col in df.columns
+                and (df[col].dtype == object or pd.api.types.is_string_dtype(df[col].dtype))
+                and df[col].nunique() <= len(df) // 2):
+            df[col] = df[col].astype("category")
+    return df
+
+
+def ingerir_paginas(paginas, valor_min=None, valor_max=None,
+                    perfil_colunas="completo") -> pd.DataFrame:
+    """
+    Etapa única de ingestão: converte cada página da API diretamente em um
+    bloco tipado (COLUNAS_NUMERICAS em float64), aplica o filtro de faixa
+    de valor como máscara vetorizada e concatena os blocos. A lista de
+    dicionários de cada página é descartada logo após a conversão.
+
+    Só as colunas do 'perfil_colunas' (chave de PERFIS_COLUNAS) entram nos
+    blocos; as COLUNAS_CATEGORICAS do resultado ficam como category. As
+    páginas podem ser listas de dicionários ou PaginaCompacta.
+    """
+    if perfil_colunas not in PERFIS_COLUNAS:
+        raise ValueError(
+            f"Perfil de colunas desconhecido: {perfil_colunas!r} "
+            f"(use {', '.join(PERFIS_COLUNAS)})."
+        )
+    colunas = PERFIS_COLUNAS[perfil_colunas]
+    blocos = []
+    antes = depois = 0
+    # Tempo gasto só na montagem (sem a espera pelas páginas da coleta)
+    duracao = 0.0
+    with etapa_eventos("montagem_dataframe") as extras:
+        for pagina in paginas:
+            if not pagina:
+                continue
+            inicio = time.perf_counter()
+            if isinstance(pagina, PaginaCompacta):
+                bloco = _tipar_bloco(pagina.para_dataframe(colunas))
+            else:
+                bloco = _tipar_bloco(pd.DataFrame.from_records(pagina, columns=colunas))
+            antes += len(bloco)
+            bloco = filtrar_faixa_valor(bloco, valor_min, valor_max)
+            depois += len(bloco)
+            if not bloco.empty:
+                blocos.append(bloco)
+            duracao += time.perf_counter() - inicio
+
+        if valor_min is not None or valor_max is not None:
+            emitir_evento(
+                TipoEvento.INFORMACAO,
+                f"🔎 Filtrando resultados por faixa de valor: Min={valor_min}, Max={valor_max}\n"
+                f"   - Registros antes do filtro: {antes}\n"
+                f"   - Registros após o filtro: {depois}",
+                valor_min=valor_min, valor_max=valor_max, antes=antes, depois=depois,
+            )
+
+        inicio = time.perf_counter()
+        if not blocos:
+            df = pd.DataFrame()
+        elif len(blocos) == 1:
+            df = blocos[0].reset_index(drop=True)
+        else:
+            df = pd.concat(blocos, ignore_index=True, sort=False)
+        df = _categorizar(df)
+        duracao += time.perf_counter() - inicio
+        extras.update(duracao_s=duracao, linhas=len(df))
+    return df
+
+
+def preparar_dataframes(dados, valor_min=None, valor_max=None,
+                        perfil_colunas=PERFIL_COLUNAS) -> tuple:
+    """
+    A partir dos itens retornados pela API, monta:
       - df_dados         → DataFrame completo
       - resumo_df        → resumo por unidadeMedida
       - preco_ref_df     → tabela de preço de referência (resumida)
+
+    'dados' pode ser a lista de dicionários de buscar_itens_pncp ou um
+    iterável de páginas (ex.: iterar_paginas_pncp), consumido página a
+    página por ingerir_paginas. O filtro de faixa de valor
+    (valor_min/valor_max sobre valorUnitarioResultado) é aplicado antes
+    das estatísticas. 'perfil_colunas' escolhe as colunas mantidas (veja
+    PERFIL_COLUNAS).
     """
-    df = pd.DataFrame(dados)
+    if isinstance(dados, list):
+        dados = [dados]
+    df = ingerir_paginas(dados, valor_min, valor_max, perfil_colunas=perfil_colunas)
     if df.empty:
         return df, pd.DataFrame(), pd.DataFrame()
 
-    colunas_prioritarias = [
-        "idContratacaoPNCP",
-        "idCompra",
-        "idCompraItem",
-        "orgaoEntidadeCnpj",
-        "unidadeOrgaoCodigoUnidade",
-        "descricaoResumida",
-        "descricaodetalhada",
-        "materialOuServicoNome",
-        "codigoClasse",
-        "codigoGrupo",
-        "codItemCatalogo",
-        "unidadeMedida",
-        "quantidade",
-        "valorUnitarioEstimado",
-        "valorTotal",
-        "quantidadeResultado",
-        "valorUnitarioResultado",
-        "valorTotalResultado",
-        "situacaoCompraItemNome",
-        "nomeFornecedor",
-        "dataInclusaoPncp",
-        "dataAtualizacaoPncp",
-        "dataResultado",
-        "codigoNCM",
-        "descricaoNCM",
-    ]
-    colunas_existentes = [c for c in colunas_prioritarias if c in df.columns]
+    colunas_existentes = [c for c in COLUNAS_PRIORITARIAS if c in df.columns]
     outras_colunas = [c for c in df.columns if c not in colunas_existentes]
     df = df[colunas_existentes + outras_colunas]
 
-    resumo_df = calcular_resumo_por_unidade(df)
-    preco_ref_df = montar_preco_referencia(resumo_df) if not resumo_df.empty else pd.DataFrame()
+    resumo_df = calcular_resumo_por_unidade(df)
+    preco_ref_df = montar_preco_referencia(resumo_df) if not resumo_df.empty else pd.DataFrame()
+
+    return df, resumo_df, preco_ref_df
+
+
+# Limite de linhas de uma planilha do Excel (1.048.576), menos o cabeçalho
+MAX_LINHAS_ABA_EXCEL = 1_048_576 - 1
+# Limite de caracteres de uma célula do Excel
+MAX_CARACTERES_CELULA_EXCEL = 32_767
+
+
+def _texto_excel(valor):
+    """
+    Converte um valor de coluna texto/objeto para uma célula do Excel.
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, str):
+        valor = ILLEGAL_CHARACTERS_RE.sub("", valor)
+        return valor[:MAX_CARACTERES_CELULA_EXCEL]
+    if isinstance(valor, (bool, int)):
+        return valor
+    if isinstance(valor, float):
+        return valor if np.isfinite(valor) else None
+    if not isinstance(valor, (list, dict)) and pd.isna(valor):
+        return None
+    # Campos aninhados da API (listas/dicionários) viram texto
+    return _texto_excel(str(valor))
+
+
+def _valores_excel(serie: pd.Series) -> list:
+    """
+    Valores de uma coluna já convertidos para o tipo explícito de célula:
+    número (float/int), booleano, data ou texto. Ausentes viram None.
+    """
+    dtype = serie.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return [None if pd.isna(v) else bool(v) for v in serie.tolist()]
+    if pd.api.types.is_float_dtype(dtype):
+        arr = serie.to_numpy(dtype="float64", na_value=np.nan)
+        arr = np.where(np.isfinite(arr), arr, np.nan)
+        return [None if math.isnan(v) else v for v in arr.tolist()]
+    if pd.api.types.is_integer_dtype(dtype):
+        return [None if pd.isna(v) else int(v) for v in serie.tolist()]
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        if getattr(dtype, "tz", None) is not None:
+            serie = serie.dt.tz_localize(None)
+        return [None if pd.isna(v) else v.to_pydatetime() for v in serie.tolist()]
+    return [_texto_excel(v) for v in serie.tolist()]
+
+
+def escrever_excel_streaming(destino, abas, linhas_por_aba=MAX_LINHAS_ABA_EXCEL,
+                             linhas_por_bloco=50_000):
+    """
+    Grava as abas em um .xlsx com o openpyxl em modo write-only: as linhas
+    são serializadas em blocos e descarregadas em disco à medida que são
+    escritas, sem montar o modelo de objetos da planilha em memória.
+
+    - 'abas': dicionário {nome_da_aba: DataFrame}, na ordem desejada.
+      DataFrames None são ignorados.
+    - Abas com mais de 'linhas_por_aba' linhas são divididas
+      automaticamente em nome_1, nome_2, ...
+    - Cada coluna é gravada com tipo explícito (veja _valores_excel).
+    - 'destino': caminho do arquivo ou objeto binário (ex.: BytesIO).
+
+    Retorna:
+      - Lista com os nomes das abas efetivamente gravadas.
+    """
+    with etapa_eventos("excel") as extras:
+        wb = openpyxl.Workbook(write_only=True)
+        nomes_gravados = []
+
+        for nome, df in abas.items():
+            if df is None:
+                continue
+            total = len(df)
+            partes = max(1, -(-total // linhas_por_aba))
+            cabecalho = [str(c) for c in df.columns]
+
+            for parte in range(partes):
+                titulo = nome if partes == 1 else f"{nome}_{parte + 1}"
+                ws = wb.create_sheet(title=titulo)
+                nomes_gravados.append(titulo)
+                if cabecalho:
+                    ws.append(cabecalho)
+
+                inicio = parte * linhas_por_aba
+                fim = min(total, inicio + linhas_por_aba)
+                for ini_bloco in range(inicio, fim, linhas_por_bloco):
+                    bloco = df.iloc[ini_bloco:min(fim, ini_bloco + linhas_por_bloco)]
+                    colunas = [_valores_excel(bloco.iloc[:, j]) for j in range(bloco.shape[1])]
+                    for linha in zip(*colunas):
+                        ws.append(linha)
+
+        wb.save(destino)
+        extras["abas"] = nomes_gravados
+        extras["linhas"] = sum(len(df) for df in abas.values() if df is not None)
+    return nomes_gravados
+
+
+def salvar_resultados_em_excel(df_dados, resumo_df, preco_ref_df, caminho_arquivo):
+    """
+    Salva em Excel (escrita em streaming, veja escrever_excel_streaming):
+      - Aba 'dados'            → registros detalhados
+                                 (dados_1, dados_2, ... se exceder o limite de linhas)
+      - Aba 'resumo_unidade'   → estatísticas por unidadeMedida
+      - Aba 'preco_referencia' → média, mediana e média saneada
+    """
+    if df_dados is None or df_dados.empty:
+        emitir_evento(TipoEvento.AVISO, "⚠ Nenhum dado para salvar em Excel.")
+        return
+
+    emitir_evento(TipoEvento.INFORMACAO, f"💾 Salvando arquivo Excel em: {caminho_arquivo}",
+                  caminho=str(caminho_arquivo))
+    abas = escrever_excel_streaming(
+        caminho_arquivo, _abas_resultado(df_dados, resumo_df, preco_ref_df)
+    )
+    partes_dados = [a for a in abas if a.startswith("dados_")]
+    if partes_dados:
+        emitir_evento(
+            TipoEvento.INFORMACAO,
+            f"   - Aba 'dados' dividida em {len(partes_dados)} partes pelo limite de linhas do Excel.",
+            partes=len(partes_dados),
+        )
+
+    emitir_evento(TipoEvento.INFORMACAO, "✅ Arquivo Excel gerado com sucesso.")
+
+
+def _tabela_previa(info_previa) -> pd.DataFrame:
+    """
+    Aba 'previa' da planilha: aviso de resultado provisório e o que foi
+    coletado (ModoPrevia).
+    """
+    linhas = [("situacao", "RESULTADO PROVISÓRIO – coleta parcial (prévia)")]
+    linhas += [(chave, "" if valor is None else str(valor))
+               for chave, valor in info_previa.items()]
+    return pd.DataFrame(linhas, columns=["campo", "valor"])
+
+
+def _tabela_coleta_incompleta(itens_incompletos) -> pd.DataFrame:
+    """
+    Aba 'coleta_incompleta' da planilha do lote: itens cuja coleta foi
+    interrompida por erro.
+    """
+    return pd.DataFrame({
+        "codItemCatalogo": list(itens_incompletos),
+        "situacao": "COLETA INCOMPLETA – interrompida por erro; refaça a pesquisa do item",
+    })
+
+
+def _abas_resultado(df_dados, resumo_df, preco_ref_df) -> dict:
+    """
+    Abas da planilha de resultado, na ordem de gravação.
+    """
+    abas = {"dados": df_dados}
+    if resumo_df is not None and not resumo_df.empty:
+        abas["resumo_unidade"] = resumo_df
+    if preco_ref_df is not None and not preco_ref_df.empty:
+        abas["preco_referencia"] = preco_ref_df
+    return abas
+
+
+# ============================================================
+# 🧱 EXPORTAÇÃO COLUNAR (PARQUET + CSV GZIP)
+# ============================================================
+
+# Colunas de data da aba 'dados' (gravadas como timestamp no Parquet)
+COLUNAS_DATA = ["dataInclusaoPncp", "dataAtualizacaoPncp", "dataResultado"]
+
+# Esquemas estáveis das tabelas exportadas: colunas ausentes na consulta
+# são criadas vazias com o tipo declarado.
+ESQUEMA_DADOS = {
+    col: ("float64" if col in COLUNAS_NUMERICAS
+          else "datetime64[ns]" if col in COLUNAS_DATA
+          else "string")
+    for col in COLUNAS_PRIORITARIAS
+}
+ESQUEMA_RESUMO_UNIDADE = {
+    "unidadeMedida": "string",
+    "resultado_qtde": "int64",
+    "resultado_media": "float64",
+    "resultado_mediana": "float64",
+    "resultado_desvio_padrao": "float64",
+    "resultado_minimo": "float64",
+    "resultado_maximo": "float64",
+    "media_sanada": "float64",
+    "limite_inferior_intervalo": "float64",
+    "limite_superior_intervalo": "float64",
+}
+ESQUEMA_PRECO_REFERENCIA = {
+    "unidadeMedida": "string",
+    "media": "float64",
+    "mediana": "float64",
+    "media_sanada": "float64",
+}
+
+
+def _texto_colunar(valor):
+    """
+    Valor de uma coluna fora do esquema, como texto (aninhados em JSON).
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, (list, dict)):
+        return json.dumps(valor, ensure_ascii=False)
+    if isinstance(valor, float) and math.isnan(valor):
+        return None
+    return str(valor)
+
+
+def _coluna_texto(serie: pd.Series) -> pd.Series:
+    """
+    Converte uma coluna para o tipo 'string' (atalho vetorizado quando a
+    coluna já contém apenas textos).
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype(object)
+    if pd.api.types.infer_dtype(serie, skipna=True) in ("string", "empty"):
+        return serie.astype("string")
+    return serie.map(_texto_colunar, na_action="ignore").astype("string")
+
+
+def aplicar_esquema(df: pd.DataFrame, esquema: dict, manter_extras=False) -> pd.DataFrame:
+    """
+    Devolve um DataFrame com exatamente as colunas e tipos do 'esquema'
+    (na ordem dele). Com manter_extras=True, as demais colunas são mantidas
+    ao final, como texto.
+    """
+    saida = {}
+    n = len(df)
+    for col, tipo in esquema.items():
+        if col in df.columns:
+            serie = df[col]
+        else:
+            serie = pd.Series([None] * n, index=df.index, dtype="object")
+
+        if tipo == "float64":
+            saida[col] = pd.to_numeric(serie, errors="coerce").astype("float64")
+        elif tipo == "int64":
+            saida[col] = pd.to_numeric(serie, errors="coerce").fillna(0).astype("int64")
+        elif tipo.startswith("datetime64"):
+            saida[col] = (
+                pd.to_datetime(serie, errors="coerce", utc=True)
+                .dt.tz_localize(None)
+                .astype(tipo)
+            )
+        else:
+            saida[col] = _coluna_texto(serie)
+
+    if manter_extras:
+        for col in df.columns:
+            if col not in esquema:
+                saida[str(col)] = _coluna_texto(df[col])
 
-    return df, resumo_df, preco_ref_df
+    return pd.DataFrame(saida, index=df.index).reset_index(drop=True)
 
 
-def salvar_resultados_em_excel(df_dados, resumo_df, preco_ref_df, caminho_arquivo):
+def exportar_tabelas_colunares(df_dados, resumo_df, preco_ref_df,
+                               formatos=("parquet", "csv")) -> dict:
     """
-    Salva em Excel:
-      - Aba 'dados'            → registros detalhados
-      - Aba 'resumo_unidade'   → estatísticas por unidadeMedida
-      - Aba 'preco_referencia' → média, mediana e média saneada
+    Exporta 'dados', 'resumo_unidade' e 'preco_referencia' com esquema
+    estável (veja ESQUEMA_*), em Parquet (compressão zstd) e/ou CSV gzip.
+
+    Retorna:
+      - Dicionário {"<tabela>.parquet" | "<tabela>.csv.gz": bytes}.
     """
-    if df_dados is None or df_dados.empty:
-        print("⚠ Nenhum dado para salvar em Excel.")
-        return
+    tabelas = {
+        "dados": aplicar_esquema(
+            df_dados if df_dados is not None else pd.DataFrame(),
+            ESQUEMA_DADOS, manter_extras=True,
+        ),
+        "resumo_unidade": aplicar_esquema(
+            resumo_df if resumo_df is not None else pd.DataFrame(),
+            ESQUEMA_RESUMO_UNIDADE,
+        ),
+        "preco_referencia": aplicar_esquema(
+            preco_ref_df if preco_ref_df is not None else pd.DataFrame(),
+            ESQUEMA_PRECO_REFERENCIA,
+        ),
+    }
+
+    arquivos = {}
+    if "parquet" in formatos:
+        for nome, df in tabelas.items():
+            buffer = io.BytesIO()
+            df.to_parquet(buffer, engine="pyarrow", compression="zstd", index=False)
+            arquivos[f"{nome}.parquet"] = buffer.getvalue()
+
+    if "csv" in formatos:
+        for nome, df in tabelas.items():
+            buffer = io.BytesIO()
+            # Nível 3: quase o tamanho do nível 6 por uma fração do tempo
+            # Escritor CSV do Arrow: bem mais rápido que o do pandas
+            with gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=3, mtime=0) as saida:
+                pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), saida)
+            arquivos[f"{nome}.csv.gz"] = buffer.getvalue()
+
+    return arquivos
 
-    print(f"💾 Salvando arquivo Excel em: {caminho_arquivo}")
-    with pd.ExcelWriter(caminho_arquivo, engine="openpyxl") as writer:
-        df_dados.to_excel(writer, index=False, sheet_name="dados")
-        if resumo_df is not None and not resumo_df.empty:
-            resumo_df.to_excel(writer, index=False, sheet_name="resumo_unidade")
-        if preco_ref_df is not None and not preco_ref_df.empty:
-            preco_ref_df.to_excel(writer, index=False, sheet_name="preco_referencia")
 
-    print("✅ Arquivo Excel gerado com sucesso.")
+def salvar_tabelas_colunares(df_dados, resumo_df, preco_ref_df, nome_base,
+                             formatos=("parquet", "csv")) -> list:
+    """
+    Grava em disco os arquivos de exportar_tabelas_colunares como
+    '<nome_base>_<tabela>.<extensão>'. Retorna os caminhos gravados.
+    """
+    caminhos = []
+    for nome_arquivo, conteudo in exportar_tabelas_colunares(
+            df_dados, resumo_df, preco_ref_df, formatos).items():
+        caminho = f"{nome_base}_{nome_arquivo}"
+        with open(caminho, "wb") as f:
+            f.write(conteudo)
+        caminhos.append(caminho)
+        emitir_evento(TipoEvento.INFORMACAO, f"💾 Arquivo colunar gerado: {caminho}",
+                      caminho=caminho, tamanho_bytes=len(conteudo))
+    return caminhos
 
 
 # ============================================================
 # 📝 RELATÓRIO HTML (NOTA TÉCNICA, SEM SEÇÃO DE GRÁFICOS)
 # ============================================================
 
+def montar_quadro_preco_referencia(preco_ref_df: pd.DataFrame,
+                                   resumo_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Quadro-resumo por unidade de medida: media, mediana, media_sanada,
+    preco_referencia sugerido (média saneada; na falta dela, a mediana;
+    na falta desta, a média) e os limites do intervalo.
+    """
+    quadro_df = preco_ref_df.copy()
+    for col in ["media", "mediana", "media_sanada"]:
+        if col in quadro_df.columns:
+            quadro_df[col] = pd.to_numeric(quadro_df[col], errors="coerce")
+
+    quadro_df["preco_referencia"] = quadro_df.get("media_sanada")
+    if "mediana" in quadro_df.columns:
+        mask_nan = quadro_df["preco_referencia"].isna()
+        quadro_df.loc[mask_nan, "preco_referencia"] = quadro_df.loc[mask_nan, "mediana"]
+    if "media" in quadro_df.columns:
+        mask_nan = quadro_df["preco_referencia"].isna()
+        quadro_df.loc[mask_nan, "preco_referencia"] = quadro_df.loc[mask_nan, "media"]
+
+    if resumo_df is not None and not resumo_df.empty:
+        limites = resumo_df[[
+            "unidadeMedida",
+            "limite_inferior_intervalo",
+            "limite_superior_intervalo"
+        ]].copy()
+        quadro_df = quadro_df.merge(limites, on="unidadeMedida", how="left")
+
+    return quadro_df.sort_values("unidadeMedida")
+
+
+def _celulas_html(serie: pd.Series, formato: str | None = None) -> pd.Series:
+    """
+    Conteúdo das células de uma coluna, já escapado. 'formato' (ex. "%.4f")
+    formata valores numéricos; ausentes/não numéricos viram célula vazia.
+    """
+    if formato is not None:
+        valores = pd.to_numeric(serie, errors="coerce").to_numpy(dtype="float64")
+        vazios = np.isnan(valores)
+        textos = np.char.mod(formato, np.where(vazios, 0.0, valores)).astype(object)
+        textos[vazios] = ""
+        return pd.Series(textos, index=serie.index)
+    return serie.astype(object).where(serie.notna(), "").astype(str).map(escapar_html)
+
+
+def _linhas_tabela_html(df: pd.DataFrame, colunas) -> str:
+    """
+    Monta as linhas <tr> de uma tabela HTML coluna a coluna (sem iterrows).
+
+    'colunas' é uma sequência de (nome_coluna, formato); colunas ausentes
+    no DataFrame geram células vazias.
+    """
+    if df is None or df.empty:
+        return ""
+    linhas = pd.Series("<tr>", index=df.index, dtype=object)
+    for nome, formato in colunas:
+        if nome in df.columns:
+            celulas = _celulas_html(df[nome], formato)
+        else:
+            celulas = ""
+        linhas = linhas + "<td>" + celulas + "</td>"
+    return "".join((linhas + "</tr>\n").tolist())
+
+
+COLUNAS_QUADRO_PRECO_HTML = [
+    ("unidadeMedida", None),
+    ("media", "%.4f"),
+    ("mediana", "%.4f"),
+    ("media_sanada", "%.4f"),
+    ("preco_referencia", "%.4f"),
+    ("limite_inferior_intervalo", "%.4f"),
+    ("limite_superior_intervalo", "%.4f"),
+]
+
+
 def gerar_relatorio_html(df_dados: pd.DataFrame,
                          resumo_df: pd.DataFrame,
                          preco_ref_df: pd.DataFrame,
                          meta: dict,
-                         caminho_html: str):
+                         caminho_html=None) -> str:
+    """
+    Gera relatório HTML em formato de nota técnica e o retorna como string.
+
+    Se 'caminho_html' for informado (caminho de arquivo ou objeto com
+    .write()), o relatório também é gravado nele.
+    """
+    if caminho_html is None:
+        mensagem = "📝 Gerando relatório HTML (em memória)..."
+    else:
+        mensagem = f"📝 Gerando relatório HTML em: {caminho_html}"
+    with etapa_eventos("relatorio_html", mensagem,
+                       "✅ Relatório HTML gerado com sucesso.") as extras:
+        html = _renderizar_relatorio_html(df_dados, resumo_df, preco_ref_df, meta)
+        extras["tamanho_bytes"] = len(html.encode("utf-8"))
+
+        if hasattr(caminho_html, "write"):
+            caminho_html.write(html)
+        elif caminho_html is not None:
+            with open(caminho_html, "w", encoding="utf-8") as f:
+                f.write(html)
+
+    return html
+
+
+def _renderizar_relatorio_html(df_dados, resumo_df, preco_ref_df, meta) -> str:
     """
-    Gera relatório HTML em formato de nota técnica.
+    Corpo de gerar_relatorio_html: monta o HTML da nota técnica.
     """
-    print(f"📝 Gerando relatório HTML em: {caminho_html}")
 
     total_registros = len(df_dados)
     if "unidadeMedida" in df_dados.columns:
@@ -510,72 +3673,42 @@ def gerar_relatorio_html(df_dados: pd.DataFrame,
             }
 
     # Tabela de filtros
-    filtros_html_rows = ""
-    for chave, valor in meta.get("filtros_efetivos", {}).items():
-        filtros_html_rows += f"<tr><td>{chave}</td><td>{valor}</td></tr>\n"
+    filtros_html_rows = "".join(
+        f"<tr><td>{escapar_html(str(chave))}</td><td>{escapar_html(str(valor))}</td></tr>\n"
+        for chave, valor in meta.get("filtros_efetivos", {}).items()
+    )
 
     # Estatísticas globais
-    estat_html_rows = ""
-    for k, v in estat_resultado.items():
-        estat_html_rows += f"<tr><td>{k}</td><td>{v:.4f}</td></tr>\n"
+    estat_html_rows = "".join(
+        f"<tr><td>{k}</td><td>{v:.4f}</td></tr>\n" for k, v in estat_resultado.items()
+    )
 
     hoje_str = date.today().strftime("%d/%m/%Y")
 
+    # Aviso de resultado provisório (modo prévia)
+    aviso_previa_html = ""
+    previa = meta.get("previa")
+    if previa:
+        total = previa.get("total_registros")
+        cobertura = (f"{previa.get('registros', 0)} de {total} registros da consulta"
+                     if total else f"{previa.get('registros', 0)} registros")
+        aviso_previa_html = f"""
+<div class="aviso-previa">
+<strong>RESULTADO PROVISÓRIO (PRÉVIA).</strong> A coleta foi interrompida
+({escapar_html(str(previa.get("motivo", "")))}) e cobre apenas {cobertura}
+({escapar_html(str(previa.get("criterio", "")))}). Os valores abaixo servem para
+uma estimativa inicial e não substituem a pesquisa completa.
+</div>
+"""
+
     # Quadro-resumo de preço de referência
     quadro_html_rows = ""
     if preco_ref_df is not None and not preco_ref_df.empty:
-        quadro_df = preco_ref_df.copy()
-        for col in ["media", "mediana", "media_sanada"]:
-            if col in quadro_df.columns:
-                quadro_df[col] = pd.to_numeric(quadro_df[col], errors="coerce")
-
-        quadro_df["preco_referencia"] = quadro_df.get("media_sanada")
-        if "mediana" in quadro_df.columns:
-            mask_nan = quadro_df["preco_referencia"].isna()
-            quadro_df.loc[mask_nan, "preco_referencia"] = quadro_df.loc[mask_nan, "mediana"]
-        if "media" in quadro_df.columns:
-            mask_nan = quadro_df["preco_referencia"].isna()
-            quadro_df.loc[mask_nan, "preco_referencia"] = quadro_df.loc[mask_nan, "media"]
-
-        if resumo_df is not None and not resumo_df.empty:
-            limites = resumo_df[[
-                "unidadeMedida",
-                "limite_inferior_intervalo",
-                "limite_superior_intervalo"
-            ]].copy()
-            quadro_df = quadro_df.merge(limites, on="unidadeMedida", how="left")
-
-        quadro_df = quadro_df.sort_values("unidadeMedida")
-
-        def fmt(x):
-            try:
-                return f"{float(x):.4f}"
-            except Exception:
-                return ""
-
-        for _, row in quadro_df.iterrows():
-            um = row.get("unidadeMedida", "")
-            media = row.get("media", float("nan"))
-            mediana = row.get("mediana", float("nan"))
-            media_sanada = row.get("media_sanada", float("nan"))
-            pr = row.get("preco_referencia", float("nan"))
-            li = row.get("limite_inferior_intervalo", float("nan"))
-            ls = row.get("limite_superior_intervalo", float("nan"))
-
-            quadro_html_rows += (
-                "<tr>"
-                f"<td>{um}</td>"
-                f"<td>{fmt(media)}</td>"
-                f"<td>{fmt(mediana)}</td>"
-                f"<td>{fmt(media_sanada)}</td>"
-                f"<td>{fmt(pr)}</td>"
-                f"<td>{fmt(li)}</td>"
-                f"<td>{fmt(ls)}</td>"
-                "</tr>\n"
-            )
+        quadro_df = montar_quadro_preco_referencia(preco_ref_df, resumo_df)
+        quadro_html_rows = _linhas_tabela_html(quadro_df, COLUNAS_QUADRO_PRECO_HTML)
 
     # HTML
-    html = f"""
+    partes = [f"""
 <!DOCTYPE html>
 <html lang="pt-BR">
 <head>
@@ -589,12 +3722,14 @@ th, td {{ border: 1px solid #ccc; padding: 8px; text-align: left; }}
 th {{ background-color: #f0f0f0; }}
 .section {{ margin-bottom: 30px; }}
 small {{ color: #555; }}
+.aviso-previa {{ border: 2px solid #c77700; background-color: #fff4e0; padding: 10px; margin-bottom: 20px; }}
 </style>
 </head>
 <body>
 
 <h1>Relatório de Pesquisa de Preços – PNCP (Lei 14.133/2021)</h1>
 <p><small>Relatório gerado em {hoje_str}</small></p>
+{aviso_previa_html}
 
 <div class="section">
 <h2>1. Introdução</h2>
@@ -632,10 +3767,10 @@ contratações previstas na Lei nº 14.133/2021.
 A amostra consolidada (após filtros de valor, se aplicáveis) contém <strong>{total_registros}</strong> registros
 e <strong>{unidades_distintas}</strong> unidade(s) de medida distinta(s).
 </p>
-"""
+"""]
 
     if estat_resultado:
-        html += f"""
+        partes.append(f"""
 <p>Para o campo <code>valorUnitarioResultado</code>, as estatísticas descritivas globais são:</p>
 <table>
   <thead>
@@ -645,11 +3780,11 @@ e <strong>{unidades_distintas}</strong> unidade(s) de medida distinta(s).
     {estat_html_rows}
   </tbody>
 </table>
-"""
+""")
     else:
-        html += "<p>Não foi possível calcular estatísticas descritivas para <code>valorUnitarioResultado</code>.</p>"
+        partes.append("<p>Não foi possível calcular estatísticas descritivas para <code>valorUnitarioResultado</code>.</p>")
 
-    html += """
+    partes.append("""
 </div>
 
 <div class="section">
@@ -695,10 +3830,10 @@ por exemplo, a própria média saneada como valor de referência, desde que tecn
 
 <div class="section">
 <h2>7. Quadro-resumo de preço de referência por unidade de medida</h2>
-"""
+""")
 
     if quadro_html_rows:
-        html += f"""
+        partes.append(f"""
 <table>
   <thead>
     <tr>
@@ -715,21 +3850,17 @@ por exemplo, a própria média saneada como valor de referência, desde que tecn
     {quadro_html_rows}
   </tbody>
 </table>
-"""
+""")
     else:
-        html += "<p>Não foi possível montar o quadro-resumo por falta de dados consolidados.</p>"
+        partes.append("<p>Não foi possível montar o quadro-resumo por falta de dados consolidados.</p>")
 
-    html += """
+    partes.append("""
 </div>
 </body>
 </html>
-"""
-
-    with open(caminho_html, "w", encoding="utf-8") as f:
-        f.write(html)
+""")
 
-    print("✅ Relatório HTML gerado com sucesso.")
-    return caminho_html
+    return "".join(partes)
 
 
 # ============================================================
@@ -737,67 +3868,47 @@ por exemplo, a própria média saneada como valor de referência, desde que tecn
 # ============================================================
 
 def main():
-    cod_item = COD_ITEM_CATALOGO if COD_ITEM_CATALOGO is not None else None
-    data_inicial, data_final = calcular_intervalo_ultimo_ano()
-    filtros = montar_filtros_opcionais()
+    config = ConfiguracaoPesquisa.das_variaveis_globais()
+    cod_item = config.cod_item_catalogo
+    data_inicial, data_final = config.intervalo()
+    filtros = config.filtros_api()
 
-    # Usa as variáveis globais de filtro de valor (se existirem)
-    val_min = FILTRO_VALOR_MIN
-    val_max = FILTRO_VALOR_MAX
+    val_min = config.valor_min
+    val_max = config.valor_max
 
     # Dicionário para o relatório (Metadados)
-    filtros_efetivos = {
-        "codItemCatalogo": cod_item if cod_item is not None else "",
-        "orgaoEntidadeCnpj": ORGAO_ENTIDADE_CNPJ,
-        "unidadeOrgaoCodigoUnidade": UNIDADE_ORGAO_CODIGO_UNIDADE,
-        "situacaoCompraItem": SITUACAO_COMPRA_ITEM,
-        "materialOuServico": MATERIAL_OU_SERVICO,
-        "codigoClasse": CODIGO_CLASSE,
-        "codigoGrupo": CODIGO_GRUPO,
-        "codFornecedor": COD_FORNECEDOR,
-        "temResultado": FILTRAR_TEM_RESULTADO,
-        "bps": FILTRAR_BPS,
-        "margemPreferenciaNormal": FILTRAR_MARGEM_PREFERENCIA_NORMAL,
-        "codigoNCM": CODIGO_NCM,
-        "valorMinimo": f"R$ {val_min}" if val_min else "",
-        "valorMaximo": f"R$ {val_max}" if val_max else "",
-    }
-    filtros_efetivos = {k: v for k, v in filtros_efetivos.items() if v not in (None, "", [])}
-
-    resultados = buscar_itens_pncp(
-        cod_item_catalogo=cod_item,
-        data_inicial=data_inicial,
-        data_final=data_final,
-        filtros_opcionais=filtros,
-        tamanho_pagina=500,
-    )
-
-    # --- FILTRAGEM POR FAIXA DE VALOR ---
-    # A filtragem acontece ANTES de gerar os DataFrames de estatística
-    if val_min is not None or val_max is not None:
-        print(f"🔎 Filtrando resultados por faixa de valor: Min={val_min}, Max={val_max}")
-        resultados_filtrados = []
-        for item in resultados:
-            # Tenta usar o valorUnitarioResultado, se não existir, ignora o item para estatística
-            val_res = item.get("valorUnitarioResultado")
-            if val_res is None:
-                continue
-            try:
-                v = float(val_res)
-                if val_min is not None and v < val_min:
-                    continue
-                if val_max is not None and v > val_max:
-                    continue
-                resultados_filtrados.append(item)
-            except (ValueError, TypeError):
-                continue
-        
-        print(f"   - Registros antes do filtro: {len(resultados)}")
-        print(f"   - Registros após o filtro: {len(resultados_filtrados)}")
-        resultados = resultados_filtrados
-    # ------------------------------------
+    filtros_efetivos = config.filtros_efetivos()
+
+    if SINCRONIZACAO_INCREMENTAL:
+        resultados = sincronizar_itens_incremental(
+            cod_item, data_inicial, data_final,
+            filtros_opcionais=filtros,
+            dias_reverificacao=DIAS_REVERIFICACAO,
+            dias_verificacao_completa=DIAS_VERIFICACAO_COMPLETA,
+            tamanho_pagina=TAMANHO_PAGINA,
+            tamanho_adaptativo=TAMANHO_PAGINA_ADAPTATIVO,
+            paginas_simultaneas=PAGINAS_SIMULTANEAS,
+            fatiar_por_data=FATIAR_POR_DATA,
+        )
+    else:
+        # Páginas consumidas à medida que chegam (sem acumular a lista)
+        resultados = iterar_paginas_pncp(
+            cod_item,
+            data_inicial,
+            data_final,
+            filtros_opcionais=filtros,
+            tamanho_pagina=TAMANHO_PAGINA,
+            tamanho_adaptativo=TAMANHO_PAGINA_ADAPTATIVO,
+            paginas_simultaneas=PAGINAS_SIMULTANEAS,
+            fatiar_por_data=FATIAR_POR_DATA,
+            compacta=COLETA_COMPACTA,
+            colunas=PERFIS_COLUNAS[PERFIL_COLUNAS],
+        )
 
-    df_dados, resumo_df, preco_ref_df = preparar_dataframes(resultados)
+    # A filtragem por faixa de valor acontece ANTES de gerar as estatísticas
+    df_dados, resumo_df, preco_ref_df = preparar_dataframes(
+        resultados, valor_min=val_min, valor_max=val_max
+    )
 
     if NOME_BASE_SAIDA:
         base = NOME_BASE_SAIDA
@@ -809,6 +3920,8 @@ def main():
     caminho_html = f"{base}.html"
 
     salvar_resultados_em_excel(df_dados, resumo_df, preco_ref_df, caminho_excel)
+    if FORMATOS_COLUNARES:
+        salvar_tabelas_colunares(df_dados, resumo_df, preco_ref_df, base, FORMATOS_COLUNARES)
 
     meta = {
         "data_inicial": data_inicial,
@@ -833,9 +3946,6 @@ def main():
 # 🔁 FUNÇÃO PARA USO VIA APLICAÇÃO WEB (STREAMLIT)
 # ============================================================
 
-import io
-import os
-
 def executar_pesquisa_e_gerar_arquivos(
     cod_item_catalogo=None,
     orgao_cnpj="",
@@ -852,132 +3962,730 @@ def executar_pesquisa_e_gerar_arquivos(
     valor_min=None, # <--- NOVO PARAMETRO
     valor_max=None, # <--- NOVO PARAMETRO
     nome_base_saida=None,
+    paginas_simultaneas=PAGINAS_SIMULTANEAS,
+    cliente=None,
+    incremental=SINCRONIZACAO_INCREMENTAL,
+    armazem=None,
+    fatiar_por_data=FATIAR_POR_DATA,
+    formatos_colunares=FORMATOS_COLUNARES,
+    config: ConfiguracaoPesquisa = None,
+    progresso: ProgressoColeta = None,
+    previa: ModoPrevia = None,
 ):
     """
     Executa toda a pipeline, retornando bytes do Excel e string HTML.
-    """
-    global COD_ITEM_CATALOGO, ORGAO_ENTIDADE_CNPJ, UNIDADE_ORGAO_CODIGO_UNIDADE
-    global SITUACAO_COMPRA_ITEM, MATERIAL_OU_SERVICO, CODIGO_CLASSE, CODIGO_GRUPO
-    global COD_FORNECEDOR, FILTRAR_TEM_RESULTADO, FILTRAR_BPS
-    global FILTRAR_MARGEM_PREFERENCIA_NORMAL, CODIGO_NCM, NOME_BASE_SAIDA
-    # Variáveis globais de valor (para Jupyter) não precisam ser setadas aqui, pois usamos locais
-
-    COD_ITEM_CATALOGO = cod_item_catalogo
-    ORGAO_ENTIDADE_CNPJ = orgao_cnpj or ""
-    UNIDADE_ORGAO_CODIGO_UNIDADE = unidade_orgao
-    SITUACAO_COMPRA_ITEM = situacao_item or ""
-    MATERIAL_OU_SERVICO = material_ou_servico or ""
-    CODIGO_CLASSE = codigo_classe
-    CODIGO_GRUPO = codigo_grupo
-    COD_FORNECEDOR = cod_fornecedor or ""
-    FILTRAR_TEM_RESULTADO = tem_resultado
-    FILTRAR_BPS = bps
-    FILTRAR_MARGEM_PREFERENCIA_NORMAL = margem_pref_normal
-    CODIGO_NCM = codigo_ncm or ""
-    NOME_BASE_SAIDA = nome_base_saida
-
-    data_inicial, data_final = calcular_intervalo_ultimo_ano()
-    filtros = montar_filtros_opcionais()
 
-    filtros_efetivos = {
-        "codItemCatalogo": cod_item_catalogo if cod_item_catalogo is not None else "",
-        "orgaoEntidadeCnpj": ORGAO_ENTIDADE_CNPJ,
-        "unidadeOrgaoCodigoUnidade": UNIDADE_ORGAO_CODIGO_UNIDADE,
-        "situacaoCompraItem": SITUACAO_COMPRA_ITEM,
-        "materialOuServico": MATERIAL_OU_SERVICO,
-        "codigoClasse": CODIGO_CLASSE,
-        "codigoGrupo": CODIGO_GRUPO,
-        "codFornecedor": COD_FORNECEDOR,
-        "temResultado": FILTRAR_TEM_RESULTADO,
-        "bps": FILTRAR_BPS,
-        "margemPreferenciaNormal": FILTRAR_MARGEM_PREFERENCIA_NORMAL,
-        "codigoNCM": CODIGO_NCM,
-        "valorMinimo": f"R$ {valor_min}" if valor_min is not None else "",
-        "valorMaximo": f"R$ {valor_max}" if valor_max is not None else "",
-    }
-    filtros_efetivos = {
-        k: v for k, v in filtros_efetivos.items()
-        if v not in (None, "", [])
-    }
+    Os filtros podem vir como argumentos avulsos ou, de uma vez, em
+    'config' (ConfiguracaoPesquisa), que tem precedência. Nenhum estado do
+    módulo é alterado: chamadas simultâneas em threads distintas são
+    independentes.
+
+    Se 'formatos_colunares' incluir "parquet" e/ou "csv", meta["arquivos_colunares"]
+    traz {"<tabela>.<extensão>": bytes} de dados, resumo_unidade e
+    preco_referencia (veja exportar_tabelas_colunares).
+
+    'progresso' (ProgressoColeta) acompanha a coleta e permite cancelá-la;
+    nesse caso é levantada PesquisaCancelada.
+
+    Com 'previa' (ModoPrevia), a coleta é parcial (veja iterar_previa_pncp)
+    e a sincronização incremental não é usada. Se a prévia não cobrir a
+    consulta inteira, meta["previa"] descreve a coleta, o resultado é
+    marcado como provisório (aba 'previa' na planilha, aviso no relatório,
+    sufixo "_previa" no nome) e meta["coleta_completa"] é False. As
+    páginas baixadas ficam no cache de respostas do cliente, e a pesquisa
+    completa lançada em seguida com os mesmos filtros as reaproveita.
+    """
+    if config is None:
+        config = ConfiguracaoPesquisa(
+            cod_item_catalogo=cod_item_catalogo,
+            orgao_entidade_cnpj=orgao_cnpj,
+            unidade_orgao_codigo_unidade=unidade_orgao,
+            situacao_compra_item=situacao_item,
+            material_ou_servico=material_ou_servico,
+            codigo_classe=codigo_classe,
+            codigo_grupo=codigo_grupo,
+            cod_fornecedor=cod_fornecedor,
+            filtrar_tem_resultado=tem_resultado,
+            filtrar_bps=bps,
+            filtrar_margem_preferencia_normal=margem_pref_normal,
+            codigo_ncm=codigo_ncm,
+            valor_min=valor_min,
+            valor_max=valor_max,
+        )
+    cod_item_catalogo = config.cod_item_catalogo
+    valor_min, valor_max = config.valor_min, config.valor_max
+
+    data_inicial, data_final = config.intervalo()
+    filtros = config.filtros_api()
+    filtros_efetivos = config.filtros_efetivos()
+
+    if previa is not None:
+        resultados = iterar_previa_pncp(
+            cod_item_catalogo, data_inicial, data_final, previa,
+            filtros_opcionais=filtros,
+            tamanho_pagina=TAMANHO_PAGINA,
+            tamanho_adaptativo=TAMANHO_PAGINA_ADAPTATIVO,
+            paginas_simultaneas=paginas_simultaneas,
+            cliente=cliente,
+            fatiar_por_data=fatiar_por_data,
+            progresso=progresso,
+            compacta=COLETA_COMPACTA,
+            colunas=PERFIS_COLUNAS[PERFIL_COLUNAS],
+        )
+    elif incremental:
+        resultados = sincronizar_itens_incremental(
+            cod_item_catalogo, data_inicial, data_final,
+            filtros_opcionais=filtros,
+            armazem=armazem,
+            dias_reverificacao=DIAS_REVERIFICACAO,
+            dias_verificacao_completa=DIAS_VERIFICACAO_COMPLETA,
+            tamanho_pagina=TAMANHO_PAGINA,
+            tamanho_adaptativo=TAMANHO_PAGINA_ADAPTATIVO,
+            paginas_simultaneas=paginas_simultaneas,
+            cliente=cliente,
+            fatiar_por_data=fatiar_por_data,
+            progresso=progresso,
+        )
+    else:
+        resultados = iterar_paginas_pncp(
+            cod_item_catalogo,
+            data_inicial,
+            data_final,
+            filtros_opcionais=filtros,
+            tamanho_pagina=TAMANHO_PAGINA,
+            tamanho_adaptativo=TAMANHO_PAGINA_ADAPTATIVO,
+            paginas_simultaneas=paginas_simultaneas,
+            cliente=cliente,
+            fatiar_por_data=fatiar_por_data,
+            progresso=progresso,
+            compacta=COLETA_COMPACTA,
+            colunas=PERFIS_COLUNAS[PERFIL_COLUNAS],
+        )
 
-    resultados = buscar_itens_pncp(
-        cod_item_catalogo=cod_item_catalogo,
-        data_inicial=data_inicial,
-        data_final=data_final,
-        filtros_opcionais=filtros,
-        tamanho_pagina=500,
+    # Filtro de valor aplicado página a página, antes das estatísticas
+    df_dados, resumo_df, preco_ref_df = preparar_dataframes(
+        resultados, valor_min=valor_min, valor_max=valor_max
     )
+    if progresso is not None:
+        progresso.verificar_cancelamento()
+        progresso.etapa = "gerando arquivos"
 
-    # --- APLICAÇÃO DO FILTRO DE VALOR (NOVO BLOCO) ---
-    # Filtra a lista de resultados antes de converter para DataFrame
-    if valor_min is not None or valor_max is not None:
-        resultados_filtrados = []
-        for item in resultados:
-            val_res = item.get("valorUnitarioResultado")
-            
-            # Se não tem preço de resultado, não serve para pesquisa de preço
-            if val_res is None: 
-                continue
-            
-            try:
-                v = float(val_res)
-                
-                # Verifica Minimo
-                if valor_min is not None and v < valor_min:
-                    continue
-                
-                # Verifica Maximo
-                if valor_max is not None and v > valor_max:
-                    continue
-                
-                resultados_filtrados.append(item)
-            except (ValueError, TypeError):
-                # Se o valor não for numérico válido, descarta
-                continue
-        
-        resultados = resultados_filtrados
-    # -------------------------------------------------
-
-    df_dados, resumo_df, preco_ref_df = preparar_dataframes(resultados)
+    # Prévia que cobriu a consulta inteira não é provisória
+    info_previa = getattr(resultados, "previa", None)
+    if info_previa and resultados.completa:
+        info_previa = None
 
     if nome_base_saida:
         base = nome_base_saida
     else:
         cod_str = str(cod_item_catalogo) if cod_item_catalogo is not None else "sem_item"
         base = f"pncp_itens_param_{cod_str}_{data_inicial}_a_{data_final}"
+        if info_previa:
+            base += "_previa"
 
-    # Gera Excel em memória
+    # Gera Excel em memória (escrita em streaming)
+    abas = _abas_resultado(df_dados, resumo_df, preco_ref_df)
+    if info_previa:
+        abas = {"previa": _tabela_previa(info_previa), **abas}
     output_excel = io.BytesIO()
-    with pd.ExcelWriter(output_excel, engine="openpyxl") as writer:
-        df_dados.to_excel(writer, index=False, sheet_name="dados")
-        if resumo_df is not None and not resumo_df.empty:
-            resumo_df.to_excel(writer, index=False, sheet_name="resumo_unidade")
-        if preco_ref_df is not None and not preco_ref_df.empty:
-            preco_ref_df.to_excel(writer, index=False, sheet_name="preco_referencia")
+    escrever_excel_streaming(output_excel, abas)
     excel_bytes = output_excel.getvalue()
 
-    # Gera HTML em arquivo temporário para ler de volta (ou adapta função)
-    # Para simplificar, adaptamos a função de HTML para aceitar string IO ou
-    # geramos num tempfile e lemos. Vamos usar um tempfile simples.
-    temp_html_name = f"temp_{base}.html"
-    
     meta = {
         "data_inicial": data_inicial,
         "data_final": data_final,
         "filtros_efetivos": filtros_efetivos,
         "nome_base": base
     }
+    if info_previa:
+        meta["previa"] = info_previa
+    if formatos_colunares and not df_dados.empty:
+        meta["arquivos_colunares"] = exportar_tabelas_colunares(
+            df_dados, resumo_df, preco_ref_df, formatos_colunares
+        )
+
+    # Coleta interrompida por erro não deve ser reaproveitada por caches
+    meta["coleta_completa"] = getattr(resultados, "completa", True) is not False
+
+    # Relatório renderizado direto em memória (sem arquivo temporário)
+    html_string = gerar_relatorio_html(df_dados, resumo_df, preco_ref_df, meta)
+
+    return excel_bytes, html_string, meta
+
+# ============================================================
+# 🗃️ CACHE DE RESULTADOS (APLICAÇÃO WEB)
+# ============================================================
+
+class CacheResultadosPesquisa:
+    """
+    Cache em memória dos resultados de executar_pesquisa_e_gerar_arquivos
+    (excel_bytes, html_string, meta), pensado para ser compartilhado entre
+    as sessões da aplicação web.
+
+    - A chave é qualquer tupla hashável (ex.: filtros já convertidos +
+      janela de datas).
+    - Entradas mais antigas que 'ttl_segundos' expiram.
+    - Acima de 'max_entradas' ou de 'max_bytes' (soma dos arquivos
+      guardados), as entradas menos recentemente usadas são descartadas.
+    - 'acertos' e 'falhas' contam as consultas.
+
+    Seguro para uso entre threads.
+    """
+
+    def __init__(self, ttl_segundos=CACHE_RESULTADOS_TTL_MINUTOS * 60,
+                 max_entradas=CACHE_RESULTADOS_MAX_ENTRADAS,
+                 max_bytes=CACHE_RESULTADOS_MAX_MB * 1024 * 1024):
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.acertos = 0
+        self.falhas = 0
+        self._entradas = OrderedDict()  # chave -> (criado_em, tamanho, resultado)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _tamanho(resultado) -> int:
+        excel_bytes, html_string, meta = resultado
+        tamanho = len(excel_bytes or b"") + len(html_string or "")
+        for conteudo in meta.get("arquivos_colunares", {}).values():
+            tamanho += len(conteudo)
+        return tamanho
+
+    def _remover(self, chave):
+        _, tamanho, _ = self._entradas.pop(chave)
+        self._total_bytes -= tamanho
+
+    def obter(self, chave):
+        """
+        Devolve (resultado, idade_segundos) para a chave, ou None se não
+        houver entrada válida.
+        """
+        agora = time.time()
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None and agora - entrada[0] > self.ttl_segundos:
+                self._remover(chave)
+                entrada = None
+            if entrada is None:
+                self.falhas += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self.acertos += 1
+            return entrada[2], agora - entrada[0]
+
+    def guardar(self, chave, resultado):
+        """
+        Armazena o resultado. Resultados maiores que 'max_bytes' não são
+        guardados.
+        """
+        tamanho = self._tamanho(resultado)
+        if tamanho > self.max_bytes:
+            return
+        with self._lock:
+            if chave in self._entradas:
+                self._remover(chave)
+            self._entradas[chave] = (time.time(), tamanho, resultado)
+            self._total_bytes += tamanho
+            while (len(self._entradas) > self.max_entradas
+                   or self._total_bytes > self.max_bytes):
+                self._remover(next(iter(self._entradas)))
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {
+                "entradas": len(self._entradas),
+                "bytes": self._total_bytes,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+            }
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._total_bytes = 0
+
+
+# ============================================================
+# ⏳ PESQUISAS EM SEGUNDO PLANO (APLICAÇÃO WEB)
+# ============================================================
+
+class TarefaPesquisa:
+    """
+    Uma execução de executar_pesquisa_e_gerar_arquivos em segundo plano.
+
+    'estado' é um de: "na_fila", "executando", "concluida", "cancelada"
+    ou "erro". Quando concluída, 'resultado' traz (excel_bytes,
+    html_string, meta); em caso de erro, 'erro' traz a mensagem.
+    'eventos' guarda os últimos EventoPNCP emitidos por esta pesquisa.
+    """
+
+    ESTADOS_FINAIS = ("concluida", "cancelada", "erro")
+
+    def __init__(self, id_tarefa, parametros):
+        self.id = id_tarefa
+        self.parametros = parametros
+        self.progresso = ProgressoColeta()
+        self.estado = "na_fila"
+        self.resultado = None
+        self.erro = None
+        self.criada_em = time.time()
+        self.concluida_em = None
+        self.futuro = None
+        self.eventos = deque(maxlen=200)
+
+    @property
+    def finalizada(self) -> bool:
+        return self.estado in self.ESTADOS_FINAIS
+
+    def status(self) -> dict:
+        return {"id": self.id, "estado": self.estado, "erro": self.erro,
+                **self.progresso.instantaneo()}
+
+
+class GerenciadorTarefas:
+    """
+    Fila de pesquisas executadas por um pool de threads, para que a
+    aplicação web não fique bloqueada durante a coleta.
+
+    - submeter(**parametros) → id da tarefa (parâmetros de
+      executar_pesquisa_e_gerar_arquivos, ex.: config=..., formatos_colunares=...).
+    - obter(id) → TarefaPesquisa (status, progresso, resultado).
+    - cancelar(id) → tira da fila ou interrompe a coleta em andamento.
+
+    Guarda até 'max_tarefas_guardadas' tarefas finalizadas; as mais
+    antigas são descartadas.
+    """
+
+    def __init__(self, tarefas_simultaneas=TAREFAS_SIMULTANEAS,
+                 max_tarefas_guardadas=100):
+        self.max_tarefas_guardadas = max_tarefas_guardadas
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, tarefas_simultaneas),
+            thread_name_prefix="pesquisa_pncp",
+        )
+        self._tarefas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submeter(self, **parametros) -> str:
+        tarefa = TarefaPesquisa(uuid.uuid4().hex, parametros)
+        with self._lock:
+            self._tarefas[tarefa.id] = tarefa
+            self._descartar_antigas()
+        tarefa.futuro = self._executor.submit(self._executar, tarefa)
+        return tarefa.id
+
+    def obter(self, id_tarefa):
+        with self._lock:
+            return self._tarefas.get(id_tarefa)
+
+    def cancelar(self, id_tarefa) -> bool:
+        """
+        Pede o cancelamento; devolve False se a tarefa não existe ou já
+        terminou.
+        """
+        tarefa = self.obter(id_tarefa)
+        if tarefa is None or tarefa.finalizada:
+            return False
+        tarefa.progresso.cancelar()
+        if tarefa.futuro is not None and tarefa.futuro.cancel():
+            self._finalizar(tarefa, "cancelada")
+        return True
+
+    def _finalizar(self, tarefa, estado, resultado=None, erro=None):
+        tarefa.resultado = resultado
+        tarefa.erro = erro
+        tarefa.concluida_em = time.time()
+        tarefa.progresso.etapa = estado
+        tarefa.estado = estado
+
+    def _executar(self, tarefa):
+        if tarefa.progresso.cancelado:
+            self._finalizar(tarefa, "cancelada")
+            return
+        tarefa.estado = "executando"
+        try:
+            with inscrever_localmente(tarefa.eventos.append):
+                resultado = executar_pesquisa_e_gerar_arquivos(
+                    progresso=tarefa.progresso, **tarefa.parametros
+                )
+        except PesquisaCancelada:
+            self._finalizar(tarefa, "cancelada")
+        except Exception as exc:
+            emitir_evento(TipoEvento.ERRO,
+                          f"❌ Erro na pesquisa em segundo plano {tarefa.id}: {exc}",
+                          tarefa=tarefa.id, detalhes=str(exc))
+            self._finalizar(tarefa, "erro", erro=str(exc))
+        else:
+            self._finalizar(tarefa, "concluida", resultado=resultado)
+
+    def _descartar_antigas(self):
+        finalizadas = [t.id for t in self._tarefas.values() if t.finalizada]
+        excesso = len(finalizadas) - self.max_tarefas_guardadas
+        for id_tarefa in finalizadas[:max(0, excesso)]:
+            del self._tarefas[id_tarefa]
+
+    def encerrar(self):
+        for tarefa in list(self._tarefas.values()):
+            tarefa.progresso.cancelar()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ============================================================
+# 📚 PESQUISA EM LOTE (LISTA DE ITENS DE CATÁLOGO)
+# ============================================================
+
+def _descricao_predominante(df_dados: pd.DataFrame) -> str:
+    """
+    descricaoResumida mais frequente do item (para identificar a linha).
+    """
+    if df_dados.empty or "descricaoResumida" not in df_dados.columns:
+        return ""
+    moda = df_dados["descricaoResumida"].dropna().astype(str).mode()
+    return moda.iloc[0] if not moda.empty else ""
+
+
+def montar_preco_referencia_itens(resultados_por_item: dict,
+                                  itens_incompletos=()) -> pd.DataFrame:
+    """
+    Tabela consolidada de preço de referência por item e unidade de medida,
+    a partir de {codItemCatalogo: (df_dados, resumo_df, preco_ref_df)}.
+    Itens sem registros aparecem com resultado_qtde = 0. A coluna
+    coleta_completa é False nos 'itens_incompletos' (coleta interrompida
+    por erro), cujos valores não representam toda a consulta.
+    """
+    linhas = []
+    for cod, (df_dados, resumo_df, preco_ref_df) in resultados_por_item.items():
+        descricao = _descricao_predominante(df_dados)
+        if preco_ref_df is None or preco_ref_df.empty:
+            linhas.append(pd.DataFrame({
+                "codItemCatalogo": [cod],
+                "descricaoItem": [descricao],
+                "resultado_qtde": [0],
+                "coleta_completa": [cod not in itens_incompletos],
+            }))
+            continue
+
+        quadro = montar_quadro_preco_referencia(preco_ref_df, resumo_df)
+        quadro = quadro.merge(
+            resumo_df[["unidadeMedida", "resultado_qtde"]],
+            on="unidadeMedida", how="left",
+        )
+        quadro.insert(0, "descricaoItem", descricao)
+        quadro.insert(0, "codItemCatalogo", cod)
+        quadro["coleta_completa"] = cod not in itens_incompletos
+        linhas.append(quadro)
+
+    if not linhas:
+        return pd.DataFrame()
+
+    colunas = [
+        "codItemCatalogo", "descricaoItem", "unidadeMedida", "resultado_qtde",
+        "media", "mediana", "media_sanada", "preco_referencia",
+        "limite_inferior_intervalo", "limite_superior_intervalo", "coleta_completa",
+    ]
+    df = pd.concat(linhas, ignore_index=True, sort=False)
+    return df[[c for c in colunas if c in df.columns]]
+
+
+def gerar_relatorio_lote_html(preco_itens_df: pd.DataFrame, meta: dict) -> str:
+    """
+    Nota técnica consolidada da pesquisa em lote: período, filtros e
+    quadro de preço de referência por item e unidade de medida.
+    """
+    hoje_str = date.today().strftime("%d/%m/%Y")
+
+    filtros_html_rows = "".join(
+        f"<tr><td>{escapar_html(str(chave))}</td><td>{escapar_html(str(valor))}</td></tr>\n"
+        for chave, valor in meta.get("filtros_efetivos", {}).items()
+    )
+
+    itens_df = preco_itens_df.copy()
+    if "resultado_qtde" in itens_df.columns:
+        itens_df["resultado_qtde"] = (
+            pd.to_numeric(itens_df["resultado_qtde"], errors="coerce").fillna(0)
+        )
+    itens_html_rows = _linhas_tabela_html(
+        itens_df,
+        [("codItemCatalogo", None), ("descricaoItem", None),
+         ("unidadeMedida", None), ("resultado_qtde", "%d")]
+        + COLUNAS_QUADRO_PRECO_HTML[1:],
+    )
+
+    # Aviso de itens com coleta interrompida por erro
+    aviso_incompleta_html = ""
+    incompletos = meta.get("itens_coleta_incompleta")
+    if incompletos:
+        lista = escapar_html(", ".join(str(c) for c in incompletos))
+        aviso_incompleta_html = f"""
+<div class="aviso-previa">
+<strong>COLETA INCOMPLETA.</strong> A coleta dos itens {lista} foi interrompida por
+erro de acesso à API. Os valores desses itens (inclusive a ausência de resultados)
+não representam toda a consulta; refaça a pesquisa deles antes de usar o quadro abaixo.
+</div>
+"""
+
+    return f"""
+<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="UTF-8">
+<title>Relatório de Pesquisa de Preços em Lote – PNCP</title>
+<style>
+body {{ font-family: Arial, sans-serif; margin: 20px; }}
+h1, h2, h3 {{ color: #333; }}
+table {{ border-collapse: collapse; width: 100%; margin-bottom: 20px; }}
+th, td {{ border: 1px solid #ccc; padding: 8px; text-align: left; }}
+th {{ background-color: #f0f0f0; }}
+.section {{ margin-bottom: 30px; }}
+small {{ color: #555; }}
+.aviso-previa {{ border: 2px solid #c77700; background-color: #fff4e0; padding: 10px; margin-bottom: 20px; }}
+</style>
+</head>
+<body>
+
+<h1>Relatório de Pesquisa de Preços em Lote – PNCP (Lei 14.133/2021)</h1>
+<p><small>Relatório gerado em {hoje_str}</small></p>
+{aviso_incompleta_html}
+
+<div class="section">
+<h2>1. Período e filtros utilizados</h2>
+<ul>
+  <li><strong>Data inicial:</strong> {meta.get("data_inicial", "")}</li>
+  <li><strong>Data final:</strong> {meta.get("data_final", "")}</li>
+  <li><strong>Itens pesquisados:</strong> {meta.get("quantidade_itens", 0)}</li>
+</ul>
+<table>
+  <thead>
+    <tr><th>Parâmetro</th><th>Valor</th></tr>
+  </thead>
+  <tbody>
+    {filtros_html_rows}
+  </tbody>
+</table>
+</div>
+
+<div class="section">
+<h2>2. Metodologia</h2>
+<p>
+Cada item de catálogo foi pesquisado individualmente com os mesmos filtros e período, aplicando
+a mesma metodologia da pesquisa individual: estatísticas por unidade de medida e
+<strong>média saneada</strong> (expurgo iterativo de valores fora de M ± DP enquanto o CV
+exceder 25%). O preço de referência sugerido é a média saneada; na falta dela, a mediana;
+na falta desta, a média.
+</p>
+</div>
+
+<div class="section">
+<h2>3. Quadro de preço de referência por item</h2>
+<table>
+  <thead>
+    <tr>
+      <th>Item (CATMAT/CATSER)</th>
+      <th>Descrição</th>
+      <th>Unidade de medida</th>
+      <th>Qtde. de resultados</th>
+      <th>Média</th>
+      <th>Mediana</th>
+      <th>Média saneada</th>
+      <th>Preço de referência sugerido</th>
+      <th>Limite inferior (intervalo)</th>
+      <th>Limite superior (intervalo)</th>
+    </tr>
+  </thead>
+  <tbody>
+    {itens_html_rows}
+  </tbody>
+</table>
+</div>
+</body>
+</html>
+"""
+
+
+def executar_pesquisa_em_lote(
+    codigos_itens,
+    orgao_cnpj="",
+    unidade_orgao=None,
+    situacao_item="",
+    material_ou_servico="",
+    codigo_classe=None,
+    codigo_grupo=None,
+    cod_fornecedor="",
+    tem_resultado=None,
+    bps=None,
+    margem_pref_normal=None,
+    codigo_ncm="",
+    valor_min=None,
+    valor_max=None,
+    nome_base_saida=None,
+    itens_simultaneos=ITENS_SIMULTANEOS_LOTE,
+    paginas_simultaneas=2,
+    requisicoes_por_segundo=REQUISICOES_POR_SEGUNDO_LOTE,
+    cliente=None,
+    fatiar_por_data=FATIAR_POR_DATA,
+    config: ConfiguracaoPesquisa = None,
+):
+    """
+    Pesquisa de preços de uma lista de códigos de catálogo (CATMAT/CATSER)
+    com filtros comuns, em um único processamento.
+
+    Os itens são pesquisados em paralelo (até 'itens_simultaneos') por um
+    único ClientePNCP, cujo limite de 'requisicoes_por_segundo' vale para o
+    conjunto. Para cada item são calculados resumo_unidade e
+    preco_referencia, consolidados em uma planilha e uma nota técnica.
+
+    Retorna:
+      - excel_bytes  → abas 'preco_referencia_itens', 'resumo_unidade', 'dados'
+                       (e 'coleta_incompleta', se algum item falhou)
+      - html_string  → nota técnica consolidada
+      - meta         → período, filtros, nome_base, registros por item,
+                       coleta_completa e itens_coleta_incompleta
+
+    Os filtros comuns podem vir em 'config' (ConfiguracaoPesquisa, cujo
+    cod_item_catalogo é ignorado), com precedência sobre os avulsos.
+    """
+    codigos = list(dict.fromkeys(int(c) for c in codigos_itens))
+
+    if config is None:
+        config = ConfiguracaoPesquisa(
+            orgao_entidade_cnpj=orgao_cnpj,
+            unidade_orgao_codigo_unidade=unidade_orgao,
+            situacao_compra_item=situacao_item,
+            material_ou_servico=material_ou_servico,
+            codigo_classe=codigo_classe,
+            codigo_grupo=codigo_grupo,
+            cod_fornecedor=cod_fornecedor,
+            filtrar_tem_resultado=tem_resultado,
+            filtrar_bps=bps,
+            filtrar_margem_preferencia_normal=margem_pref_normal,
+            codigo_ncm=codigo_ncm,
+            valor_min=valor_min,
+            valor_max=valor_max,
+        )
+    config = config.com(cod_item_catalogo=None)
+    valor_min, valor_max = config.valor_min, config.valor_max
+
+    data_inicial, data_final = config.intervalo()
+    filtros = config.filtros_api()
+    filtros_efetivos = config.filtros_efetivos()
+    filtros_efetivos = {
+        "codItemCatalogo": ", ".join(str(c) for c in codigos),
+        **filtros_efetivos,
+    }
+
+    # Cliente próprio do lote (limite de requisições e pool de conexões),
+    # com o cache de respostas do cliente compartilhado; fechado ao final
+    cliente_proprio = cliente is None
+    if cliente_proprio:
+        cliente = ClientePNCP(
+            cache=obter_cliente_padrao().cache,
+            requisicoes_por_segundo=requisicoes_por_segundo,
+            tamanho_pool=max(1, itens_simultaneos * paginas_simultaneas),
+            gravacao=obter_gravacao_configurada(),
+        )
+
+    emitir_evento(TipoEvento.INFORMACAO,
+                  f"📚 Pesquisa em lote: {len(codigos)} itens, "
+                  f"{itens_simultaneos} em paralelo.",
+                  itens=len(codigos), itens_simultaneos=itens_simultaneos)
+
+    def pesquisar_item(cod):
+        """
+        (df_dados, resumo_df, preco_ref_df) do item e se a coleta terminou
+        sem erro (ColetaPaginasPNCP.completa).
+        """
+        paginas = iterar_paginas_pncp(
+            cod, data_inicial, data_final,
+            filtros_opcionais=filtros,
+            tamanho_pagina=TAMANHO_PAGINA,
+            tamanho_adaptativo=TAMANHO_PAGINA_ADAPTATIVO,
+            paginas_simultaneas=paginas_simultaneas,
+            cliente=cliente,
+            fatiar_por_data=fatiar_por_data,
+            compacta=COLETA_COMPACTA,
+            colunas=PERFIS_COLUNAS[PERFIL_COLUNAS],
+        )
+        tabelas = preparar_dataframes(paginas, valor_min=valor_min, valor_max=valor_max)
+        return tabelas, paginas.completa
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, itens_simultaneos)) as executor:
+            futuros = [
+                executor.submit(contextvars.copy_context().run, pesquisar_item, cod)
+                for cod in codigos
+            ]
+            resultados_por_item = {}
+            itens_incompletos = []
+            for cod, futuro in zip(codigos, futuros):
+                resultados_por_item[cod], completa = futuro.result()
+                if not completa:
+                    itens_incompletos.append(cod)
+    finally:
+        if cliente_proprio:
+            cliente.fechar()
+
+    preco_itens_df = montar_preco_referencia_itens(resultados_por_item, itens_incompletos)
+
+    resumos = []
+    dados = []
+    for cod, (df_dados, resumo_df, _) in resultados_por_item.items():
+        if resumo_df is not None and not resumo_df.empty:
+            resumos.append(resumo_df.assign(codItemCatalogo=cod))
+        if not df_dados.empty:
+            dados.append(df_dados)
+    resumo_lote_df = pd.concat(resumos, ignore_index=True) if resumos else pd.DataFrame()
+    if not resumo_lote_df.empty:
+        resumo_lote_df = resumo_lote_df[
+            ["codItemCatalogo"] + [c for c in resumo_lote_df.columns if c != "codItemCatalogo"]
+        ]
+    dados_lote_df = pd.concat(dados, ignore_index=True, sort=False) if dados else pd.DataFrame()
+
+    base = nome_base_saida or f"pncp_lote_{len(codigos)}_itens_{data_inicial}_a_{data_final}"
+
+    abas = {"preco_referencia_itens": preco_itens_df}
+    if itens_incompletos:
+        abas = {"coleta_incompleta": _tabela_coleta_incompleta(itens_incompletos), **abas}
+    if not resumo_lote_df.empty:
+        abas["resumo_unidade"] = resumo_lote_df
+    if not dados_lote_df.empty:
+        abas["dados"] = dados_lote_df
+    output_excel = io.BytesIO()
+    escrever_excel_streaming(output_excel, abas)
+    excel_bytes = output_excel.getvalue()
 
-    gerar_relatorio_html(df_dados, resumo_df, preco_ref_df, meta, temp_html_name)
+    meta = {
+        "data_inicial": data_inicial,
+        "data_final": data_final,
+        "filtros_efetivos": filtros_efetivos,
+        "nome_base": base,
+        "quantidade_itens": len(codigos),
+        "registros_por_item": {
+            cod: len(df_dados) for cod, (df_dados, _, _) in resultados_por_item.items()
+        },
+        # Como em executar_pesquisa_e_gerar_arquivos, por item
+        "coleta_completa": not itens_incompletos,
+        "itens_coleta_incompleta": itens_incompletos,
+    }
 
-    with open(temp_html_name, "r", encoding="utf-8") as f:
-        html_string = f.read()
-    
-    if os.path.exists(temp_html_name):
-        os.remove(temp_html_name)
+    html_string = gerar_relatorio_lote_html(preco_itens_df, meta)
 
+    if itens_incompletos:
+        emitir_evento(TipoEvento.AVISO,
+                      f"⚠ Pesquisa em lote concluída com coleta INCOMPLETA em "
+                      f"{len(itens_incompletos)} de {len(codigos)} itens "
+                      f"({', '.join(str(c) for c in itens_incompletos)}): os valores "
+                      f"desses itens não representam toda a consulta.",
+                      registros=len(dados_lote_df), itens=len(codigos),
+                      itens_incompletos=itens_incompletos)
+    else:
+        emitir_evento(TipoEvento.INFORMACAO,
+                      f"✅ Pesquisa em lote concluída: {len(dados_lote_df)} registros "
+                      f"em {len(codigos)} itens.",
+                      registros=len(dados_lote_df), itens=len(codigos))
     return excel_bytes, html_string, meta
 
+
 if __name__ == "__main__":
     # Se rodar o script direto (ex: Jupyter), chama a main()
     main()
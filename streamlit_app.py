@@ -1,3 +1,5 @@
+import time
+
 import streamlit as st
 import pncp_backend  # Certifique-se de atualizar essa lib para aceitar os novos parêmetros
 
@@ -204,6 +206,48 @@ with col_filtros:
             help="Se informado, será usado como prefixo do nome da planilha e da nota técnica.",
         )
 
+        exportar_colunar = st.checkbox(
+            "Gerar também arquivos Parquet e CSV (gzip)",
+            value=False,
+            help="Exporta as tabelas dados, resumo_unidade e preco_referencia "
+                 "em formatos colunares, mais rápidos para ferramentas de BI.",
+        )
+
+        ignorar_cache = st.checkbox(
+            "Ignorar resultados em cache (forçar nova consulta)",
+            value=False,
+            help="Pesquisas idênticas feitas recentemente neste servidor são "
+                 "reaproveitadas sem consultar a API novamente.",
+        )
+
+        # ---------------- Modo prévia ----------------
+        modo_previa = st.checkbox(
+            "Prévia rápida (resultado provisório)",
+            value=False,
+            help="Calcula um preço de referência inicial com parte da coleta. "
+                 "A pesquisa completa pode ser lançada depois, reaproveitando "
+                 "as páginas já baixadas.",
+        )
+        col_previa_criterio, col_previa_valor = st.columns([2, 1])
+        with col_previa_criterio:
+            criterio_previa = st.radio(
+                "Critério da prévia",
+                ["Limite de registros", "Limite de tempo (s)", "Amostra de páginas"],
+                horizontal=True,
+                help="Amostra de páginas: busca páginas espalhadas por todo o período, "
+                     "em vez apenas das primeiras.",
+            )
+        with col_previa_valor:
+            valor_previa = st.number_input(
+                "Valor do critério",
+                min_value=1,
+                value=pncp_backend.PREVIA_MAX_REGISTROS,
+                step=1,
+                help=f"Padrões: {pncp_backend.PREVIA_MAX_REGISTROS} registros, "
+                     f"{pncp_backend.PREVIA_TEMPO_LIMITE_S} s ou "
+                     f"{pncp_backend.PREVIA_PAGINAS_AMOSTRA} páginas.",
+            )
+
         executar = st.form_submit_button("🔎 Executar pesquisa")
 
 # ------------------------------------------------------------
@@ -242,6 +286,36 @@ with col_ajuda:
 # 🧠 FUNÇÕES AUXILIARES (FRONTEND)
 # ============================================================
 
+@st.cache_resource
+def _cache_resultados():
+    """
+    Cache de resultados único por servidor, compartilhado entre sessões.
+    """
+    return pncp_backend.CacheResultadosPesquisa()
+
+@st.cache_resource
+def _gerenciador_tarefas():
+    """
+    Fila de pesquisas em segundo plano, única por servidor.
+    """
+    return pncp_backend.GerenciadorTarefas()
+
+@st.cache_resource
+def _servidor_metricas():
+    """
+    Exportador /metrics (Prometheus), único por servidor, se habilitado
+    em pncp_backend.EXPORTAR_METRICAS.
+    """
+    if not pncp_backend.EXPORTAR_METRICAS:
+        return None
+    try:
+        return pncp_backend.iniciar_servidor_metricas()
+    except OSError as exc:
+        st.warning(f"Não foi possível iniciar o exportador de métricas: {exc}")
+        return None
+
+_servidor_metricas()
+
 def _opt_to_bool(opt, true_label, false_label):
     if opt == true_label:
         return True
@@ -274,13 +348,28 @@ def _parse_money_or_none(text, campo_nome):
         st.warning(f"Valor inválido em '{campo_nome}'. Use formato numérico (ex: 1500,00). Ignorando filtro.")
         return None
 
+def _montar_previa(criterio, valor):
+    """
+    ModoPrevia a partir do critério escolhido no formulário.
+    """
+    valor = int(valor)
+    if criterio == "Limite de tempo (s)":
+        return pncp_backend.ModoPrevia(tempo_limite_s=valor)
+    if criterio == "Amostra de páginas":
+        return pncp_backend.ModoPrevia(paginas_amostra=valor)
+    return pncp_backend.ModoPrevia(max_registros=valor)
+
+def _formatar_duracao(segundos):
+    segundos = round(segundos)
+    if segundos < 60:
+        return f"{segundos}s"
+    return f"{segundos // 60}min {segundos % 60:02d}s"
+
 # ============================================================
 # 🚀 EXECUÇÃO DA PESQUISA
 # ============================================================
 
 if executar:
-    st.info("Executando consulta ao PNCP. Isso pode levar alguns segundos...")
-
     # Converte campos de texto para tipos adequados
     cod_item = _parse_int_or_none(cod_item_str, "Código do item de catálogo")
     unidade_orgao_int = _parse_int_or_none(unidade_orgao, "Código da unidade do órgão")
@@ -303,34 +392,119 @@ if executar:
     else:
         mos = ""
 
-    with st.spinner("Consultando API do PNCP e gerando arquivos..."):
-        # --- ALTERAÇÃO: PASSAGEM DOS NOVOS PARÂMETROS PARA O BACKEND ---
-        # Nota: Você deve atualizar a definição da função no arquivo pncp_backend.py
-        # para receber valor_min e valor_max
-        excel_bytes, html_string, meta = pncp_backend.executar_pesquisa_e_gerar_arquivos(
-            cod_item_catalogo=cod_item,
-            orgao_cnpj=orgao_cnpj,
-            unidade_orgao=unidade_orgao_int,
-            situacao_item=situacao_item,
-            material_ou_servico=mos,
-            codigo_classe=codigo_classe,
-            codigo_grupo=codigo_grupo,
-            cod_fornecedor=cod_fornecedor,
-            tem_resultado=tem_resultado,
-            bps=bps,
-            margem_pref_normal=mpn,
-            codigo_ncm=codigo_ncm,
-            # Novos parâmetros aqui:
-            valor_min=val_min_float,
-            valor_max=val_max_float,
-            nome_base_saida=nome_base or None,
+    formatos_colunares = ("parquet", "csv") if exportar_colunar else ()
+
+    # Configuração imutável desta pesquisa (janela de datas já fixada);
+    # também é a chave do cache, junto com os formatos exportados
+    # (o nome base só afeta o nome dos arquivos baixados)
+    config = pncp_backend.ConfiguracaoPesquisa(
+        cod_item_catalogo=cod_item,
+        orgao_entidade_cnpj=orgao_cnpj,
+        unidade_orgao_codigo_unidade=unidade_orgao_int,
+        situacao_compra_item=situacao_item,
+        material_ou_servico=mos,
+        codigo_classe=codigo_classe,
+        codigo_grupo=codigo_grupo,
+        cod_fornecedor=cod_fornecedor,
+        filtrar_tem_resultado=tem_resultado,
+        filtrar_bps=bps,
+        filtrar_margem_preferencia_normal=mpn,
+        codigo_ncm=codigo_ncm,
+        valor_min=val_min_float,
+        valor_max=val_max_float,
+    ).com_intervalo_fixado()
+    chave_cache = (config, formatos_colunares)
+    cache = _cache_resultados()
+    em_cache = None if ignorar_cache else cache.obter(chave_cache)
+
+    # Uma nova pesquisa substitui a que esta sessão ainda acompanhava
+    if st.session_state.get("tarefa_id"):
+        _gerenciador_tarefas().cancelar(st.session_state["tarefa_id"])
+
+    if em_cache is not None:
+        resultado, idade_s = em_cache
+        st.session_state.pop("tarefa_id", None)
+        st.session_state["pesquisa"] = {
+            "resultado": resultado,
+            "nome_base": nome_base,
+            "idade_cache_s": idade_s,
+        }
+    else:
+        # A pesquisa roda em segundo plano; esta sessão só acompanha.
+        # Uma prévia nunca entra no cache (coleta_completa é False).
+        previa = _montar_previa(criterio_previa, valor_previa) if modo_previa else None
+        st.session_state["tarefa_id"] = _gerenciador_tarefas().submeter(
+            config=config,
+            formatos_colunares=formatos_colunares,
+            previa=previa,
         )
+        st.session_state["pesquisa"] = {
+            "chave_cache": chave_cache,
+            "nome_base": nome_base,
+            "config": config,
+            "formatos_colunares": formatos_colunares,
+        }
+
+# ============================================================
+# ⏳ ACOMPANHAMENTO DA PESQUISA EM SEGUNDO PLANO
+# ============================================================
+
+tarefa_id = st.session_state.get("tarefa_id")
+if tarefa_id:
+    gerenciador = _gerenciador_tarefas()
+    tarefa = gerenciador.obter(tarefa_id)
+
+    if tarefa is None:
+        st.session_state.pop("tarefa_id", None)
+        st.warning("A pesquisa em andamento não foi encontrada no servidor. Execute-a novamente.")
+
+    elif not tarefa.finalizada:
+        status = tarefa.status()
+        if status["fracao"] is not None:
+            texto = (f"Páginas {status['paginas']} de {status['total_paginas']} "
+                     f"| {status['registros']} registros")
+            if status["eta_s"] is not None and status["etapa"] == "coletando páginas":
+                texto += f" | tempo restante estimado: {_formatar_duracao(status['eta_s'])}"
+            st.progress(status["fracao"], text=texto)
+        else:
+            st.progress(0.0, text=f"Páginas {status['paginas']} | {status['registros']} registros")
+        st.caption(
+            f"Etapa: {status['etapa']} · decorrido: {_formatar_duracao(status['decorrido_s'])}. "
+            "Você pode continuar usando a página; os arquivos aparecem aqui ao final."
+        )
+        mensagens = [e.mensagem for e in list(tarefa.eventos) if e.mensagem]
+        if mensagens:
+            with st.expander("Detalhes da coleta"):
+                st.code("\n".join(mensagens[-15:]), language=None)
+        if st.button("⏹ Cancelar pesquisa"):
+            gerenciador.cancelar(tarefa_id)
+            st.session_state.pop("tarefa_id", None)
+            st.warning("Pesquisa cancelada.")
+        else:
+            time.sleep(1)
+            st.rerun()
+
+    else:
+        st.session_state.pop("tarefa_id", None)
+        pesquisa = st.session_state.get("pesquisa", {})
+        if tarefa.estado == "concluida":
+            excel_bytes, html_string, meta = tarefa.resultado
+            if meta.get("coleta_completa", True) and "chave_cache" in pesquisa:
+                _cache_resultados().guardar(pesquisa["chave_cache"], tarefa.resultado)
+            pesquisa["resultado"] = tarefa.resultado
+        elif tarefa.estado == "cancelada":
+            st.warning("Pesquisa cancelada.")
+        else:
+            st.error(f"A pesquisa falhou: {tarefa.erro}")
 
-    # ========================================================
-    # 📊 APRESENTAÇÃO DOS RESULTADOS
-    # ========================================================
-    base = meta.get("nome_base", "pncp_pesquisa")
+# ============================================================
+# 📊 APRESENTAÇÃO DOS RESULTADOS
+# ============================================================
 
+def _exibir_resultados(excel_bytes, html_string, meta, base):
+    """
+    Resumo dos filtros, downloads e visualização da nota técnica.
+    """
     st.markdown("### Resumo dos filtros aplicados")
     filtros_efetivos = meta.get("filtros_efetivos", {})
     if filtros_efetivos:
@@ -355,9 +529,19 @@ if executar:
         st.subheader("Pré-visualização da nota técnica")
         st.components.v1.html(html_string, height=700, scrolling=True)
 
+    elif meta.get("previa"):
+        previa = meta["previa"]
+        total = previa.get("total_registros")
+        st.warning(
+            f"Resultado PROVISÓRIO: prévia com {previa.get('registros', 0)} registros"
+            + (f" de {total}" if total else "")
+            + f" ({previa.get('motivo', '')}). Use a pesquisa completa antes de "
+            "anexar os arquivos ao processo."
+        )
     else:
         st.success("Pesquisa concluída com sucesso!")
 
+    if excel_bytes:
         tab_downloads, tab_preview = st.tabs(["📂 Downloads", "📝 Nota técnica (visualização)"])
 
         with tab_downloads:
@@ -377,8 +561,49 @@ if executar:
                 mime="text/html",
             )
 
+            arquivos_colunares = meta.get("arquivos_colunares", {})
+            if arquivos_colunares:
+                st.markdown("#### Arquivos colunares (BI)")
+                for nome_arquivo, conteudo in arquivos_colunares.items():
+                    mime = (
+                        "application/vnd.apache.parquet"
+                        if nome_arquivo.endswith(".parquet")
+                        else "application/gzip"
+                    )
+                    st.download_button(
+                        label=f"⬇️ Baixar {nome_arquivo}",
+                        data=conteudo,
+                        file_name=f"{base}_{nome_arquivo}",
+                        mime=mime,
+                    )
+
             st.caption("Anexe esses arquivos à instrução processual (por exemplo, no SEI).")
 
         with tab_preview:
             st.subheader("Visualização da nota técnica")
             st.components.v1.html(html_string, height=700, scrolling=True)
+
+pesquisa = st.session_state.get("pesquisa")
+if pesquisa and "resultado" in pesquisa:
+    excel_bytes, html_string, meta = pesquisa["resultado"]
+    # A pesquisa completa reaproveita as páginas da prévia (cache de respostas)
+    if (meta.get("previa") and "config" in pesquisa
+            and st.button("▶ Executar pesquisa completa")):
+        st.session_state["tarefa_id"] = _gerenciador_tarefas().submeter(
+            config=pesquisa["config"],
+            formatos_colunares=pesquisa["formatos_colunares"],
+        )
+        st.session_state["pesquisa"] = {
+            chave: valor for chave, valor in pesquisa.items() if chave != "resultado"
+        }
+        st.rerun()
+    if pesquisa.get("idade_cache_s") is not None:
+        st.info(
+            f"⚡ Resultado servido do cache (pesquisa idêntica feita há "
+            f"{max(1, round(pesquisa['idade_cache_s'] / 60))} min neste servidor). "
+            "Nenhuma nova consulta à API foi feita."
+        )
+    _exibir_resultados(
+        excel_bytes, html_string, meta,
+        pesquisa.get("nome_base") or meta.get("nome_base", "pncp_pesquisa"),
+    )
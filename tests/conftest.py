@@ -0,0 +1,5 @@
+import os
+import sys
+
+# pncp_backend é um módulo único na raiz do repositório
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
@@ -0,0 +1,30 @@
+"""
+_buscar_pagina: erros de rede viram página com falha (None); erros de
+programação são propagados.
+"""
+
+import pytest
+import requests
+
+from pncp_backend import _buscar_pagina
+
+
+class _ClienteFalso:
+    cache = None
+
+    def __init__(self, exc):
+        self.exc = exc
+
+    def get(self, url, params=None):
+        raise self.exc
+
+
+def test_erro_de_conexao_devolve_none():
+    cliente = _ClienteFalso(requests.ConnectionError("sem rede"))
+    assert _buscar_pagina(cliente, "http://api", {"pagina": 1}) is None
+
+
+def test_erro_de_programacao_e_propagado():
+    cliente = _ClienteFalso(TypeError("argumento inválido"))
+    with pytest.raises(TypeError):
+        _buscar_pagina(cliente, "http://api", {"pagina": 1})
@@ -0,0 +1,82 @@
+"""
+Barramento de eventos e eventos de etapa: falhas de inscritos são contadas
+e relatadas; a conclusão de uma etapa é emitida (e medida) também quando a
+etapa falha.
+"""
+
+import pytest
+
+from pncp_backend import (
+    M_DURACAO_ETAPA,
+    M_FALHAS_INSCRITOS,
+    BarramentoEventos,
+    EventoPNCP,
+    TipoEvento,
+    etapa_eventos,
+    ingerir_paginas,
+    inscrever_localmente,
+)
+
+
+def _contagem_etapa(etapa, resultado):
+    return M_DURACAO_ETAPA.contagem(etapa=etapa, resultado=resultado)
+
+
+def test_etapa_com_erro_emite_conclusao():
+    eventos = []
+    antes = _contagem_etapa("etapa_teste", "erro")
+    with (inscrever_localmente(eventos.append, {TipoEvento.ETAPA_CONCLUIDA}),
+          pytest.raises(ValueError),
+          etapa_eventos("etapa_teste", unidades=3)):
+        raise ValueError("falha")
+
+    (evento,) = eventos
+    assert evento.dados["etapa"] == "etapa_teste"
+    assert evento.dados["erro"] == "ValueError"
+    assert evento.dados["unidades"] == 3
+    assert evento.dados["duracao_s"] >= 0
+    assert _contagem_etapa("etapa_teste", "erro") == antes + 1
+
+
+def test_etapa_sem_erro():
+    eventos = []
+    antes = _contagem_etapa("etapa_teste", "ok")
+    with (inscrever_localmente(eventos.append, {TipoEvento.ETAPA_CONCLUIDA}),
+          etapa_eventos("etapa_teste") as extras):
+        extras["linhas"] = 10
+
+    (evento,) = eventos
+    assert "erro" not in evento.dados
+    assert evento.dados["linhas"] == 10
+    assert _contagem_etapa("etapa_teste", "ok") == antes + 1
+
+
+def test_falha_de_inscrito_e_contada_e_relatada(capsys):
+    barramento = BarramentoEventos()
+    recebidos = []
+
+    def inscrito_com_defeito(evento):
+        raise KeyError("campo")
+
+    barramento.inscrever(inscrito_com_defeito)
+    barramento.inscrever(recebidos.append)
+    antes = M_FALHAS_INSCRITOS.valor(inscrito=inscrito_com_defeito.__qualname__)
+    for _ in range(2):
+        barramento.publicar(EventoPNCP(TipoEvento.AVISO, "teste"))
+
+    assert len(recebidos) == 2
+    assert M_FALHAS_INSCRITOS.valor(inscrito=inscrito_com_defeito.__qualname__) == antes + 2
+    assert capsys.readouterr().err.count("KeyError") == 1
+
+
+def test_montagem_dataframe_emite_inicio_e_conclusao():
+    eventos = []
+    tipos = {TipoEvento.ETAPA_INICIADA, TipoEvento.ETAPA_CONCLUIDA}
+    with inscrever_localmente(eventos.append, tipos):
+        ingerir_paginas([[{"idCompraItem": "1", "valorUnitarioResultado": 1.0}]])
+
+    assert [(e.tipo, e.dados["etapa"]) for e in eventos] == [
+        (TipoEvento.ETAPA_INICIADA, "montagem_dataframe"),
+        (TipoEvento.ETAPA_CONCLUIDA, "montagem_dataframe"),
+    ]
+    assert eventos[1].dados["linhas"] == 1
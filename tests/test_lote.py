@@ -0,0 +1,45 @@
+"""
+Pesquisa em lote: item com coleta interrompida por erro é sinalizado em
+meta, na planilha e na nota técnica, em vez de parecer "sem resultados".
+"""
+
+import io
+
+import openpyxl
+
+import pncp_backend
+from pncp_backend import (
+    ColetaPaginasPNCP,
+    ConfiguracaoPesquisa,
+    executar_pesquisa_em_lote,
+)
+
+
+def _paginas(cod, *args, **kwargs):
+    def gerador():
+        if cod == 1:
+            yield [{"idCompraItem": "1", "unidadeMedida": "UN", "valorUnitarioResultado": 10.0}]
+            return True
+        return False  # coleta do item 2 interrompida antes da primeira página
+
+    return ColetaPaginasPNCP(gerador())
+
+
+def test_item_com_coleta_incompleta_e_sinalizado(monkeypatch):
+    monkeypatch.setattr(pncp_backend, "iterar_paginas_pncp", _paginas)
+    config = ConfiguracaoPesquisa(data_inicial="2024-01-01", data_final="2024-01-31")
+    eventos = []
+    with pncp_backend.inscrever_localmente(eventos.append, {pncp_backend.TipoEvento.AVISO}):
+        excel_bytes, html_string, meta = executar_pesquisa_em_lote(
+            [1, 2], config=config, cliente=object())
+
+    assert meta["coleta_completa"] is False
+    assert meta["itens_coleta_incompleta"] == [2]
+    assert "COLETA INCOMPLETA" in html_string
+    assert any("INCOMPLETA" in e.mensagem for e in eventos)
+
+    planilha = openpyxl.load_workbook(io.BytesIO(excel_bytes))
+    assert planilha.sheetnames[0] == "coleta_incompleta"
+    linhas = list(planilha["preco_referencia_itens"].values)
+    coluna = linhas[0].index("coleta_completa")
+    assert {linha[0]: linha[coluna] for linha in linhas[1:]} == {1: True, 2: False}
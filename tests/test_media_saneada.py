@@ -0,0 +1,123 @@
+"""
+Regressão da média saneada em lote: calcular_media_sanada_grupos deve dar,
+bit a bit, o mesmo resultado de aplicar calcular_media_sanada_serie grupo
+a grupo.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pncp_backend import (
+    calcular_media_sanada_grupos,
+    calcular_media_sanada_serie,
+    calcular_resumo_por_unidade,
+)
+
+
+def _esperado(grupos, valores):
+    return valores.groupby(grupos).apply(calcular_media_sanada_serie)
+
+
+def _comparar(grupos, valores):
+    grupos = pd.Series(grupos, name="unidadeMedida")
+    valores = pd.Series(valores, dtype="float64")
+    obtido = calcular_media_sanada_grupos(grupos, valores)
+    esperado = _esperado(grupos, valores)
+    pd.testing.assert_series_equal(obtido, esperado, check_exact=True, check_names=False)
+
+
+def _casos_aleatorios(semente, quantidade=300):
+    rng = np.random.default_rng(semente)
+    for _ in range(quantidade):
+        n = int(rng.integers(1, 60))
+        unidades = rng.choice(["UN", "CX", "KG", "PCT"], n)
+        tipo = rng.integers(0, 4)
+        if tipo == 0:
+            valores = rng.lognormal(2, 1.5, n)
+        elif tipo == 1:
+            # Valores discretos, com muitos empates
+            valores = rng.integers(1, 6, n).astype(float) * 2.5
+        elif tipo == 2:
+            # Médias negativas ou próximas de zero
+            valores = rng.normal(rng.choice([-50.0, -1e-9, 0.0, 1e-9]), 1.0, n)
+        else:
+            valores = np.round(rng.lognormal(0, 3, n), 2)
+            valores[rng.random(n) < 0.1] = np.nan
+        yield unidades, valores
+
+
+@pytest.mark.parametrize("semente", range(10))
+def test_grupos_aleatorios_identicos(semente):
+    for unidades, valores in _casos_aleatorios(semente):
+        _comparar(unidades, valores)
+
+
+def test_valores_empatados_e_discretos():
+    _comparar(["UN"] * 6 + ["CX"] * 5,
+              [1, 1, 1, 1, 1, 100, 2, 2, 3, 3, 2])
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+def test_grupos_com_nan_e_infinito():
+    _comparar(
+        ["A", "A", "A", "B", "B", "C", "C", "C", "D"],
+        [np.nan, np.nan, np.nan, 1.0, np.inf, -np.inf, 5.0, 6.0, np.nan],
+    )
+
+
+def test_medias_negativas_e_quase_nulas():
+    _comparar(
+        ["N"] * 5 + ["Z"] * 5 + ["Q"] * 4,
+        [-10, -12, -11, -300, -9, -1, 1, -1, 1, 0, 1e-300, -1e-300, 2e-300, 0],
+    )
+
+
+def test_cv_exatamente_no_limite():
+    # Média 1 e desvio 0,25 exatos em binário: CV = 25% (sem expurgo)
+    valores = [0.75, 1.25, 0.75, 1.25]
+    assert calcular_media_sanada_serie(pd.Series(valores)) == 1.0
+    _comparar(["L"] * 4 + ["M"] * 5, valores + [0.75, 1.25, 0.75, 1.25, 1.0])
+
+
+def test_cv_no_limite_com_escalas():
+    for escala in (1e-6, 3.0, 1e9):
+        valores = [0.75 * escala, 1.25 * escala] * 3 + [40.0 * escala]
+        _comparar(["U"] * len(valores), valores)
+
+
+def _resumo_de_referencia(df):
+    """
+    Resumo por unidade calculado apenas com groupby (agregações do pandas
+    e calcular_media_sanada_serie aplicada grupo a grupo).
+    """
+    grp = df.groupby("unidadeMedida")["valorUnitarioResultado"]
+    resumo = grp.agg(["count", "mean", "median", "std", "min", "max"]).rename(columns={
+        "count": "resultado_qtde",
+        "mean": "resultado_media",
+        "median": "resultado_mediana",
+        "std": "resultado_desvio_padrao",
+        "min": "resultado_minimo",
+        "max": "resultado_maximo",
+    })
+    resumo["media_sanada"] = grp.apply(calcular_media_sanada_serie)
+    base = resumo["media_sanada"].fillna(resumo["resultado_media"]).fillna(
+        resumo["resultado_mediana"])
+    dp = resumo["resultado_desvio_padrao"].fillna(0)
+    resumo["limite_inferior_intervalo"] = (base - dp).clip(lower=0)
+    resumo["limite_superior_intervalo"] = (base + dp).clip(lower=0)
+    return resumo.reset_index().sort_values("unidadeMedida")
+
+
+def test_resumo_por_unidade_identico():
+    rng = np.random.default_rng(7)
+    n = 5_000
+    df = pd.DataFrame({
+        "unidadeMedida": rng.choice(["UNIDADE", "CAIXA", "KG", "LITRO", "PAR"], n),
+        "valorUnitarioResultado": np.round(rng.lognormal(3, 1.2, n), 2),
+    })
+    df.loc[rng.random(n) < 0.05, "valorUnitarioResultado"] = np.nan
+    df.loc[df["unidadeMedida"] == "PAR", "valorUnitarioResultado"] = np.nan
+
+    obtido = calcular_resumo_por_unidade(df)
+    pd.testing.assert_frame_equal(obtido, _resumo_de_referencia(df), check_exact=True)
@@ -0,0 +1,26 @@
+"""
+Resumo por unidade: independência da divisão em páginas.
+"""
+
+import numpy as np
+import pandas as pd
+
+from pncp_backend import preparar_dataframes
+
+
+def _registros(n=2_000, semente=3):
+    rng = np.random.default_rng(semente)
+    unidades = rng.choice(["UNIDADE", "CAIXA", "KG"], n)
+    valores = rng.lognormal(3, 1.5, n)
+    return [{"idCompraItem": str(i), "unidadeMedida": u, "valorUnitarioResultado": float(v)}
+            for i, (u, v) in enumerate(zip(unidades, valores))]
+
+
+def test_resumo_nao_depende_das_paginas():
+    registros = _registros()
+    _, resumo_lista, _ = preparar_dataframes(registros)
+    for tamanho in (7, 500):
+        paginas = (registros[i:i + tamanho] for i in range(0, len(registros), tamanho))
+        _, resumo_paginas, _ = preparar_dataframes(paginas)
+        pd.testing.assert_frame_equal(resumo_paginas, resumo_lista, check_exact=True)
+
@@ -0,0 +1,53 @@
+"""
+Armazém de itens e sincronização incremental: contagem de novos e
+atualizados no upsert e reverificação periódica de toda a janela.
+"""
+
+import pytest
+
+import pncp_backend
+from pncp_backend import ArmazemItensPNCP, sincronizar_itens_incremental
+
+
+@pytest.fixture
+def armazem(tmp_path):
+    armazem = ArmazemItensPNCP(str(tmp_path / "armazem.sqlite3"))
+    yield armazem
+    armazem.fechar()
+
+
+def _item(i, atualizacao="2024-01-01T00:00:00", valor=1.0):
+    return {"idCompraItem": i, "dataInclusaoPncp": "2024-01-01T00:00:00",
+            "dataAtualizacaoPncp": atualizacao, "valorUnitarioResultado": valor}
+
+
+def test_gravar_itens_conta_novos_e_atualizados(armazem):
+    assert armazem.gravar_itens("c", [_item(1), _item(2), {"semId": 1}]) == (2, 0)
+    assert armazem.gravar_itens("c", [_item(1), _item(2)]) == (0, 0)
+    itens = [_item(1, "2024-02-01T00:00:00", valor=2.0), _item(3)]
+    assert armazem.gravar_itens("c", itens) == (1, 1)
+    por_id = {i["idCompraItem"]: i for i in armazem.carregar_itens("c")}
+    assert sorted(por_id) == [1, 2, 3]
+    assert por_id[1]["valorUnitarioResultado"] == 2.0
+
+
+@pytest.mark.parametrize("data_final, inicio_esperado", [
+    ("2024-06-20", "2024-06-03"),   # 10 dias após a verificação completa
+    ("2024-07-15", "2024-01-01"),   # 35 dias: janela inteira de novo
+])
+def test_reverificacao_completa_periodica(armazem, monkeypatch, data_final, inicio_esperado):
+    inicios = []
+
+    def coletar(cod, inicio, fim, **kwargs):
+        inicios.append(inicio)
+        return [], True
+
+    monkeypatch.setattr(pncp_backend, "coletar_itens_pncp", coletar)
+    parametros = {"armazem": armazem, "dias_reverificacao": 7, "dias_verificacao_completa": 30}
+
+    sincronizar_itens_incremental(1, "2024-01-01", "2024-06-10", **parametros)
+    assert inicios == ["2024-01-01"]
+    assert armazem.ultima_verificacao_completa(armazem.chave_consulta(1, {})) == "2024-06-10"
+
+    sincronizar_itens_incremental(1, "2024-01-01", data_final, **parametros)
+    assert inicios[-1] == inicio_esperado